@@ -0,0 +1,180 @@
+"""Read-only HTTP API over the numbers the dashboard has already computed.
+
+Runs on a daemon thread inside the dashboard process (``DASHBOARD_API_PORT``),
+so it serves the processed frames the sessions share instead of fetching the
+sheets again. Every endpoint is computed once per dataset version:
+
+    GET /api/<endpoint>                 JSON: {"endpoint", "versions", "data"}
+    GET /api/<endpoint>?format=arrow    Arrow IPC stream (tabular endpoints only)
+    GET /api/                           the endpoints and the versions they would use
+
+Responses carry an ``ETag`` built from the dataset versions. A client that sends
+it back in ``If-None-Match`` gets ``304 Not Modified`` until the data changes:
+
+    curl -s localhost:8502/api/kpis
+    curl -s -H 'Accept: application/vnd.apache.arrow.stream' localhost:8502/api/status-summary -o status.arrows
+"""
+import collections
+import datetime
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+RESPONSE_CACHE_SIZE = 64  # encoded responses kept, across endpoints, versions and formats
+
+
+class DataUnavailable(Exception):
+    """No session has loaded a dataset the endpoint needs yet"""
+
+
+class NotAcceptable(Exception):
+    """The endpoint cannot be encoded in the requested format"""
+
+
+def _json_default(value):
+    if isinstance(value, (pd.Timestamp, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, pd.DataFrame):
+        return json.loads(value.to_json(orient="records", date_format="iso"))
+    if hasattr(value, "item"):  # numpy scalars
+        return value.item()
+    return str(value)
+
+
+def _arrow_stream(frame):
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise NotAcceptable("Arrow responses need pyarrow (pip install pyarrow)") from e
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+class DashboardApi:
+    """Endpoints over the current dataset versions, with their encoded responses cached
+
+    ``endpoints`` maps a name to ``(kinds, compute)``: ``compute`` receives one
+    processed frame per kind and returns a JSON-able dict or a DataFrame.
+    ``datasets(kind)`` returns the current frame of a kind, or None.
+    """
+
+    def __init__(self, endpoints, datasets, version=lambda frame: frame.attrs.get("version")):
+        self.endpoints = endpoints
+        self.datasets = datasets
+        self.version = version
+        self._responses = collections.OrderedDict()  # (name, versions, format) -> (etag, body, type)
+        self._lock = threading.Lock()
+
+    def versions(self):
+        frames = {kind: self.datasets(kind) for kinds, _ in self.endpoints.values() for kind in kinds}
+        return {kind: None if frame is None else self.version(frame) for kind, frame in frames.items()}
+
+    def response(self, name, fmt="json"):
+        """``(etag, body, content type)`` of one endpoint; raises KeyError for unknown names"""
+        kinds, compute = self.endpoints[name]
+        frames = [self.datasets(kind) for kind in kinds]
+        missing = [kind for kind, frame in zip(kinds, frames) if frame is None]
+        if missing:
+            raise DataUnavailable(f"No {', '.join(missing)} loaded yet - open the dashboard first")
+        versions = tuple(self.version(frame) for frame in frames)
+        key = (name, versions, fmt)
+        with self._lock:
+            if key in self._responses:
+                self._responses.move_to_end(key)
+                return self._responses[key]
+
+        data = compute(*frames)
+        if fmt == "arrow":
+            if not isinstance(data, pd.DataFrame):
+                raise NotAcceptable(f"/api/{name} is only served as JSON")
+            body, content_type = _arrow_stream(data), ARROW_STREAM
+        else:
+            payload = {"endpoint": name, "versions": dict(zip(kinds, versions)), "data": data}
+            body = json.dumps(payload, default=_json_default).encode("utf-8")
+            content_type = "application/json; charset=utf-8"
+        response = (f'"{"-".join(map(str, versions))}-{fmt}"', body, content_type)
+        with self._lock:
+            self._responses[key] = response
+            while len(self._responses) > RESPONSE_CACHE_SIZE:
+                self._responses.popitem(last=False)
+        return response
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        api = self.server.api
+        url = urlparse(self.path)
+        parts = [p for p in url.path.split("/") if p]
+
+        if parts == ["healthz"]:
+            self._send(200, b"ok", "text/plain")
+            return
+        if parts == ["api"]:
+            self._json(200, {"endpoints": sorted(api.endpoints), "versions": api.versions()})
+            return
+        if len(parts) != 2 or parts[0] != "api" or parts[1] not in api.endpoints:
+            self._json(404, {"error": "Unknown endpoint", "endpoints": sorted(api.endpoints)})
+            return
+
+        fmt = parse_qs(url.query).get("format", [None])[0]
+        if fmt is None:
+            fmt = "arrow" if ARROW_STREAM in self.headers.get("Accept", "") else "json"
+        if fmt not in ("json", "arrow"):
+            self._json(400, {"error": f"Unknown format: {fmt}"})
+            return
+
+        try:
+            etag, body, content_type = api.response(parts[1], fmt)
+        except DataUnavailable as e:
+            self._json(503, {"error": str(e)}, {"Retry-After": "30"})
+            return
+        except NotAcceptable as e:
+            self._json(406, {"error": str(e)})
+            return
+        except Exception as e:
+            self._json(500, {"error": str(e)})
+            return
+
+        headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept"}
+        if etag in [t.strip() for t in self.headers.get("If-None-Match", "").split(",")]:
+            self._send(304, b"", None, headers)
+        else:
+            self._send(200, body, content_type, headers)
+
+    def _json(self, status, payload, headers=None):
+        self._send(status, json.dumps(payload, default=_json_default).encode("utf-8"),
+                   "application/json; charset=utf-8", headers)
+
+    def _send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        if content_type:
+            self.send_header("Content-Type", content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        if self.server.verbose:
+            super().log_message(*args)
+
+
+def start_server(api, host="127.0.0.1", port=0, verbose=False):
+    """Serve ``api`` on a daemon thread; ``server.url`` is its base URL"""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.api = api
+    server.verbose = verbose
+    server.url = f"http://{host}:{server.server_port}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
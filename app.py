@@ -1,23 +1,39 @@
 import streamlit as st
 import pandas as pd
-import pygsheets
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import re
-import io
+import numpy as np
+import os
+import hashlib
+import gzip
+import html
+import json
+import functools
+import threading
+import contextlib
+import collections
+import concurrent.futures
+import importlib
 from datetime import datetime
-from streamlit_autorefresh import st_autorefresh
-import requests
+import api_server
+from perf import (
+    perf_cache_miss, perf_cached_stage, perf_current_run, perf_end_run, perf_loader,
+    perf_prometheus_text, perf_runs_jsonl, perf_stage, perf_start_run
+)
+from pipeline import (
+    AGING_BUCKETS, CircuitBreaker, CsvExportBackend, DataBackendError, INTERNAL_COLUMNS, LOCAL_DATA_PATH,
+    PAYMENT_AMOUNT_COLUMNS, PROPOSAL_AMOUNT_COLUMNS, PROPOSAL_GID, ROLLUP_LEVELS, SHEETS, SHEET_GID,
+    SNAPSHOT_DIR, SOURCES_FILE, SOURCE_COLUMN, SPREADSHEET_ID, ServiceAccountBackend, SourceRegistry,
+    ValuesApiBackend, aging_table, apply_mask, dataset_version, get_proposal_insights, lazy_import,
+    local_backend, local_data_version, new_aging_store, new_payment_rollup, new_proposal_rollup,
+    parse_filter_spec, payment_kpis, payment_status_summary, payment_year_summary, prepare_payments,
+    prepare_proposals, read_snapshot, receivables_frame, replace_file, snapshot_version,
+    update_aging_store, update_rollup, version_of
+)
 
-# ===================== CONFIG =====================
-SPREADSHEET_ID = "1dWv4kVugXNFQ2NaodZkawaXRglqRJOWR"
-SHEET_GID = "840573777"
-PROPOSAL_GID = "1356001164"
-SHEET_NAME = "Pri Payment"
-PROPOSAL_SHEET_NAME = "Proposals"
-SERVICE_FILE = "service_account.json"
+# plotly loads on first use, like pygsheets and requests (see pipeline.lazy_import)
+px = lazy_import("plotly.express")
+go = lazy_import("plotly.graph_objects")
 
+# ===================== PAGE CONFIG =====================
 st.set_page_config(page_title="Payment Dashboard", layout="wide")
 
 # ===================== AUTO REFRESH SETTINGS =====================
@@ -27,6 +43,7 @@ enable_auto = st.sidebar.checkbox("Enable Auto Refresh", value=False)
 interval = st.sidebar.number_input("Refresh Interval (seconds)", 10, 300, 60)
 
 if enable_auto:
+    from streamlit_autorefresh import st_autorefresh
     st_autorefresh(interval=interval * 1000, key="auto_refresh")
 
 # ===================== CUSTOM CSS FOR DARK THEME =====================
@@ -56,264 +73,311 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# ===================== DATA LOADING FUNCTIONS =====================
-def clean_colname(x):
-    x = str(x).strip().lower()
-    x = re.sub(r"[^0-9a-zA-Z_ ]", "", x)
-    x = x.replace(" ", "_")
-    return x if x else "col"
+# ===================== PERFORMANCE INSTRUMENTATION =====================
+# Stage timing itself is in perf.py, shared with batch.py and the benchmarks;
+# the dashboard keeps each session's finished runs for the diagnostics panel.
+PERF_HISTORY = 20  # runs kept per session for the diagnostics panel
 
-def safe_num(v):
-    """Enhanced number conversion for Indian currency format"""
+@contextlib.contextmanager
+def perf_fragment_run():
+    """Record a fragment rerun as a run of its own; inside a full run it adds nothing"""
+    if perf_current_run() is not None:
+        yield
+        return
+    perf_start_run()["fragment"] = True
     try:
-        if pd.isna(v) or v == "" or str(v).strip() == "":
-            return 0.0
-        
-        # Convert to string and clean
-        v_str = str(v).strip()
-        
-        # Remove currency symbols, commas, and spaces
-        v_clean = re.sub(r'[₹$,\\s]', '', v_str)
-        
-        # Handle negative numbers in parentheses
-        if v_clean.startswith('(') and v_clean.endswith(')'):
-            v_clean = '-' + v_clean[1:-1]
-        
-        # Convert to float
-        return float(v_clean) if v_clean else 0.0
-        
-    except Exception as e:
-        return 0.0
+        yield
+    finally:
+        perf_finish_run()
 
-def parse_date(v):
-    try:
-        return pd.to_datetime(v, dayfirst=True, errors="coerce")
-    except:
-        return pd.NaT
+def perf_finish_run():
+    """Close the current run, log it and keep it in the session history"""
+    run = perf_end_run()
+    if run is None:
+        return None
+    history = st.session_state.setdefault("perf_runs", [])
+    history.append(run)
+    del history[:-PERF_HISTORY]
+    return run
+
+def build_chart(name, builder, *args):
+    """Build a figure under a timing stage; returns None when the builder has nothing to show"""
+    with perf_stage(f"chart.{name}", "chart"):
+        return builder(*args)
+
+def render_chart(name, fig, key=None):
+    """Send a figure to the browser, timing the Plotly serialization
+    
+    With a ``key`` the chart reports clicked points into ``st.session_state[key]``.
+    """
+    with perf_stage(f"render.{name}", "render"):
+        if key is None:
+            st.plotly_chart(fig, use_container_width=True)
+        else:
+            st.plotly_chart(fig, use_container_width=True, key=key, on_select="rerun", selection_mode="points")
+
+def display_perf_panel():
+    """Optional diagnostics panel for the runs recorded in this session"""
+    runs = st.session_state.get("perf_runs", [])
+    if not runs:
+        return
+    
+    last = runs[-1]
+    st.markdown('<div class="section-header">⏱️ Performance Diagnostics</div>', unsafe_allow_html=True)
+    
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Last run", f"{last['total_seconds']:.2f} s")
+    col2.metric("Stages timed", len(last["stages"]))
+    cached = [s for s in last["stages"] if s["cache"]]
+    col3.metric("Cache hits", f"{sum(s['cache'] == 'hit' for s in cached)}/{len(cached)}")
+    shared = shared_datasets().stats()
+    col4.metric("Shared datasets", f"{shared['entries']} · {shared['bytes'] / 2**20:.1f} MB")
+    history = snapshot_history().stats()
+    st.caption(f"🕰️ Version history: {history['chunks']:,} column chunks, {history['bytes'] / 2**20:.1f} MB on disk")
+    
+    stages = pd.DataFrame(last["stages"])
+    stages["stage"] = ["  " * d + s for d, s in zip(stages["depth"], stages["stage"])]
+    st.dataframe(
+        stages[["stage", "kind", "seconds", "rows", "cache"]].sort_values("seconds", ascending=False),
+        use_container_width=True,
+        height=300
+    )
+    
+    if len(runs) > 1:
+        st.line_chart(pd.DataFrame({"Run total (s)": [r["total_seconds"] for r in runs]}))
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button("📥 Runs (JSON lines)", perf_runs_jsonl(runs), "perf_runs.jsonl")
+    with col2:
+        st.download_button("📥 Metrics (Prometheus)", perf_prometheus_text(), "metrics.prom")
+
+# ===================== CIRCUIT BREAKERS =====================
+# Each cached loader sits behind a circuit breaker (pipeline.CircuitBreaker):
+# after repeated failures it stops calling the source for an exponentially
+# growing pause, and the sidebar serves the last good snapshot.
+@st.cache_resource
+def sheets_breakers():
+    """Circuit breakers by loader, shared by every session"""
+    return {}
+
+def sheets_breaker(name):
+    return sheets_breakers().setdefault(name, CircuitBreaker(name))
+
+def serve_snapshot(breaker, label):
+    """The breaker's last good frame (or None), with a sidebar note on why it is served"""
+    if breaker.state == "open":
+        st.sidebar.warning(f"⏸️ {label} paused for {breaker.retry_in():.0f}s after "
+                           f"{breaker.failures} failures: {breaker.last_error}")
+    if breaker.snapshot is None:
+        return None
+    st.sidebar.info(f"🗂️ Serving the last good {label} snapshot from {breaker.snapshot_at:%H:%M:%S}")
+    return breaker.snapshot
+
+def guarded_loader(label):
+    """Put a cached loader behind its circuit breaker
+    
+    The loader raises on failure, so st.cache_data never caches a failed load
+    and the next run retries - unless the breaker has opened, in which case
+    the source is left alone and the last good snapshot is served.
+    """
+    def decorate(loader):
+        @functools.wraps(loader)
+        def wrapper(*args, **kwargs):
+            breaker = sheets_breaker(loader.__name__)
+            if not breaker.allow():
+                return serve_snapshot(breaker, label)
+            try:
+                df = loader(*args, **kwargs)
+            except Exception as e:
+                breaker.record_failure(e)
+                st.sidebar.error(f"❌ {label} failed: {str(e)}")
+                return serve_snapshot(breaker, label)
+            breaker.record_success(df)
+            return df
+        wrapper.clear = loader.clear
+        return wrapper
+    return decorate
+
+# ===================== DATA BACKENDS =====================
+# The backends are in pipeline.py. The loaders below wrap them with
+# st.cache_data, the sidebar messages and the fallbacks.
+LOCAL_SOURCE = "Local Files / Database"
+
+def sidebar_notify(level, message):
+    getattr(st.sidebar, level)(message)
+
+def sidebar_debug(title, lines, expanded=False):
+    """``debug`` hook of the processing functions: their notes in a sidebar expander"""
+    with st.sidebar.expander(title, expanded=expanded):
+        for line in lines:
+            st.write(*line)
+
+def sidebar_prepare(prepare):
+    """A pipeline ``prepare_*`` function reporting to the sidebar"""
+    return functools.partial(prepare, notify=sidebar_notify, debug=sidebar_debug)
 
 # ===================== LOAD PAYMENT DATA VIA SERVICE ACCOUNT =====================
+@perf_loader
+@guarded_loader("Service Account")
 @st.cache_data(ttl=120)
 def load_via_service():
-    try:
-        gc = pygsheets.authorize(service_file=SERVICE_FILE)
-        
-        # Open by ID (most reliable method)
-        sh = gc.open_by_key(SPREADSHEET_ID)
-        st.sidebar.success(f"📊 Opened: {sh.title}")
-        
-        # Try to get the specific sheet by GID
-        try:
-            wks = sh.worksheet(property='id', value=SHEET_GID)
-            st.sidebar.info(f"📑 Using sheet: {wks.title} (GID: {SHEET_GID})")
-        except:
-            # Fallback to first sheet
-            wks = sh[0]
-            st.sidebar.warning(f"⚠️ Using first sheet: {wks.title}")
-        
-        # Get all data
-        data = wks.get_all_records()
-        df = pd.DataFrame(data)
-        
-        if df.empty:
-            st.sidebar.warning("📭 Loaded empty dataframe")
-            return None
-            
-        st.sidebar.success(f"✅ Loaded {len(df)} records via Service Account")
-        return df
-        
-    except Exception as e:
-        st.sidebar.error(f"❌ Service Account failed: {str(e)}")
-        return None
+    perf_cache_miss()
+    df = ServiceAccountBackend(notify=sidebar_notify).load("payments")
+    
+    if df.empty:
+        raise DataBackendError("📭 Loaded empty dataframe")
+    
+    st.sidebar.success(f"✅ Loaded {len(df)} records via Service Account")
+    return df
 
 # ===================== LOAD PROPOSAL DATA =====================
+@perf_loader
+@guarded_loader("Service Account proposal load")
 @st.cache_data(ttl=120)
 def load_proposal_data():
     """Load proposal data from Google Sheets"""
-    try:
-        gc = pygsheets.authorize(service_file=SERVICE_FILE)
-        sh = gc.open_by_key(SPREADSHEET_ID)
-        st.sidebar.success(f"📊 Opened spreadsheet: {sh.title}")
-
-        # Debug: List all worksheets
-        st.sidebar.info(f"📑 Available worksheets in '{sh.title}':")
-        worksheets = sh.worksheets()
-        for i, ws in enumerate(worksheets):
-            st.sidebar.info(f"  {i+1}. {ws.title} (ID: {ws.id})")
-        
-        # Try to get proposal sheet by GID
-        try:
-            st.sidebar.info(f"🔍 Looking for sheet with GID: {PROPOSAL_GID}")
-            proposal_wks = sh.worksheet(property='id', value=PROPOSAL_GID)
-            st.sidebar.success(f"✅ Found proposal sheet: {proposal_wks.title} (GID: {PROPOSAL_GID})")
-        except Exception as e:
-            st.sidebar.warning(f"⚠️ Could not find sheet by GID {PROPOSAL_GID}: {str(e)}")
-            
-            # Fallback to sheet name
-            try:
-                st.sidebar.info(f"🔍 Looking for sheet by name: {PROPOSAL_SHEET_NAME}")
-                proposal_wks = sh.worksheet_by_title(PROPOSAL_SHEET_NAME)
-                st.sidebar.success(f"✅ Found proposal sheet by name: {proposal_wks.title}")
-            except Exception as e2:
-                st.sidebar.error(f"❌ Could not find proposal sheet by name '{PROPOSAL_SHEET_NAME}': {str(e2)}")
-                
-                # Try to find any sheet with "proposal" in the name
-                st.sidebar.info("🔍 Searching for sheets with 'proposal' in name...")
-                matching_sheets = [ws for ws in worksheets if 'proposal' in ws.title.lower()]
-                if matching_sheets:
-                    proposal_wks = matching_sheets[0]
-                    st.sidebar.success(f"✅ Using sheet: {proposal_wks.title}")
-                else:
-                    st.sidebar.error("❌ No proposal sheet found")
-                    return None
-        
-        # Get all proposal data
-        st.sidebar.info("📥 Fetching proposal data...")
-        proposal_data = proposal_wks.get_all_records()
-        proposal_df = pd.DataFrame(proposal_data)
-        
-        if proposal_df.empty:
-            st.sidebar.warning("📭 Loaded empty proposal dataframe")
-            return None
-            
-        st.sidebar.success(f"✅ Loaded {len(proposal_df)} proposal records")
-        
-        # Debug: Show column names
-        st.sidebar.info("📋 Proposal columns found:")
-        for col in proposal_df.columns:
-            st.sidebar.info(f"  - {col}")
-            
-        return proposal_df
-        
-    except Exception as e:
-        st.sidebar.error(f"❌ Failed to load proposal data: {str(e)}")
-        return None
+    perf_cache_miss()
+    st.sidebar.info("📥 Fetching proposal data...")
+    proposal_df = ServiceAccountBackend(notify=sidebar_notify).load("proposals")
+    
+    if proposal_df.empty:
+        raise DataBackendError("📭 Loaded empty proposal dataframe")
+    
+    st.sidebar.success(f"✅ Loaded {len(proposal_df)} proposal records")
+    
+    # Debug: Show column names
+    st.sidebar.info("📋 Proposal columns found:")
+    for col in proposal_df.columns:
+        st.sidebar.info(f"  - {col}")
+    
+    return proposal_df
 
 # ===================== ENHANCED CSV LOADING FOR PAYMENT DATA =====================
+@perf_loader
+@guarded_loader("CSV Export")
 @st.cache_data(ttl=120)
 def load_via_csv():
     """Load payment data via CSV export"""
-    try:
-        st.sidebar.info("🔄 Trying to load payment data via CSV export...")
-        
-        # Try different CSV URL formats
-        csv_urls = [
-            f"https://docs.google.com/spreadsheets/d/{SPREADSHEET_ID}/export?format=csv&gid={SHEET_GID}",
-            f"https://docs.google.com/spreadsheets/d/{SPREADSHEET_ID}/gviz/tq?tqx=out:csv&gid={SHEET_GID}",
-            f"https://docs.google.com/spreadsheets/d/{SPREADSHEET_ID}/export?format=csv",
-        ]
-        
-        for i, csv_url in enumerate(csv_urls):
-            try:
-                st.sidebar.info(f"  Trying URL {i+1}...")
-                
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                }
-                import time
-                csv_url += f"&t={int(time.time())}"
-                
-                response = requests.get(csv_url, headers=headers, timeout=30)
-                response.raise_for_status()
-                
-                # Try different encodings
-                encodings = ['utf-8', 'latin-1', 'windows-1252', 'iso-8859-1']
-                
-                for encoding in encodings:
-                    try:
-                        df = pd.read_csv(
-                            io.StringIO(response.text), 
-                            encoding=encoding,
-                            skip_blank_lines=True,
-                            na_filter=False,
-                            dtype=str,
-                            thousands=',',
-                            skipinitialspace=True
-                        )
-                        
-                        df = df.dropna(how='all')
-                        df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
-                        
-                        if not df.empty and len(df.columns) > 1:
-                            st.sidebar.success(f"✅ CSV loaded: {len(df)} records with encoding {encoding}")
-                            return df
-                            
-                    except UnicodeDecodeError:
-                        continue
-                    except Exception as e:
-                        continue
-                        
-            except Exception as e:
-                st.sidebar.warning(f"  URL {i+1} failed: {str(e)}")
-                continue
-        
-        return None
-        
-    except Exception as e:
-        st.sidebar.error(f"❌ CSV Export failed: {str(e)}")
-        return None
+    perf_cache_miss()
+    st.sidebar.info("🔄 Trying to load payment data via CSV export...")
+    return CsvExportBackend(notify=sidebar_notify).load("payments")
 
 # ===================== ENHANCED CSV LOADING FOR PROPOSALS =====================
+@perf_loader
+@guarded_loader("CSV Export")
 @st.cache_data(ttl=120)
 def load_proposal_via_csv():
     """Alternative method to load proposal data via CSV export"""
+    perf_cache_miss()
+    st.sidebar.info("🔄 Trying to load proposal data via CSV export...")
+    return CsvExportBackend(notify=sidebar_notify).load("proposals")
+
+# ===================== SHEETS VALUES API LOADING =====================
+@perf_loader
+@guarded_loader("Sheets API")
+@st.cache_data(ttl=120)
+def load_via_values_api():
+    """Load payment data through the Sheets v4 values API"""
+    perf_cache_miss()
+    st.sidebar.info("🔄 Trying to load payment data via Sheets API...")
+    df = ValuesApiBackend(notify=sidebar_notify).load("payments")
+    if df.empty:
+        raise DataBackendError("📭 Payment sheet returned no rows via Sheets API")
+    return df
+
+@perf_loader
+@guarded_loader("Sheets API")
+@st.cache_data(ttl=120)
+def load_proposal_via_values_api():
+    """Load proposal data through the Sheets v4 values API"""
+    perf_cache_miss()
+    st.sidebar.info("🔄 Trying to load proposal data via Sheets API...")
+    df = ValuesApiBackend(notify=sidebar_notify).load("proposals")
+    if df.empty:
+        raise DataBackendError("📭 Proposal sheet returned no rows via Sheets API")
+    return df
+
+# ===================== LOCAL FILE / DATABASE LOADING =====================
+@perf_loader
+@st.cache_data(ttl=120)
+def load_via_local(path, kind="payments", filters=(), version=None):
+    """Load a sheet from local Parquet/CSV exports or a SQLite database
+    
+    ``version`` is only part of the cache key - pass ``local_data_version(path)``.
+    """
+    perf_cache_miss()
     try:
-        st.sidebar.info("🔄 Trying to load proposal data via CSV export...")
+        backend = local_backend(path, notify=sidebar_notify)
+        st.sidebar.info(f"🔄 Loading {kind} from {backend.name}: `{path}`")
+        with perf_stage(f"{backend.name}.load", "fetch") as record:
+            df = backend.load(kind, filters)
+            record["rows"] = len(df)
         
-        # Try different CSV URL formats
-        csv_urls = [
-            f"https://docs.google.com/spreadsheets/d/{SPREADSHEET_ID}/export?format=csv&gid={PROPOSAL_GID}",
-            f"https://docs.google.com/spreadsheets/d/{SPREADSHEET_ID}/gviz/tq?tqx=out:csv&gid={PROPOSAL_GID}",
-            f"https://docs.google.com/spreadsheets/d/{SPREADSHEET_ID}/export?format=csv",
-        ]
-        
-        for i, csv_url in enumerate(csv_urls):
-            try:
-                st.sidebar.info(f"  Trying URL {i+1}...")
-                
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                }
-                import time
-                csv_url += f"&t={int(time.time())}"
-                
-                response = requests.get(csv_url, headers=headers, timeout=30)
-                response.raise_for_status()
-                
-                # Try different encodings
-                encodings = ['utf-8', 'latin-1', 'windows-1252', 'iso-8859-1']
-                
-                for encoding in encodings:
-                    try:
-                        df = pd.read_csv(
-                            io.StringIO(response.text), 
-                            encoding=encoding,
-                            skip_blank_lines=True,
-                            na_filter=False,
-                            dtype=str,
-                            thousands=',',
-                            skipinitialspace=True
-                        )
-                        
-                        df = df.dropna(how='all')
-                        df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
-                        
-                        if not df.empty and len(df.columns) > 1:
-                            st.sidebar.success(f"✅ CSV loaded: {len(df)} records with encoding {encoding}")
-                            return df
-                            
-                    except UnicodeDecodeError:
-                        continue
-                    except Exception as e:
-                        continue
-                        
-            except Exception as e:
-                st.sidebar.warning(f"  URL {i+1} failed: {str(e)}")
-                continue
+        if df.empty:
+            st.sidebar.warning(f"📭 No {kind} rows in {path}" + (" match the filter" if filters else ""))
+            return None
         
+        st.sidebar.success(f"✅ Loaded {len(df)} {kind} records from {backend.name}")
+        return df
+    
+    except Exception as e:
+        st.sidebar.error(f"❌ Local {kind} load failed: {str(e)}")
         return None
+
+# ===================== SPREADSHEET REGISTRY =====================
+# pipeline.SourceRegistry loads the spreadsheets listed in ``sources.json``
+# and merges them under a "Data Source" column; one registry is kept per
+# version of the file, so its rate limits hold across sessions.
+REGISTRY_SOURCE = "All Spreadsheets (Registry)"
+ALL_UNITS = "All units"
+
+def unit_view(df, unit):
+    """Rows of one business unit of a merged frame, with a version of its own"""
+    if unit in (None, ALL_UNITS) or SOURCE_COLUMN not in df.columns:
+        return df
+    view = apply_mask(df, df[SOURCE_COLUMN] == unit)
+    view.attrs["version"] = hashlib.blake2b(
+        f"{df.attrs.get('version')}|{unit}".encode(), digest_size=16
+    ).hexdigest()
+    return view
+
+@st.cache_resource
+def source_registry(path, mtime):
+    """One registry per file version, so the rate limits hold across sessions"""
+    return SourceRegistry.from_file(path)
+
+def sources_file_version(path=SOURCES_FILE):
+    return os.path.getmtime(path) if os.path.isfile(path) else None
+
+@perf_loader
+@st.cache_data(ttl=120)
+def load_via_registry(path, kind="payments", version=None):
+    """Load and merge a sheet from every spreadsheet in the registry
+    
+    ``version`` is only part of the cache key - pass ``sources_file_version(path)``.
+    """
+    perf_cache_miss()
+    try:
+        registry = source_registry(path, version)
+        st.sidebar.info(f"🔄 Loading {kind} from {len(registry.sources)} spreadsheets "
+                        f"({min(registry.max_workers, len(registry.sources))} at a time)...")
+        with perf_stage("registry.load", "fetch") as record:
+            df, errors = registry.load(kind)
+            record["rows"] = len(df)
+        for name, error in errors.items():
+            st.sidebar.warning(f"⚠️ {name}: {error}")
         
+        if df.empty:
+            st.sidebar.warning(f"📭 No {kind} rows in any registered spreadsheet")
+            return None
+        
+        st.sidebar.success(f"✅ Loaded {len(df)} {kind} records from "
+                           f"{len(registry.sources) - len(errors)}/{len(registry.sources)} spreadsheets")
+        return df
+    
     except Exception as e:
-        st.sidebar.error(f"❌ CSV Export failed: {str(e)}")
+        st.sidebar.error(f"❌ Registry {kind} load failed: {str(e)}")
         return None
 
 # ===================== DEMO DATA (Fallback for Payment only) =====================
@@ -330,321 +394,561 @@ def load_demo_data():
         'Work Status': ['Completed', 'In Progress', 'Pending', 'Completed'],
         'Date': ['01/01/2024', '15/01/2024', '20/01/2024', '25/01/2024']
     }
-    return pd.DataFrame(demo_data)
-
-# ===================== IMPROVED DATA PROCESSING =====================
-def process_raw_data(df):
-    """Process and clean the raw data with enhanced CSV handling"""
-    # Create a clean copy
-    df_clean = df.copy()
-    
-    # Clean column names
-    df_clean.columns = [clean_colname(c) for c in df_clean.columns]
-    
-    # Debug info
-    with st.sidebar.expander("🔍 Payment Debug Info"):
-        st.write("Original columns:", list(df.columns))
-        st.write("Cleaned columns:", list(df_clean.columns))
-        st.write("Data shape:", df_clean.shape)
-        if not df_clean.empty:
-            st.write("First 2 rows sample:", df_clean.head(2).to_dict('records'))
-    
-    # Enhanced column mapping
-    column_mapping = {
-        'unit_name': ['unit_name', 'unit', 'unitname', 'name', 'client', 'customer'],
-        'work_order_no': ['work_order_no', 'work_order', 'wo_no', 'order_no', 'workorder', 'wo_number'],
-        'order_amount': ['order_amount', 'order', 'amount', 'order_amt', 'initial_amount', 'quoted_amount'],
-        'final_amount': ['final_amount', 'final', 'final_amt', 'total_amount', 'grand_total', 'invoice_amount'],
-        'payment_received': ['payment_received', 'received', 'paid', 'payment_received', 'amount_received', 'paid_amount'],
-        'pending_amount': ['pending_amount', 'pending', 'balance', 'due_amount', 'outstanding', 'remaining'],
-        'payment_mode': ['payment_mode', 'mode', 'payment_type', 'type', 'payment_method'],
-        'work_status': ['work_status', 'status', 'job_status', 'project_status', 'completion_status'],
-        'date': ['date', 'p_date', 'payment_date', 'transaction_date', 'invoice_date', 'entry_date']
-    }
+    demo = pd.DataFrame(demo_data)
+    demo.attrs["demo"] = True  # never logged as a version of a real sheet
+    return demo
+
+# ===================== PROPOSAL ANALYTICS FUNCTIONS =====================
+@st.cache_data(ttl=600, max_entries=8, show_spinner=False)
+def cached_proposal_insights(version, _proposal_df):
+    """Proposal insights computed once per dataset version"""
+    perf_cache_miss()
+    return get_proposal_insights(_proposal_df)
+
+# ===================== CHART BUILDERS =====================
+DARK_LAYOUT = dict(
+    paper_bgcolor='rgba(0,0,0,0)',
+    plot_bgcolor='rgba(0,0,0,0)',
+    font_color="white",
+)
+TOP_LEGEND = dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+
+PROPOSAL_STATUS_COLORS = {
+    'OK': '#10B981',
+    'Drop': '#F59E0B',  # Changed from #EF4444 to #F59E0B for Follow-up
+    'Pending': '#F59E0B',
+    'Approved': '#10B981',
+    'Rejected': '#EF4444',
+    'Under Review': '#8B5CF6',
+    'Ongoing': '#3B82F6',
+    'Others': '#6B7280',
+    'Follow-up': '#F59E0B'  # Added Follow-up color
+}
+
+PRESENT_STATUS_COLORS = {
+    'Ongoing': '#3B82F6',
+    'Others': '#6B7280',
+    'Approved': '#10B981',
+    'Pending': '#F59E0B',
+    'Completed': '#10B981',
+    'Rejected': '#EF4444',
+    'Follow-up': '#F59E0B'  # Added Follow-up color
+}
+
+def _pie_layout(fig, legend=True, selected=()):
+    fig.update_layout(
+        **DARK_LAYOUT,
+        showlegend=True,
+        **({'legend': TOP_LEGEND} if legend else {}),
+        height=400
+    )
+    fig.update_traces(textposition='inside', textinfo='percent+label')
+    if selected:
+        # Pull the cross-filtered slices out of the pie
+        fig.update_traces(pull=[0.08 if str(label) in selected else 0 for label in fig.data[0].labels])
+    return fig
+
+def pending_received_figure(total_received, total_pending):
+    """Pie chart: Pending vs Received"""
+    pie_df = pd.DataFrame({
+        "Status": ["Received", "Pending"],
+        "Amount": [total_received, total_pending]
+    })
+    
+    colors = ['#10B981', '#EF4444']
+    
+    fig = px.pie(pie_df, names="Status", values="Amount", hole=0.45,
+                color_discrete_sequence=colors)
+    return _pie_layout(fig)
+
+def payment_mode_figure(df, totals=None, selected=()):
+    """Pie chart: received amount by payment mode, or None when there is nothing to show
     
-    # Apply column mapping with feedback
-    mapped_count = 0
-    for standard_name, possible_names in column_mapping.items():
-        for possible_name in possible_names:
-            if possible_name in df_clean.columns and standard_name not in df_clean.columns:
-                df_clean.rename(columns={possible_name: standard_name}, inplace=True)
-                mapped_count += 1
-                st.sidebar.info(f"📝 Mapped '{possible_name}' → '{standard_name}'")
-                break
-    
-    # Ensure required columns exist
-    required_cols = ['order_amount', 'final_amount', 'payment_received']
-    for col in required_cols:
-        if col not in df_clean.columns:
-            df_clean[col] = 0.0
-            st.sidebar.warning(f"⚠️ Column '{col}' not found, using defaults")
-    
-    # Handle pending_amount separately
-    if 'pending_amount' not in df_clean.columns:
-        st.sidebar.info("🔄 'pending_amount' column not found, will calculate it")
-        df_clean['pending_amount'] = 0.0
-    
-    # Enhanced numeric conversion with debugging
-    numeric_cols = ['order_amount', 'final_amount', 'payment_received', 'pending_amount']
-    conversion_debug = {}
-    
-    for col in numeric_cols:
-        if col in df_clean.columns:
-            # Store sample values for debugging
-            original_samples = df_clean[col].head(3).tolist()
-            
-            # Apply conversion
-            df_clean[col] = df_clean[col].apply(safe_num)
-            
-            # Store converted samples
-            converted_samples = df_clean[col].head(3).tolist()
-            conversion_debug[col] = {
-                'original': original_samples,
-                'converted': converted_samples,
-                'total': df_clean[col].sum()
-            }
+    ``totals`` (received per mode, e.g. cross-filtered) replaces the groupby over ``df``.
+    """
+    if totals is None:
+        totals = df.groupby("payment_mode")["payment_received"].sum()
+    mode_df = totals.rename_axis("payment_mode").rename("payment_received").reset_index()
+    mode_df = mode_df[mode_df["payment_received"] > 0]
     
-    # Show conversion debug
-    with st.sidebar.expander("💰 Number Conversion Debug"):
-        for col, debug_info in conversion_debug.items():
-            st.write(f"**{col}:**")
-            st.write(f"  Original: {debug_info['original']}")
-            st.write(f"  Converted: {debug_info['converted']}")
-            st.write(f"  Total: ₹ {debug_info['total']:,.2f}")
-    
-    # Calculate pending amount (CRITICAL FIX)
-    if all(col in df_clean.columns for col in ['final_amount', 'payment_received']):
-        calculated_pending = df_clean['final_amount'] - df_clean['payment_received']
-        
-        # Always use calculated pending for accuracy
-        df_clean['pending_amount'] = calculated_pending.clip(lower=0)
-        
-        # Show validation
-        existing_total = conversion_debug.get('pending_amount', {}).get('total', 0)
-        calculated_total = calculated_pending.sum()
-        
-        st.sidebar.info(f"💰 Pending Amount Validation:")
-        st.sidebar.info(f"   CSV Provided: ₹ {existing_total:,.2f}")
-        st.sidebar.info(f"   Calculated: ₹ {calculated_total:,.2f}")
-        
-        if abs(existing_total - calculated_total) > 100:
-            st.sidebar.success("✅ Using calculated pending amounts for accuracy")
+    if mode_df.empty:
+        return None
     
-    # Process work status
-    if 'work_status' not in df_clean.columns:
-        df_clean['work_status'] = 'Unknown'
-    else:
-        df_clean['work_status'] = df_clean['work_status'].fillna('Unknown').astype(str).str.strip().str.title()
+    fig = px.pie(mode_df, names="payment_mode", values="payment_received", 
+                hole=0.45, color_discrete_sequence=px.colors.qualitative.Set3)
+    return _pie_layout(fig, selected=selected)
+
+def status_pending_figure(df, totals=None, selected=()):
+    """Pie chart: pending amount by work status, or None when nothing is pending"""
+    if totals is None:
+        totals = df.groupby("work_status")["pending_amount"].sum()
+    status_pending = totals.rename_axis("work_status").rename("pending_amount").reset_index()
+    status_pending = status_pending[status_pending["pending_amount"] > 0]
+    
+    if status_pending.empty:
+        return None
     
-    # Process payment mode
-    if 'payment_mode' not in df_clean.columns:
-        df_clean['payment_mode'] = 'Unknown'
-    else:
-        df_clean['payment_mode'] = df_clean['payment_mode'].fillna('Unknown').astype(str).str.strip().str.title()
-    
-    # Process dates
-    date_cols = ['date', 'p_date', 'payment_date']
-    for date_col in date_cols:
-        if date_col in df_clean.columns:
-            df_clean['payment_date'] = df_clean[date_col].apply(parse_date)
-            break
-    else:
-        df_clean['payment_date'] = pd.NaT
+    fig = px.pie(status_pending, names="work_status", values="pending_amount", 
+                hole=0.45, color_discrete_sequence=px.colors.qualitative.Pastel)
+    return _pie_layout(fig, selected=selected)
+
+def yearly_figure(df):
+    """Grouped bar chart: amounts per year, or None without year data"""
+    yearly_data = payment_year_summary(df)
     
-    df_clean['year'] = df_clean['payment_date'].dt.year.fillna(datetime.now().year).astype(int)
+    if yearly_data.empty:
+        return None
     
-    # Final summary
-    st.sidebar.success(f"✅ Processed {len(df_clean)} records")
-    st.sidebar.info(f"📊 Final Totals:")
-    st.sidebar.info(f"   Order: ₹ {df_clean['order_amount'].sum():,.2f}")
-    st.sidebar.info(f"   Final: ₹ {df_clean['final_amount'].sum():,.2f}")
-    st.sidebar.info(f"   Received: ₹ {df_clean['payment_received'].sum():,.2f}")
-    st.sidebar.info(f"   Pending: ₹ {df_clean['pending_amount'].sum():,.2f}")
+    fig = px.bar(
+        yearly_data,
+        x='year',
+        y=['order_amount', 'final_amount', 'payment_received'],
+        title='Year-wise Amount Comparison',
+        labels={'value': 'Amount (₹)', 'year': 'Year', 'variable': 'Type'},
+        barmode='group',
+        color_discrete_sequence=['#3B82F6', '#8B5CF6', '#10B981']
+    )
+    fig.update_layout(**DARK_LAYOUT, legend=TOP_LEGEND)
+    return fig
+
+def aging_figure(table, dimension):
+    """Stacked bar chart: pending amount per aging bucket, top 15 rows of an aging table"""
+    if table.empty:
+        return None
+    top = table.drop(columns="Total").head(15).iloc[::-1]
+    fig = go.Figure([
+        go.Bar(name=str(bucket), y=top.index.astype(str), x=top[bucket], orientation='h',
+               marker_color=AGING_COLORS[AGING_BUCKETS.index(bucket)])
+        for bucket in top.columns
+    ])
+    fig.update_layout(
+        **DARK_LAYOUT,
+        barmode='stack',
+        legend=TOP_LEGEND,
+        xaxis_title="Pending Amount (₹)",
+        yaxis_title=dimension,
+        height=max(350, 28 * len(top) + 120)
+    )
+    return fig
+
+TREND_MOVING_AVERAGE = {"Daily": 30, "Monthly": 3, "Quarterly": 2}  # periods
+
+def trend_figure(series, labels, view="Period totals", level="Monthly"):
+    """Line chart of rollup totals: per period, cumulative or moving average"""
+    if series.empty:
+        return None
+    data = series[list(labels)]
+    if view == "Cumulative":
+        data = data.cumsum()
+    elif view == "Moving average":
+        data = data.rolling(TREND_MOVING_AVERAGE[level], min_periods=1).mean()
+    
+    fig = go.Figure([
+        go.Scatter(x=data.index, y=data[column], name=label, mode='lines+markers' if len(data) < 60 else 'lines',
+                   line=dict(color=color))
+        for (column, label), color in zip(labels.items(), ['#3B82F6', '#8B5CF6', '#10B981', '#F59E0B'])
+    ])
+    fig.update_layout(
+        **DARK_LAYOUT,
+        legend=TOP_LEGEND,
+        title=f"{level} {view.lower()}",
+        xaxis_title="Period",
+        yaxis_title="Amount (₹)",
+        hovermode="x unified"
+    )
+    return fig
+
+def funnel_figure(funnel):
+    """Funnel chart: submitted -> followed up -> decided -> won"""
+    if not funnel or not funnel.get("Submitted"):
+        return None
+    fig = go.Figure(go.Funnel(
+        y=list(funnel), x=list(funnel.values()),
+        textinfo="value+percent initial",
+        marker=dict(color=['#3B82F6', '#8B5CF6', '#F59E0B', '#10B981'])
+    ))
+    fig.update_layout(**DARK_LAYOUT, height=380)
+    return fig
+
+def win_rate_figure(table, dimension):
+    """Grouped bars: count and value-weighted win rate, top 15 rows of a win-rate table"""
+    top = table[table['decided'] > 0].head(15)
+    if top.empty:
+        return None
+    labels = top.index.astype(str)
+    fig = go.Figure([
+        go.Bar(name="Win rate", x=labels, y=top['win_rate'], marker_color='#10B981',
+               customdata=top[['won', 'decided']], hovertemplate="%{y:.1f}% (%{customdata[0]} of %{customdata[1]})"),
+        go.Bar(name="Value win rate", x=labels, y=top['value_win_rate'], marker_color='#3B82F6',
+               hovertemplate="%{y:.1f}%"),
+    ])
+    fig.update_layout(
+        **DARK_LAYOUT,
+        barmode='group',
+        legend=TOP_LEGEND,
+        xaxis_title=dimension,
+        yaxis_title="Win rate (%)",
+        yaxis_range=[0, 100],
+        height=380
+    )
+    return fig
+
+def _counts(values, counts):
+    """Value counts, largest first: precomputed ``counts`` when given"""
+    return values.value_counts() if counts is None else counts.sort_values(ascending=False)
+
+def proposal_status_figure(proposal_df, counts=None, selected=()):
+    """Pie chart: Proposal Status Distribution"""
+    status_counts = _counts(proposal_df['status'], counts).reset_index()
+    status_counts.columns = ['Status', 'Count']
+    
+    fig = px.pie(status_counts, names='Status', values='Count', hole=0.4,
+                color='Status', color_discrete_map=PROPOSAL_STATUS_COLORS)
+    return _pie_layout(fig, selected=selected)
+
+def present_status_figure(proposal_df, counts=None, selected=()):
+    """Pie chart: Present Status Distribution"""
+    present_status_counts = _counts(proposal_df['present_status'], counts).reset_index()
+    present_status_counts.columns = ['Present Status', 'Count']
+    
+    fig = px.pie(present_status_counts, names='Present Status', values='Count', hole=0.4,
+                color='Present Status', color_discrete_map=PRESENT_STATUS_COLORS)
+    return _pie_layout(fig, selected=selected)
+
+def value_by_status_figure(proposal_df, totals=None):
+    """Bar chart: Total Value by Status"""
+    if totals is None:
+        totals = proposal_df.groupby('status')['amount'].sum()
+    value_by_status = totals.rename_axis('status').rename('amount').reset_index()
+    value_by_status = value_by_status.sort_values('amount', ascending=False)
+    
+    fig = px.bar(value_by_status, x='status', y='amount',
+                 labels={'amount': 'Total Value (₹)', 'status': 'Status'},
+                 color='status',
+                 color_discrete_map={
+                     'OK': '#10B981',
+                     'Drop': '#F59E0B',  # Changed from #EF4444 to #F59E0B for Follow-up
+                     'Pending': '#F59E0B',
+                     'Approved': '#10B981',
+                     'Follow-up': '#F59E0B'  # Added Follow-up color
+                 })
+    fig.update_layout(
+        **DARK_LAYOUT,
+        xaxis_title="Status",
+        yaxis_title="Total Value (₹)",
+        showlegend=False
+    )
+    fig.update_traces(texttemplate='₹%{y:,.2f}', textposition='outside')
+    return fig
+
+def top_clients_figure(proposal_df, totals=None):
+    """Horizontal bar chart: Top Clients by Proposal Value"""
+    if totals is None:
+        # Canonical client when available, so spelling variants add up
+        totals = proposal_df['amount'].groupby(proposal_client_labels(proposal_df)).sum()
+    top_clients = totals.rename_axis('client_short').rename('amount').reset_index()
+    top_clients = top_clients.sort_values('amount', ascending=False).head(10)
+    
+    fig = px.bar(top_clients, x='amount', y='client_short', orientation='h',
+                 labels={'amount': 'Total Value (₹)', 'client_short': 'Client'},
+                 color='amount',
+                 color_continuous_scale='Viridis')
+    fig.update_layout(
+        **DARK_LAYOUT,
+        xaxis_title="Total Value (₹)",
+        yaxis_title="Client",
+        showlegend=False
+    )
+    fig.update_traces(texttemplate='₹%{x:,.2f}', textposition='outside')
+    return fig
+
+def industry_figure(proposal_df, counts=None, selected=()):
+    """Pie chart: Industry Type Distribution"""
+    industry_counts = _counts(proposal_df['industry_type'], counts).reset_index()
+    industry_counts.columns = ['Industry Type', 'Count']
     
-    return df_clean
+    fig = px.pie(industry_counts, names='Industry Type', values='Count', hole=0.4)
+    return _pie_layout(fig, legend=False, selected=selected)
 
-def process_proposal_data(proposal_df):
-    """Process and clean proposal data based on your sheet structure"""
-    if proposal_df.empty:
-        return proposal_df
+def source_figure(proposal_df, counts=None):
+    """Bar chart: Source Distribution"""
+    source_counts = _counts(proposal_df['source'], counts).reset_index()
+    source_counts.columns = ['Source', 'Count']
+    
+    fig = px.bar(source_counts, x='Source', y='Count',
+                 labels={'Count': 'Number of Proposals', 'Source': 'Source'},
+                 color='Count',
+                 color_continuous_scale='Blues')
+    fig.update_layout(
+        **DARK_LAYOUT,
+        xaxis_title="Source",
+        yaxis_title="Number of Proposals",
+        showlegend=False
+    )
+    fig.update_traces(texttemplate='%{y}', textposition='outside')
+    return fig
+
+# ===================== STATUS SUMMARIES =====================
+# Each summary is rendered as one HTML block rather than one st.markdown per
+# status. Counts, classes and HTML are built once per dataset version.
+def proposal_status_class(status):
+    if status.upper() == 'OK':
+        return "status-ok"
+    if status.upper() == 'DROP':
+        return "status-followup"  # Changed from "status-drop" to "status-followup"
+    lowered = status.lower()
+    if 'pending' in lowered:
+        return "status-pending"
+    if 'ongoing' in lowered:
+        return "status-ongoing"
+    if 'follow' in lowered:
+        return "status-followup"
+    return "status-others"
+
+def present_status_class(status):
+    lowered = status.lower()
+    for keyword, status_class in (
+        ('ongoing', "status-ongoing"),
+        ('approved', "status-approved"),
+        ('pending', "status-pending"),
+        ('rejected', "status-rejected"),
+        ('follow', "status-followup"),
+    ):
+        if keyword in lowered:
+            return status_class
+    return "status-others"
+
+def _status_items_html(items):
+    """One ``status-summary`` block from ``(label html, value html)`` pairs"""
+    rows = "".join(
+        f'<div class="status-item">{label}<span>{value}</span></div>' for label, value in items
+    )
+    return f'<div class="status-summary">{rows}</div>'
+
+def status_counts_html(series, classify):
+    """Count per status, each status coloured by its CSS class"""
+    counts = series.value_counts()
+    return _status_items_html(
+        (f'<span class="{classify(status)}">{html.escape(str(status))}</span>', count)
+        for status, count in counts.items()
+    )
+
+STATUS_CLASSIFIERS = {"status": proposal_status_class, "present_status": present_status_class}
+
+@st.cache_data(ttl=600, max_entries=16, show_spinner=False)
+def cached_status_counts_html(version, column, _proposal_df):
+    """Status summary of one proposal column, built once per dataset version"""
+    perf_cache_miss()
+    return status_counts_html(_proposal_df[column], STATUS_CLASSIFIERS[column])
+
+def payment_status_summary_html(summary):
+    """Status-wise count and pending amount; completed work shows nothing pending"""
+    completed = summary["work_status"].str.lower() == "completed"
+    pending = summary["actual_pending"].where(~completed, 0.0)
+    colors = completed.map({True: "#10B981", False: "#F59E0B"})
+    return _status_items_html(
+        (f'<span style="color: {color}; font-weight: 600;">{html.escape(str(status))}</span>',
+         f"Count: {count} | ₹ {amount:,.2f}")
+        for status, count, amount, color in zip(summary["work_status"], summary["count"], pending, colors)
+    )
+
+# ===================== RECORD DRILL-DOWN =====================
+# One marker per work order, drawn with WebGL. The browser never receives
+# more than a bounded payload: the server cuts the records down to the zoomed
+# range first. When that range still holds more than DRILLDOWN_POINT_LIMIT
+# records, they are binned into a DRILLDOWN_BINS x DRILLDOWN_BINS grid, and
+# each non-empty cell is drawn in the colour of its most common status. Box
+# selecting on the chart zooms in, so detail is only sent for the visible range.
+DRILLDOWN_POINT_LIMIT = 5_000
+DRILLDOWN_BINS = 100
+DRILLDOWN_AXES = {
+    "final_amount": "Final Amount",
+    "payment_received": "Received",
+    "order_amount": "Order Amount",
+    "pending_amount": "Pending",
+}
+DRILLDOWN_HOVER = ["work_order_no", "unit_name"]
+
+class DrilldownPoints:
+    """Two amount columns of a frame sorted by x, with status codes, for range queries"""
+    
+    def __init__(self, df, x, y, color="work_status"):
+        xs = df[x].to_numpy(dtype="float64", na_value=np.nan)
+        ys = df[y].to_numpy(dtype="float64", na_value=np.nan)
+        rows = np.flatnonzero(~(np.isnan(xs) | np.isnan(ys)))
+        order = rows[np.argsort(xs[rows], kind="stable")]
+        self.x, self.y = xs[order], ys[order]
+        self.rows = order  # row positions in the frame, for hover details
+        statuses = pd.Categorical(df[color].astype(str))
+        self.codes = statuses.codes[order]
+        self.labels = np.asarray(statuses.categories, dtype=object)
+    
+    def bounds(self):
+        if not len(self.x):
+            return (0.0, 0.0), (0.0, 0.0)
+        return (float(self.x[0]), float(self.x[-1])), (float(self.y.min()), float(self.y.max()))
+    
+    def visible(self, x_range, y_range):
+        """Positions into the sorted arrays of the points inside both ranges"""
+        start = np.searchsorted(self.x, x_range[0], side="left")
+        stop = np.searchsorted(self.x, x_range[1], side="right")
+        ys = self.y[start:stop]
+        return start + np.flatnonzero((ys >= y_range[0]) & (ys <= y_range[1]))
+    
+    def density(self, positions, x_range, y_range, bins=DRILLDOWN_BINS):
+        """Non-empty cells of a bins x bins grid: centres, record count and most common status"""
+        def cell(values, lo, hi):
+            width = (hi - lo) / bins or 1.0
+            return np.clip(((values - lo) / width).astype("int64"), 0, bins - 1), width
+        
+        ix, x_width = cell(self.x[positions], *x_range)
+        iy, y_width = cell(self.y[positions], *y_range)
+        statuses = len(self.labels)
+        per_status = np.bincount((ix * bins + iy) * statuses + self.codes[positions],
+                                 minlength=bins * bins * statuses).reshape(bins * bins, statuses)
+        counts = per_status.sum(axis=1)
+        cells = np.flatnonzero(counts)
+        return pd.DataFrame({
+            "x": x_range[0] + (cells // bins + 0.5) * x_width,
+            "y": y_range[0] + (cells % bins + 0.5) * y_width,
+            "records": counts[cells],
+            "status": self.labels[per_status[cells].argmax(axis=1)],
+        })
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def drilldown_points(version, x, y, _df):
+    """Sorted point arrays per dataset version and axis pair, shared by every session"""
+    with perf_stage("drilldown.index", "aggregate", rows=len(_df)):
+        return DrilldownPoints(_df, x, y)
+
+def drilldown_view(df, points, x_range, y_range, rows=None):
+    """Points (with hover columns) or density cells for the range, never more than the limits
+    
+    ``rows`` (frame positions, e.g. a cross-filter's) limits the view to those records.
+    """
+    positions = points.visible(x_range, y_range)
+    if rows is not None:
+        selected = np.zeros(len(df), dtype=bool)
+        selected[rows] = True
+        positions = positions[selected[points.rows[positions]]]
+    if len(positions) <= DRILLDOWN_POINT_LIMIT:
+        hover = [c for c in DRILLDOWN_HOVER if c in df.columns]
+        view = df.iloc[points.rows[positions]][hover].reset_index(drop=True)
+        view = view.assign(x=points.x[positions], y=points.y[positions],
+                           status=points.labels[points.codes[positions]])
+        return "points", view, len(positions)
+    return "density", points.density(positions, x_range, y_range), len(positions)
+
+def drilldown_figure(mode, view, x_label, y_label, x_range, y_range):
+    """WebGL scatter of the view, one trace per status so the legend toggles them"""
+    fig = go.Figure()
+    for status, group in view.groupby("status", sort=True):
+        color = PRESENT_STATUS_COLORS.get(status)
+        if mode == "points":
+            details = [c for c in DRILLDOWN_HOVER if c in group.columns]
+            hover = "".join(f"<br>{c}: %{{customdata[{i}]}}" for i, c in enumerate(details))
+            fig.add_trace(go.Scattergl(
+                x=group["x"], y=group["y"], mode="markers", name=status,
+                marker=dict(size=6, opacity=0.7, color=color),
+                customdata=group[details].to_numpy(),
+                hovertemplate=f"{x_label}: ₹ %{{x:,.2f}}<br>{y_label}: ₹ %{{y:,.2f}}{hover}<extra>{status}</extra>",
+            ))
+        else:
+            fig.add_trace(go.Scattergl(
+                x=group["x"], y=group["y"], mode="markers", name=status,
+                marker=dict(symbol="square", color=color, size=5 + 3 * np.log10(group["records"]),
+                            opacity=0.8),
+                customdata=group["records"],
+                hovertemplate=f"{x_label} ≈ ₹ %{{x:,.0f}}<br>{y_label} ≈ ₹ %{{y:,.0f}}"
+                              f"<br>%{{customdata:,}} records<extra>{status}</extra>",
+            ))
+    fig.update_layout(
+        **DARK_LAYOUT,
+        xaxis_title=x_label,
+        yaxis_title=y_label,
+        xaxis_range=list(x_range),
+        yaxis_range=list(y_range),
+        legend=TOP_LEGEND,
+        dragmode="select",
+        height=500,
+    )
+    return fig
+
+def display_drilldown(df, rows=None):
+    """Per-record scatter of two amounts, of all records or the ``rows`` positions; box-select to zoom"""
+    if "work_status" not in df.columns:
+        return
+    axes = [c for c in DRILLDOWN_AXES if c in df.columns]
+    if len(axes) < 2:
+        return
     
-    df_clean = proposal_df.copy()
-    
-    # Clean column names
-    df_clean.columns = [clean_colname(c) for c in df_clean.columns]
-    
-    # Show debug info in main area for better visibility
-    st.sidebar.subheader("📋 Proposal Data Processing")
-    with st.sidebar.expander("🔍 Proposal Debug Info", expanded=True):
-        st.write("**Raw columns found:**", list(proposal_df.columns))
-        st.write("**Cleaned columns:**", list(df_clean.columns))
-        st.write("**Data shape:**", df_clean.shape)
-        if not df_clean.empty:
-            st.write("**First 3 rows:**")
-            st.dataframe(df_clean.head(3))
-            st.write("**Column types:**")
-            st.write(df_clean.dtypes)
-    
-    # Enhanced column mapping for proposals
-    column_mapping = {
-        's_no': ['s_no', 'sno', 'sl_no', 'serial_no', 'serial_number'],
-        'year': ['year', 'yr', 'year_'],
-        'date': ['date', 'proposal_date', 'submission_date'],
-        'wo_date': ['wo_date', 'work_order_date', 'order_date'],
-        'no': ['no', 'wo_no', 'work_order_no', 'order_no'],
-        'name': ['name', 'client_name', 'company', 'customer', 'client'],
-        'industry_type': ['industry_type', 'industry', 'business_type', 'sector'],
-        'district': ['district', 'location', 'city_district', 'area'],
-        'scope_of_work': ['scope_of_work', 'scope', 'work_scope', 'description'],
-        'type': ['type', 'proposal_type', 'category'],
-        'source': ['source', 'lead_source', 'referral_source'],
-        'status': ['status', 'proposal_status', 'current_status'],
-        'refrence_no': ['refrence_no', 'reference_no', 'ref_no', 'proposal_no'],
-        'contact_person': ['contact_person', 'contact', 'person', 'representative'],
-        'amount': ['amount', 'proposal_amount', 'value', 'quoted_amount'],
-        'present_status': ['present_status', 'current_status', 'latest_status', 'status_update']
-    }
+    col1, col2, col3 = st.columns([2, 2, 1])
+    with col1:
+        x = st.selectbox("X axis", axes, format_func=DRILLDOWN_AXES.get, key="drilldown_x")
+    with col2:
+        y = st.selectbox("Y axis", [c for c in axes if c != x], format_func=DRILLDOWN_AXES.get, key="drilldown_y")
+    
+    points = drilldown_points(version_of(df), x, y, df)
+    # Zoom stack per axis pair; the widest entry is the whole data range
+    zoom = st.session_state.get("drilldown_zoom")
+    if not zoom or zoom["axes"] != (x, y, version_of(df)):
+        zoom = {"axes": (x, y, version_of(df)), "ranges": [points.bounds()], "box": None}
+        st.session_state["drilldown_zoom"] = zoom
+    
+    # A new box selection on the chart becomes the next zoom level
+    event = st.session_state.get("drilldown_chart")
+    boxes = event.get("selection", {}).get("box", []) if event else []
+    if boxes and boxes[0] != zoom["box"]:
+        zoom["box"] = boxes[0]
+        box_x, box_y = sorted(boxes[0]["x"]), sorted(boxes[0]["y"])
+        if box_x[1] > box_x[0] and box_y[1] > box_y[0]:
+            zoom["ranges"].append((tuple(box_x), tuple(box_y)))
     
-    # Apply column mapping with feedback
-    mapped_count = 0
-    for standard_name, possible_names in column_mapping.items():
-        for possible_name in possible_names:
-            if possible_name in df_clean.columns and standard_name not in df_clean.columns:
-                df_clean.rename(columns={possible_name: standard_name}, inplace=True)
-                mapped_count += 1
-                st.sidebar.info(f"📝 Mapped '{possible_name}' → '{standard_name}'")
-                break
-    
-    # Process amount column
-    if 'amount' in df_clean.columns:
-        st.sidebar.info(f"💰 Processing amount column...")
-        df_clean['amount'] = df_clean['amount'].apply(safe_num)
-        st.sidebar.success(f"✅ Total proposal value: ₹ {df_clean['amount'].sum():,.2f}")
+    with col3:
+        if st.button("🔍 Zoom out", key="drilldown_out", disabled=len(zoom["ranges"]) < 2):
+            zoom["ranges"].pop()
+        if st.button("↺ Reset", key="drilldown_reset", disabled=len(zoom["ranges"]) < 2):
+            del zoom["ranges"][1:]
+    
+    x_range, y_range = zoom["ranges"][-1]
+    with perf_stage("drilldown.view", "aggregate", rows=len(points.x)) as record:
+        mode, view, visible = drilldown_view(df, points, x_range, y_range, rows)
+        record["rows"] = len(view)
+    
+    if mode == "points":
+        st.caption(f"{visible:,} records in view, each drawn as a point. Box-select to zoom in.")
     else:
-        st.sidebar.warning("⚠️ Amount column not found in proposal data")
-        df_clean['amount'] = 0.0
-    
-    # Process dates
-    date_columns = ['date', 'wo_date']
-    for date_col in date_columns:
-        if date_col in df_clean.columns:
-            st.sidebar.info(f"📅 Processing {date_col} column...")
-            df_clean[date_col] = df_clean[date_col].apply(parse_date)
-    
-    # Process year (convert to integer if possible)
-    if 'year' in df_clean.columns:
-        try:
-            df_clean['year'] = pd.to_numeric(df_clean['year'], errors='coerce').fillna(0).astype(int)
-        except:
-            pass
+        st.caption(f"{visible:,} records in view, binned into {len(view):,} cells coloured by their most common "
+                   f"status. Box-select to zoom in; individual records show below {DRILLDOWN_POINT_LIMIT:,}.")
     
-    # Clean status columns
-    status_columns = ['status', 'present_status']
-    for status_col in status_columns:
-        if status_col in df_clean.columns:
-            df_clean[status_col] = df_clean[status_col].fillna('Unknown').astype(str).str.strip().str.title()
-    
-    # Clean other text columns
-    text_columns = ['name', 'industry_type', 'district', 'scope_of_work', 'type', 'source', 'refrence_no', 'contact_person']
-    for col in text_columns:
-        if col in df_clean.columns:
-            df_clean[col] = df_clean[col].fillna('').astype(str).str.strip()
-    
-    # Final summary
-    st.sidebar.success(f"✅ Processed {len(df_clean)} proposal records")
-    
-    return df_clean
+    fig = build_chart("drilldown", drilldown_figure, mode, view, DRILLDOWN_AXES[x], DRILLDOWN_AXES[y], x_range, y_range)
+    with perf_stage("render.drilldown", "render"):
+        st.plotly_chart(fig, use_container_width=True, key="drilldown_chart",
+                        on_select="rerun", selection_mode="box")
 
-# ===================== PROPOSAL ANALYTICS FUNCTIONS =====================
-def get_proposal_insights(proposal_df):
-    """Generate insights from proposal data"""
-    insights = {}
-    
-    if proposal_df.empty:
-        return insights
-    
-    # Total proposals
-    insights['total_proposals'] = len(proposal_df)
-    
-    # Total proposal value
-    if 'amount' in proposal_df.columns:
-        insights['total_value'] = proposal_df['amount'].sum()
-    
-    # Status distribution
-    if 'status' in proposal_df.columns:
-        status_counts = proposal_df['status'].value_counts()
-        insights['status_distribution'] = status_counts.to_dict()
-    
-    # Present status distribution
-    if 'present_status' in proposal_df.columns:
-        present_status_counts = proposal_df['present_status'].value_counts()
-        insights['present_status_distribution'] = present_status_counts.to_dict()
-    
-    # Industry type distribution
-    if 'industry_type' in proposal_df.columns:
-        industry_counts = proposal_df['industry_type'].value_counts()
-        insights['industry_distribution'] = industry_counts.to_dict()
-    
-    # District distribution
-    if 'district' in proposal_df.columns:
-        district_counts = proposal_df['district'].value_counts()
-        insights['district_distribution'] = district_counts.to_dict()
-    
-    # Source distribution
-    if 'source' in proposal_df.columns:
-        source_counts = proposal_df['source'].value_counts()
-        insights['source_distribution'] = source_counts.to_dict()
-    
-    # Yearly distribution
-    if 'year' in proposal_df.columns:
-        year_counts = proposal_df['year'].value_counts().sort_index()
-        insights['yearly_distribution'] = year_counts.to_dict()
-    
-    # Calculate conversion rate (OK vs Total)
-    if 'status' in proposal_df.columns:
-        ok_count = len(proposal_df[proposal_df['status'].str.upper() == 'OK'])
-        insights['conversion_rate'] = (ok_count / len(proposal_df)) * 100 if len(proposal_df) > 0 else 0
-    
-    return insights
+# ===================== DOWNLOADS =====================
+def export_csv(df):
+    """CSV bytes of a frame for download, without the internal bookkeeping columns"""
+    return df.drop(columns=INTERNAL_COLUMNS, errors="ignore").to_csv(index=False).encode("utf-8")
 
-# ===================== PROPOSAL DASHBOARD (Structured like Payment Dashboard) =====================
-def display_proposal_dashboard(proposal_df):
-    """Display proposal dashboard structured like payment dashboard"""
-    
-    if proposal_df.empty:
-        st.error("❌ No proposal data available. Please check your connection and try again.")
-        st.info("""
-        **Troubleshooting steps:**
-        1. Check if the Google Sheet is shared with the service account email
-        2. Verify the Proposal GID (`1356001164`) is correct
-        3. Check if the proposal sheet exists in the spreadsheet
-        4. Ensure the service account JSON file is in the correct location
-        5. Refresh the page and try again
-        """)
+# ===================== PAYMENT DASHBOARD =====================
+def display_payment_dashboard(df):
+    """KPIs, charts, trends, aging and the filterable records of the payment sheet"""
+    if df.empty:
+        st.warning("No payment data loaded. Please check your connection and try again.")
         return
     
-    # Get insights
-    insights = get_proposal_insights(proposal_df)
-    
-    # ===================== PROPOSAL KPIs =====================
-    total_proposals = insights.get('total_proposals', 0)
-    total_value = insights.get('total_value', 0)
-    
-    # Calculate approved/OK count
-    approved_count = 0
-    if 'status' in proposal_df.columns:
-        approved_count = len(proposal_df[proposal_df['status'].str.upper() == 'OK'])
-    
-    # Calculate Follow-up count (changed from dropped/rejected)
-    followup_count = 0
-    if 'status' in proposal_df.columns:
-        # Count Drop status as Follow-up
-        followup_count = len(proposal_df[proposal_df['status'].str.upper() == 'DROP'])
+    # Chart clicks are taken in before the selection pills below are drawn
+    cube = crossfilter_cube("payments", version_of(df), df)
+    selections = crossfilter_selections("payments", cube)
     
-    # Calculate conversion rate
-    conversion_rate = insights.get('conversion_rate', 0)
+    # ===================== KPIs =====================
+    total_order = df["order_amount"].sum()
+    total_final = df["final_amount"].sum()
+    total_received = df["payment_received"].sum()
+    total_pending = df["pending_amount"].sum()
     
-    st.markdown('<div class="section-header">📊 Proposal Overview</div>', unsafe_allow_html=True)
+    st.markdown('<div class="section-header">📈 Key Performance Indicators</div>', unsafe_allow_html=True)
     
     st.markdown('<div class="kpi-row">', unsafe_allow_html=True)
     col1, col2, col3, col4 = st.columns(4)
@@ -652,150 +956,373 @@ def display_proposal_dashboard(proposal_df):
     with col1:
         st.markdown(f"""
             <div class="metric-card">
-                <div class="metric-title">Total Proposals</div>
-                <div class="metric-value">{total_proposals}</div>
+                <div class="metric-title">Total Order Amount</div>
+                <div class="metric-value">₹ {total_order:,.2f}</div>
             </div>
         """, unsafe_allow_html=True)
     
     with col2:
         st.markdown(f"""
             <div class="metric-card">
-                <div class="metric-title">Total Value</div>
-                <div class="metric-value">₹ {total_value:,.2f}</div>
+                <div class="metric-title">Total Final Amount</div>
+                <div class="metric-value">₹ {total_final:,.2f}</div>
             </div>
         """, unsafe_allow_html=True)
     
     with col3:
         st.markdown(f"""
             <div class="metric-card">
-                <div class="metric-title">Approved/OK</div>
-                <div class="metric-value">{approved_count}</div>
+                <div class="metric-title">Total Received</div>
+                <div class="metric-value">₹ {total_received:,.2f}</div>
             </div>
         """, unsafe_allow_html=True)
     
     with col4:
-        # Changed from "Dropped/Rejected" to "Follow-up"
         st.markdown(f"""
             <div class="metric-card">
-                <div class="metric-title">Follow-up</div>
-                <div class="metric-value">{followup_count}</div>
+                <div class="metric-title">Total Pending</div>
+                <div class="metric-value">₹ {total_pending:,.2f}</div>
             </div>
         """, unsafe_allow_html=True)
     st.markdown('</div>', unsafe_allow_html=True)
+    display_kpi_comparison("payments", df)
     
     # ===================== PIE CHARTS SECTION =====================
-    st.markdown('<div class="section-header">📈 Proposal Analytics</div>', unsafe_allow_html=True)
+    st.markdown('<div class="section-header">💰 Payment Analytics</div>', unsafe_allow_html=True)
+    
+    display_crossfilter_bar("payments", selections)
+    with perf_stage("crossfilter.payments", "filter", rows=len(df)):
+        views = {dimension: cube.aggregate(dimension, selections) for dimension in cube.codes}
+        selected_total = cube.total(selections)
+        rows = cube.rows(selections)
+        selected_df = df if rows is None else df.iloc[rows]
     
     col1, col2 = st.columns(2)
     
-    # Pie chart: Proposal Status Distribution
+    # Pie chart: Pending vs Received
     with col1:
         st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-        st.markdown("**Proposal Status Distribution**")
+        st.markdown("**Pending vs Received**")
         
-        if 'status' in proposal_df.columns and not proposal_df['status'].empty:
-            status_counts = proposal_df['status'].value_counts().reset_index()
-            status_counts.columns = ['Status', 'Count']
-            
-            # Define color mapping for specific status values
-            status_colors = {
-                'OK': '#10B981',
-                'Drop': '#F59E0B',  # Changed from #EF4444 to #F59E0B for Follow-up
-                'Pending': '#F59E0B',
-                'Approved': '#10B981',
-                'Rejected': '#EF4444',
-                'Under Review': '#8B5CF6',
-                'Ongoing': '#3B82F6',
-                'Others': '#6B7280',
-                'Follow-up': '#F59E0B'  # Added Follow-up color
-            }
-            
-            # Create pie chart
-            fig = px.pie(status_counts, names='Status', values='Count', hole=0.4,
-                        color='Status', color_discrete_map=status_colors)
-            fig.update_layout(
-                paper_bgcolor='rgba(0,0,0,0)',
-                plot_bgcolor='rgba(0,0,0,0)',
-                font_color="white",
-                showlegend=True,
-                legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-                height=400
-            )
-            fig.update_traces(textposition='inside', textinfo='percent+label')
-            st.plotly_chart(fig, use_container_width=True)
-        else:
-            st.info("Status data not available in proposal data")
+        fig = build_chart("pending_received", pending_received_figure,
+                          selected_total["payment_received"], selected_total["pending_amount"])
+        render_chart("pending_received", fig)
         st.markdown('</div>', unsafe_allow_html=True)
     
-    # Pie chart: Present Status Distribution
+    # Pie chart: Payment mode distribution
     with col2:
         st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-        st.markdown("**Present Status Distribution**")
+        st.markdown("**Payment Mode Distribution**")
         
-        if 'present_status' in proposal_df.columns and not proposal_df['present_status'].empty:
-            present_status_counts = proposal_df['present_status'].value_counts().reset_index()
-            present_status_counts.columns = ['Present Status', 'Count']
-            
-            # Define color mapping
-            present_status_colors = {
-                'Ongoing': '#3B82F6',
-                'Others': '#6B7280',
-                'Approved': '#10B981',
-                'Pending': '#F59E0B',
-                'Completed': '#10B981',
-                'Rejected': '#EF4444',
-                'Follow-up': '#F59E0B'  # Added Follow-up color
-            }
+        if "payment_mode" in df.columns and not df["payment_mode"].empty:
+            fig2 = build_chart("payment_mode", payment_mode_figure, df, views["payment_mode"]["payment_received"],
+                               selections.get("payment_mode", ()))
             
-            # Create pie chart
-            fig2 = px.pie(present_status_counts, names='Present Status', values='Count', hole=0.4,
-                         color='Present Status', color_discrete_map=present_status_colors)
-            fig2.update_layout(
-                paper_bgcolor='rgba(0,0,0,0)',
-                plot_bgcolor='rgba(0,0,0,0)',
-                font_color="white",
-                showlegend=True,
-                legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-                height=400
-            )
-            fig2.update_traces(textposition='inside', textinfo='percent+label')
-            st.plotly_chart(fig2, use_container_width=True)
+            if fig2 is not None:
+                render_chart("payment_mode", fig2)
+            else:
+                st.info("No payment mode data available")
+            crossfilter_pills("payments", "payment_mode", cube)
         else:
-            st.info("Present Status data not available")
+            st.info("Payment Mode column not available")
         st.markdown('</div>', unsafe_allow_html=True)
     
-    # ===================== VALUE ANALYSIS =====================
+    # ===================== STATUS WISE PENDING PIE CHART =====================
     col1, col2 = st.columns(2)
     
-    # Bar chart: Value by Status
     with col1:
         st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-        st.markdown("**Total Value by Status**")
+        st.markdown("**Status-wise Pending Distribution**")
         
-        if 'amount' in proposal_df.columns and 'status' in proposal_df.columns:
-            value_by_status = proposal_df.groupby('status')['amount'].sum().reset_index()
-            value_by_status = value_by_status.sort_values('amount', ascending=False)
-            
-            fig3 = px.bar(value_by_status, x='status', y='amount',
-                         labels={'amount': 'Total Value (₹)', 'status': 'Status'},
-                         color='status',
-                         color_discrete_map={
-                             'OK': '#10B981',
-                             'Drop': '#F59E0B',  # Changed from #EF4444 to #F59E0B for Follow-up
-                             'Pending': '#F59E0B',
-                             'Approved': '#10B981',
-                             'Follow-up': '#F59E0B'  # Added Follow-up color
-                         })
-            fig3.update_layout(
-                paper_bgcolor='rgba(0,0,0,0)',
-                plot_bgcolor='rgba(0,0,0,0)',
-                font_color="white",
-                xaxis_title="Status",
-                yaxis_title="Total Value (₹)",
-                showlegend=False
+        fig3 = build_chart("status_pending", status_pending_figure, df, views["work_status"]["pending_amount"],
+                           selections.get("work_status", ()))
+        
+        if fig3 is not None:
+            render_chart("status_pending", fig3)
+        else:
+            st.info("No pending amounts by status")
+        crossfilter_pills("payments", "work_status", cube)
+        st.markdown('</div>', unsafe_allow_html=True)
+    
+    # ===================== STATUS WISE SUMMARY =====================
+    with col2:
+        st.markdown("**Status-wise Summary**")
+        
+        with perf_stage("status_summary", "aggregate", rows=len(selected_df)):
+            summary = payment_status_summary(selected_df)
+        
+        st.markdown(payment_status_summary_html(summary), unsafe_allow_html=True)
+    
+    # ===================== YEARLY SUMMARY CHART =====================
+    st.markdown('<div class="section-header">📅 Year-wise Summary</div>', unsafe_allow_html=True)
+    
+    if 'year' in df.columns:
+        fig4 = build_chart("yearly", yearly_figure, selected_df)
+        
+        if fig4 is not None:
+            st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+            render_chart("yearly", fig4)
+            st.markdown('</div>', unsafe_allow_html=True)
+    
+    # ===================== RECORD DRILL-DOWN =====================
+    st.markdown('<div class="section-header">🔬 Record Drill-down</div>', unsafe_allow_html=True)
+    
+    display_drilldown(df, rows)
+    
+    # ===================== TRENDS =====================
+    st.markdown('<div class="section-header">📈 Payment Trends</div>', unsafe_allow_html=True)
+    
+    if selections:
+        st.caption(CROSSFILTER_NOT_APPLIED)
+    if "payment_date" in df.columns:
+        display_trends(update_rollup(payment_rollup(stream_of("payments", df)), df), {
+            "final_amount": "Final Amount",
+            "payment_received": "Received",
+            "pending_amount": "Pending",
+        }, key="payment_trend")
+    
+    # ===================== RECEIVABLES AGING =====================
+    st.markdown('<div class="section-header">⏳ Receivables Aging</div>', unsafe_allow_html=True)
+    
+    if "payment_date" in df.columns:
+        # A cross-filter ages its own rows; otherwise the stream's incremental store is used
+        day_totals = (update_aging_store(df, aging_store(stream_of("payments", df))) if rows is None
+                      else receivables_frame(selected_df))
+        
+        aging_col1, aging_col2 = st.columns(2)
+        with aging_col1:
+            aging_dimension = st.selectbox("Age receivables by", list(AGING_DIMENSIONS), key="aging_dimension")
+        with aging_col2:
+            reference_date = st.date_input("As of", value=datetime.now().date(), key="aging_reference")
+        
+        with perf_stage("aging_table", "aggregate", rows=len(day_totals)):
+            aging = aging_table(day_totals, reference_date, AGING_DIMENSIONS[aging_dimension])
+        
+        if aging.empty:
+            st.info("No pending amounts to age")
+        else:
+            st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+            render_chart("aging", build_chart("aging", aging_figure, aging, aging_dimension))
+            st.markdown('</div>', unsafe_allow_html=True)
+            st.dataframe(
+                aging.rename_axis(aging_dimension).map("₹ {:,.2f}".format),
+                use_container_width=True,
+                height=300
             )
-            fig3.update_traces(texttemplate='₹%{y:,.2f}', textposition='outside')
-            st.plotly_chart(fig3, use_container_width=True)
+    
+    # ===================== FILTERS SECTION =====================
+    st.markdown('<div class="section-header">🔍 Filter Records</div>', unsafe_allow_html=True)
+    
+    filter_col1, filter_col2, filter_col3, filter_col4 = st.columns(4)
+    
+    with filter_col1:
+        # Status filter
+        status_options = ["All"] + sorted(list(df["work_status"].unique()))
+        selected_status = st.selectbox("Filter by Status", status_options, key="payment_status")
+    
+    with filter_col2:
+        # Payment mode filter
+        if "payment_mode" in df.columns:
+            mode_options = ["All"] + sorted(list(df["payment_mode"].unique()))
+            selected_mode = st.selectbox("Filter by Payment Mode", mode_options, key="payment_mode_filter")
+        else:
+            selected_mode = "All"
+    
+    with filter_col3:
+        # Unit filter
+        if "unit_name" in df.columns:
+            # Canonical clients group the spellings of one unit; the table shows both
+            unit_column = "client" if "client" in df.columns else "unit_name"
+            unit_options = ["All"] + sorted(list(df[unit_column].dropna().unique()))
+            unit_label = "Filter by Canonical Client" if unit_column == "client" else "Filter by Unit"
+            selected_unit = st.selectbox(unit_label, unit_options, key="payment_unit")
+        else:
+            selected_unit = "All"
+    
+    with filter_col4:
+        # Amount range filter
+        min_amount = float(df["final_amount"].min())
+        max_amount = float(df["final_amount"].max())
+        amount_range = st.slider(
+            "Filter by Final Amount (₹)",
+            min_value=min_amount,
+            max_value=max_amount,
+            value=(min_amount, max_amount),
+            key="payment_amount"
+        )
+    
+    # Apply filters, within the rows the chart selections leave
+    with perf_stage("payment_filters", "filter", rows=len(df)):
+        mask = payment_filter_mask(selected_df, selected_status, selected_mode, selected_unit, amount_range)
+        filtered_df = apply_mask(selected_df, mask)
+    
+    # ===================== RECORDS TABLE =====================
+    st.markdown('<div class="section-header">📋 Detailed Records</div>', unsafe_allow_html=True)
+    
+    # Display filtered results summary
+    st.metric("Filtered Records", len(filtered_df))
+    
+    # Data table with better styling
+    display_columns = []
+    for col in ['unit_name', 'client', 'work_order_no', 'order_amount', 'final_amount', 
+                'payment_received', 'pending_amount', 'payment_mode', 'work_status', 'date']:
+        if col in filtered_df.columns:
+            display_columns.append(col)
+    
+    if display_columns:
+        # Format numeric columns for display
+        display_df = filtered_df[display_columns]
+        numeric_cols = ['order_amount', 'final_amount', 'payment_received', 'pending_amount']
+        display_df = display_df.assign(**{
+            col: display_df[col].map("₹ {:,.2f}".format)
+            for col in numeric_cols if col in display_df.columns
+        })
+        
+        st.dataframe(
+            display_df,
+            use_container_width=True,
+            height=400
+        )
+    else:
+        st.dataframe(filtered_df, use_container_width=True, height=400)
+    
+    # ===================== DOWNLOAD SECTION =====================
+    st.markdown("---")
+    csv = export_csv(filtered_df)
+    st.download_button(
+        "📥 Download Filtered CSV", 
+        csv, 
+        "filtered_payment_data.csv",
+        type="primary"
+    )
+
+# ===================== PROPOSAL DASHBOARD (Structured like Payment Dashboard) =====================
+def display_proposal_dashboard(proposal_df):
+    """Display proposal dashboard structured like payment dashboard"""
+    
+    if proposal_df.empty:
+        st.error("❌ No proposal data available. Please check your connection and try again.")
+        st.info("""
+        **Troubleshooting steps:**
+        1. Check if the Google Sheet is shared with the service account email
+        2. Verify the Proposal GID (`1356001164`) is correct
+        3. Check if the proposal sheet exists in the spreadsheet
+        4. Ensure the service account JSON file is in the correct location
+        5. Refresh the page and try again
+        """)
+        return
+    
+    # Get insights
+    with perf_cached_stage("get_proposal_insights", "aggregate", rows=len(proposal_df)):
+        insights = cached_proposal_insights(version_of(proposal_df), proposal_df)
+    
+    # Chart clicks are taken in before the selection pills below are drawn
+    cube = crossfilter_cube("proposals", version_of(proposal_df), proposal_df)
+    selections = crossfilter_selections("proposals", cube)
+    
+    # ===================== PROPOSAL KPIs =====================
+    total_proposals = insights.get('total_proposals', 0)
+    total_value = insights.get('total_value', 0)
+    stage_counts = insights.get('stage_counts', {})
+    
+    # Calculate approved/OK count
+    approved_count = stage_counts.get('won', 0)
+    
+    # Calculate Follow-up count (changed from dropped/rejected)
+    # Count Drop status as Follow-up
+    followup_count = stage_counts.get('dropped', 0)
+    
+    # Calculate conversion rate
+    conversion_rate = insights.get('conversion_rate', 0)
+    
+    st.markdown('<div class="section-header">📊 Proposal Overview</div>', unsafe_allow_html=True)
+    
+    st.markdown('<div class="kpi-row">', unsafe_allow_html=True)
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.markdown(f"""
+            <div class="metric-card">
+                <div class="metric-title">Total Proposals</div>
+                <div class="metric-value">{total_proposals}</div>
+            </div>
+        """, unsafe_allow_html=True)
+    
+    with col2:
+        st.markdown(f"""
+            <div class="metric-card">
+                <div class="metric-title">Total Value</div>
+                <div class="metric-value">₹ {total_value:,.2f}</div>
+            </div>
+        """, unsafe_allow_html=True)
+    
+    with col3:
+        st.markdown(f"""
+            <div class="metric-card">
+                <div class="metric-title">Approved/OK</div>
+                <div class="metric-value">{approved_count}</div>
+            </div>
+        """, unsafe_allow_html=True)
+    
+    with col4:
+        # Changed from "Dropped/Rejected" to "Follow-up"
+        st.markdown(f"""
+            <div class="metric-card">
+                <div class="metric-title">Follow-up</div>
+                <div class="metric-value">{followup_count}</div>
+            </div>
+        """, unsafe_allow_html=True)
+    st.markdown('</div>', unsafe_allow_html=True)
+    display_kpi_comparison("proposals", proposal_df)
+    
+    # ===================== PIE CHARTS SECTION =====================
+    st.markdown('<div class="section-header">📈 Proposal Analytics</div>', unsafe_allow_html=True)
+    
+    display_crossfilter_bar("proposals", selections)
+    with perf_stage("crossfilter.proposals", "filter", rows=len(proposal_df)):
+        views = {dimension: cube.aggregate(dimension, selections) for dimension in cube.codes}
+    
+    col1, col2 = st.columns(2)
+    
+    # Pie chart: Proposal Status Distribution
+    with col1:
+        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+        st.markdown("**Proposal Status Distribution**")
+        
+        if 'status' in proposal_df.columns and not proposal_df['status'].empty:
+            render_chart("proposal_status", build_chart("proposal_status", proposal_status_figure, proposal_df,
+                                                        views["status"]["rows"], selections.get("status", ())))
+            crossfilter_pills("proposals", "status", cube)
+        else:
+            st.info("Status data not available in proposal data")
+        st.markdown('</div>', unsafe_allow_html=True)
+    
+    # Pie chart: Present Status Distribution
+    with col2:
+        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+        st.markdown("**Present Status Distribution**")
+        
+        if 'present_status' in proposal_df.columns and not proposal_df['present_status'].empty:
+            render_chart("present_status", build_chart("present_status", present_status_figure, proposal_df,
+                                                       views["present_status"]["rows"],
+                                                       selections.get("present_status", ())))
+            crossfilter_pills("proposals", "present_status", cube)
+        else:
+            st.info("Present Status data not available")
+        st.markdown('</div>', unsafe_allow_html=True)
+    
+    # ===================== VALUE ANALYSIS =====================
+    col1, col2 = st.columns(2)
+    
+    # Bar chart: Value by Status
+    with col1:
+        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+        st.markdown("**Total Value by Status**")
+        
+        if 'amount' in proposal_df.columns and 'status' in proposal_df.columns:
+            render_chart("value_by_status", build_chart("value_by_status", value_by_status_figure, proposal_df,
+                                                        views["status"]["amount"]),
+                         key="crossfilter_proposals_value_by_status_chart")
         else:
             st.info("Amount or Status data not available for value analysis")
         st.markdown('</div>', unsafe_allow_html=True)
@@ -806,28 +1333,9 @@ def display_proposal_dashboard(proposal_df):
         st.markdown("**Top Clients by Proposal Value**")
         
         if 'amount' in proposal_df.columns and 'name' in proposal_df.columns:
-            # Extract client names (take first part before comma)
-            proposal_df['client_short'] = proposal_df['name'].apply(
-                lambda x: str(x).split(',')[0].strip() if pd.notnull(x) else 'Unknown'
-            )
-            
-            top_clients = proposal_df.groupby('client_short')['amount'].sum().reset_index()
-            top_clients = top_clients.sort_values('amount', ascending=False).head(10)
-            
-            fig4 = px.bar(top_clients, x='amount', y='client_short', orientation='h',
-                         labels={'amount': 'Total Value (₹)', 'client_short': 'Client'},
-                         color='amount',
-                         color_continuous_scale='Viridis')
-            fig4.update_layout(
-                paper_bgcolor='rgba(0,0,0,0)',
-                plot_bgcolor='rgba(0,0,0,0)',
-                font_color="white",
-                xaxis_title="Total Value (₹)",
-                yaxis_title="Client",
-                showlegend=False
-            )
-            fig4.update_traces(texttemplate='₹%{x:,.2f}', textposition='outside')
-            st.plotly_chart(fig4, use_container_width=True)
+            render_chart("top_clients", build_chart("top_clients", top_clients_figure, proposal_df,
+                                                    views["client"]["amount"]),
+                         key="crossfilter_proposals_top_clients_chart")
         else:
             st.info("Amount or Name data not available for client analysis")
         st.markdown('</div>', unsafe_allow_html=True)
@@ -835,79 +1343,68 @@ def display_proposal_dashboard(proposal_df):
     # ===================== STATUS SUMMARY =====================
     st.markdown('<div class="section-header">📝 Status Summary</div>', unsafe_allow_html=True)
     
+    if selections:
+        st.caption(CROSSFILTER_NOT_APPLIED)
     col1, col2 = st.columns(2)
+    version = version_of(proposal_df)
     
     with col1:
-        st.markdown('<div class="status-summary">', unsafe_allow_html=True)
         st.markdown("**Proposal Status Breakdown**")
         
         if 'status' in proposal_df.columns:
-            status_summary = proposal_df['status'].value_counts().reset_index()
-            status_summary.columns = ['Status', 'Count']
-            
-            for _, row in status_summary.iterrows():
-                status = row['Status']
-                count = row['Count']
-                
-                # Determine CSS class based on status
-                if status.upper() == 'OK':
-                    status_class = "status-ok"
-                elif status.upper() == 'DROP':
-                    status_class = "status-followup"  # Changed from "status-drop" to "status-followup"
-                elif 'pending' in status.lower():
-                    status_class = "status-pending"
-                elif 'ongoing' in status.lower():
-                    status_class = "status-ongoing"
-                elif 'follow' in status.lower():
-                    status_class = "status-followup"
-                else:
-                    status_class = "status-others"
-                
-                st.markdown(f"""
-                    <div class="status-item">
-                        <span class="{status_class}">{status}</span>
-                        <span>{count}</span>
-                    </div>
-                """, unsafe_allow_html=True)
+            with perf_cached_stage("status_summary.status", "aggregate", rows=len(proposal_df)):
+                summary_html = cached_status_counts_html(version, 'status', proposal_df)
+            st.markdown(summary_html, unsafe_allow_html=True)
         else:
             st.info("No status data available in proposal data")
-        st.markdown('</div>', unsafe_allow_html=True)
     
     with col2:
-        st.markdown('<div class="status-summary">', unsafe_allow_html=True)
         st.markdown("**Present Status Breakdown**")
         
         if 'present_status' in proposal_df.columns:
-            present_status_summary = proposal_df['present_status'].value_counts().reset_index()
-            present_status_summary.columns = ['Present Status', 'Count']
-            
-            for _, row in present_status_summary.iterrows():
-                present_status = row['Present Status']
-                count = row['Count']
-                
-                # Determine CSS class based on present status
-                if 'ongoing' in present_status.lower():
-                    status_class = "status-ongoing"
-                elif 'approved' in present_status.lower():
-                    status_class = "status-approved"
-                elif 'pending' in present_status.lower():
-                    status_class = "status-pending"
-                elif 'rejected' in present_status.lower():
-                    status_class = "status-rejected"
-                elif 'follow' in present_status.lower():
-                    status_class = "status-followup"
-                else:
-                    status_class = "status-others"
-                
-                st.markdown(f"""
-                    <div class="status-item">
-                        <span class="{status_class}">{present_status}</span>
-                        <span>{count}</span>
-                    </div>
-                """, unsafe_allow_html=True)
+            with perf_cached_stage("status_summary.present_status", "aggregate", rows=len(proposal_df)):
+                summary_html = cached_status_counts_html(version, 'present_status', proposal_df)
+            st.markdown(summary_html, unsafe_allow_html=True)
         else:
             st.info("No present status data available")
-        st.markdown('</div>', unsafe_allow_html=True)
+    
+    # ===================== PIPELINE FUNNEL =====================
+    if insights.get('funnel'):
+        st.markdown('<div class="section-header">🎯 Pipeline Funnel & Win Rates</div>', unsafe_allow_html=True)
+        if selections:
+            st.caption(CROSSFILTER_NOT_APPLIED)
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown("**Proposal Funnel**")
+            render_chart("proposal_funnel", build_chart("proposal_funnel", funnel_figure, insights['funnel']))
+            st.caption(f"Win rate of decided proposals: {insights.get('win_rate', 0):.1f}%")
+        with col2:
+            win_rates = insights.get('win_rates', {})
+            if win_rates:
+                dimension = st.selectbox("Win rate by", list(win_rates), key="win_rate_dimension")
+                fig = build_chart("win_rate", win_rate_figure, win_rates[dimension], dimension)
+                if fig is None:
+                    st.info("No decided (OK / Drop) proposals yet.")
+                else:
+                    render_chart("win_rate", fig)
+        if win_rates:
+            with st.expander(f"Win rates by {dimension.lower()}"):
+                st.dataframe(
+                    win_rates[dimension].rename(columns={
+                        'proposals': 'Proposals', 'value': 'Value (₹)', 'decided': 'Decided', 'won': 'Won',
+                        'decided_value': 'Decided Value (₹)', 'won_value': 'Won Value (₹)',
+                        'win_rate': 'Win Rate (%)', 'value_win_rate': 'Value Win Rate (%)',
+                    }).round(1),
+                    use_container_width=True
+                )
+    
+    # ===================== PROPOSAL TRENDS =====================
+    if 'date' in proposal_df.columns and 'amount' in proposal_df.columns:
+        st.markdown('<div class="section-header">📈 Proposal Trends</div>', unsafe_allow_html=True)
+        if selections:
+            st.caption(CROSSFILTER_NOT_APPLIED)
+        rollup = proposal_rollup(stream_of("proposals", proposal_df))
+        display_trends(update_rollup(rollup, proposal_df), {"amount": "Proposal Value"}, key="proposal_trend")
     
     # ===================== DISTRIBUTION CHARTS =====================
     st.markdown('<div class="section-header">📋 Distribution Analysis</div>', unsafe_allow_html=True)
@@ -919,19 +1416,9 @@ def display_proposal_dashboard(proposal_df):
         st.markdown("**Industry Type Distribution**")
         
         if 'industry_type' in proposal_df.columns and not proposal_df['industry_type'].empty:
-            industry_counts = proposal_df['industry_type'].value_counts().reset_index()
-            industry_counts.columns = ['Industry Type', 'Count']
-            
-            fig5 = px.pie(industry_counts, names='Industry Type', values='Count', hole=0.4)
-            fig5.update_layout(
-                paper_bgcolor='rgba(0,0,0,0)',
-                plot_bgcolor='rgba(0,0,0,0)',
-                font_color="white",
-                showlegend=True,
-                height=400
-            )
-            fig5.update_traces(textposition='inside', textinfo='percent+label')
-            st.plotly_chart(fig5, use_container_width=True)
+            render_chart("industry", build_chart("industry", industry_figure, proposal_df,
+                                                 views["industry_type"]["rows"], selections.get("industry_type", ())))
+            crossfilter_pills("proposals", "industry_type", cube)
         else:
             st.info("Industry Type data not available")
         st.markdown('</div>', unsafe_allow_html=True)
@@ -941,29 +1428,1405 @@ def display_proposal_dashboard(proposal_df):
         st.markdown("**Source Distribution**")
         
         if 'source' in proposal_df.columns and not proposal_df['source'].empty:
-            source_counts = proposal_df['source'].value_counts().reset_index()
-            source_counts.columns = ['Source', 'Count']
-            
-            fig6 = px.bar(source_counts, x='Source', y='Count',
-                         labels={'Count': 'Number of Proposals', 'Source': 'Source'},
-                         color='Count',
-                         color_continuous_scale='Blues')
-            fig6.update_layout(
-                paper_bgcolor='rgba(0,0,0,0)',
-                plot_bgcolor='rgba(0,0,0,0)',
-                font_color="white",
-                xaxis_title="Source",
-                yaxis_title="Number of Proposals",
-                showlegend=False
-            )
-            fig6.update_traces(texttemplate='%{y}', textposition='outside')
-            st.plotly_chart(fig6, use_container_width=True)
+            render_chart("source", build_chart("source", source_figure, proposal_df, views["source"]["rows"]),
+                         key="crossfilter_proposals_source_chart")
         else:
             st.info("Source data not available")
         st.markdown('</div>', unsafe_allow_html=True)
 
+def display_proposal_records(proposal_df):
+    """Filters, table and download of the proposal sheet"""
+    if proposal_df.empty:
+        return
+    
+    # ===================== PROPOSAL FILTERS SECTION =====================
+    st.markdown('<div class="section-header">🔍 Filter Proposals</div>', unsafe_allow_html=True)
+    
+    filter_col1, filter_col2, filter_col3, filter_col4 = st.columns(4)
+    
+    with filter_col1:
+        # Status filter for proposals
+        if 'status' in proposal_df.columns:
+            proposal_status_options = ["All"] + sorted(list(proposal_df['status'].dropna().unique()))
+            selected_proposal_status = st.selectbox("Filter by Status", proposal_status_options, key="proposal_status")
+        else:
+            selected_proposal_status = "All"
+    
+    with filter_col2:
+        # Present Status filter
+        if 'present_status' in proposal_df.columns:
+            present_status_options = ["All"] + sorted(list(proposal_df['present_status'].dropna().unique()))
+            selected_present_status = st.selectbox("Filter by Present Status", present_status_options, key="present_status")
+        else:
+            selected_present_status = "All"
+    
+    with filter_col3:
+        # Client filter
+        if 'name' in proposal_df.columns:
+            client_column = 'client' if 'client' in proposal_df.columns else 'name'
+            client_options = ["All"] + sorted(list(proposal_df[client_column].dropna().unique()))
+            client_label = "Filter by Canonical Client" if client_column == 'client' else "Filter by Client"
+            selected_client = st.selectbox(client_label, client_options, key="proposal_client")
+        else:
+            selected_client = "All"
+    
+    with filter_col4:
+        # Amount range filter for proposals
+        if 'amount' in proposal_df.columns:
+            prop_min = float(proposal_df['amount'].min())
+            prop_max = float(proposal_df['amount'].max())
+            prop_range = st.slider(
+                "Filter by Amount (₹)",
+                min_value=prop_min,
+                max_value=prop_max,
+                value=(prop_min, prop_max),
+                key="proposal_amount_range"
+            )
+        else:
+            prop_range = (0, 100000000)
+    
+    # Apply proposal filters, within the rows the chart selections leave
+    with perf_stage("proposal_filters", "filter", rows=len(proposal_df)):
+        rows = crossfilter_rows("proposals", proposal_df)
+        selected_proposals = proposal_df if rows is None else proposal_df.iloc[rows]
+        mask = proposal_filter_mask(
+            selected_proposals, selected_proposal_status, selected_present_status, selected_client, prop_range
+        )
+        filtered_proposals = apply_mask(selected_proposals, mask)
+    
+    # ===================== PROPOSAL DATA TABLE =====================
+    st.markdown('<div class="section-header">📋 Proposal Details</div>', unsafe_allow_html=True)
+    
+    # Display filtered proposal count
+    st.metric("Filtered Proposals", len(filtered_proposals))
+    
+    # Display proposal table with styling
+    if not filtered_proposals.empty:
+        # Select columns to display
+        display_cols = []
+        for col in ['s_no', 'sno', 'year', 'date', 'name', 'client', 'industry_type', 'district', 
+                   'scope_of_work', 'type', 'source', 'status', 'refrence_no', 
+                   'contact_person', 'amount', 'present_status']:
+            if col in filtered_proposals.columns:
+                display_cols.append(col)
+        
+        # Format only the displayed columns; assign() leaves the filtered frame untouched
+        display_proposal_df = filtered_proposals[display_cols] if display_cols else filtered_proposals
+        formatted = {}
+        
+        # Format numeric columns
+        if 'amount' in display_proposal_df.columns:
+            formatted['amount'] = display_proposal_df['amount'].map(
+                lambda x: f"₹ {x:,.2f}" if pd.notnull(x) else "N/A"
+            )
+        
+        # Format dates
+        date_columns = ['date', 'wo_date']
+        for date_col in date_columns:
+            if date_col in display_proposal_df.columns:
+                formatted[date_col] = display_proposal_df[date_col].map(
+                    lambda x: x.strftime('%d-%m-%Y') if pd.notnull(x) else ''
+                )
+        
+        st.dataframe(
+            display_proposal_df.assign(**formatted),
+            use_container_width=True,
+            height=500
+        )
+        
+        # Download button for proposals
+        st.markdown("---")
+        proposal_csv = export_csv(filtered_proposals)
+        st.download_button(
+            "📥 Download Filtered Proposals CSV", 
+            proposal_csv, 
+            "filtered_proposals_data.csv",
+            type="primary"
+        )
+    else:
+        st.info("No proposals match the selected filters.")
+
+# ===================== INCREMENTAL STORES =====================
+# The receivables aging store and the time-series rollups (pipeline.py) keep
+# their state between refreshes. Each data stream (see stream_of) has its own,
+# shared by the sessions viewing it, so sessions on different sources never
+# diff against each other.
+STREAM_STORES = 8  # incremental stores kept per kind, one per data stream
+AGING_COLORS = ['#10B981', '#3B82F6', '#F59E0B', '#EF4444', '#6B7280']
+AGING_DIMENSIONS = {"Unit": "unit", "Work Status": "work_status", "Payment Mode": "payment_mode"}
+
+@st.cache_resource(max_entries=STREAM_STORES, show_spinner=False)
+def aging_store(stream):
+    """The aging store of one data stream, shared by the sessions viewing it"""
+    return new_aging_store()
+
+@st.cache_resource(max_entries=STREAM_STORES, show_spinner=False)
+def payment_rollup(stream):
+    """The payment rollup of one data stream, shared by the sessions viewing it"""
+    return new_payment_rollup()
+
+@st.cache_resource(max_entries=STREAM_STORES, show_spinner=False)
+def proposal_rollup(stream):
+    """The proposal rollup of one data stream, shared by the sessions viewing it"""
+    return new_proposal_rollup()
+
+def display_trends(rollup, labels, key):
+    """Trend, cumulative and moving-average views over a rollup snapshot, for a chosen window"""
+    daily = rollup.levels.get("Daily")
+    if daily is None or daily.empty:
+        st.info("No dated records to chart")
+        return
+    first, last = daily.index[0].date(), daily.index[-1].date()
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        level = st.selectbox("Granularity", list(ROLLUP_LEVELS), index=1, key=f"{key}_level")
+    with col2:
+        view = st.selectbox("View", ["Period totals", "Cumulative", "Moving average"], key=f"{key}_view")
+    with col3:
+        # Keyed by the data's span so a different dataset starts from its full range
+        window = st.date_input("Date range", value=(first, last), min_value=first, max_value=last,
+                               key=f"{key}_range_{first}_{last}")
+    start, end = (window[0], window[1]) if len(window) == 2 else (window[0], last)
+    
+    totals = rollup.window_total(start, end)
+    metric_cols = st.columns(len(labels) + 1)
+    metric_cols[0].metric("Records in range", f"{int(totals['rows']):,}")
+    for col, (column, label) in zip(metric_cols[1:], labels.items()):
+        col.metric(label, f"₹ {totals[column]:,.2f}")
+    
+    series = rollup.series(level, start, end)
+    fig = build_chart(f"{key}_trend", trend_figure, series, labels, view, level)
+    if fig is None:
+        st.info("No records in the selected range")
+        return
+    st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+    render_chart(f"{key}_trend", fig)
+    st.markdown('</div>', unsafe_allow_html=True)
+
+# ===================== RECONCILIATION =====================
+# Proposals reference work orders in "No" (sometimes "Refrence No"), written
+# loosely (" wo-0000123 "). Both sides are reduced to a normalised key; the
+# payment side is hash-aggregated to one row per key and the proposals are
+# hash-joined against it, so the cost is linear in the two frames.
+def work_order_key(series):
+    """``' wo-0000123 '`` / ``WO0000123`` -> ``WO0000123``; blanks become NA"""
+    key = series.astype(str).str.upper().str.replace(r"[^0-9A-Z]", "", regex=True)
+    return key.where(key != "")
+
+def proposal_work_order_key(proposal_df, known_keys):
+    """Key from "No"; "Refrence No" only fills blanks where it names a known work order"""
+    keys = work_order_key(proposal_df["no"]) if "no" in proposal_df.columns else pd.Series(
+        pd.NA, index=proposal_df.index, dtype="str"
+    )
+    if "refrence_no" in proposal_df.columns:
+        reference = work_order_key(proposal_df["refrence_no"])
+        keys = keys.mask(keys.isna() & reference.isin(known_keys), reference)
+    return keys
+
+def reconcile(df, proposal_df):
+    """Link proposals to payments by work order
+
+    Returns ``proposals`` (every proposal with the totals of its work order,
+    NaN when unmatched), ``unmatched_payments`` (payment rows no proposal
+    refers to) and a ``summary`` dict.
+    """
+    payment_keys = work_order_key(df["work_order_no"])
+    
+    # One row per work order, however many payment lines it has
+    aggregations = {
+        "payment_lines": ("work_order_no", "size"),
+        "final_amount": ("final_amount", "sum"),
+        "payment_received": ("payment_received", "sum"),
+        "pending_amount": ("pending_amount", "sum"),
+        "work_status": ("work_status", "first"),
+    }
+    if "payment_date" in df.columns:
+        aggregations["first_payment_date"] = ("payment_date", "min")
+    payments_by_key = df.assign(wo_key=payment_keys).dropna(subset=["wo_key"]).groupby(
+        "wo_key", sort=False
+    ).agg(**aggregations)
+    
+    proposal_keys = proposal_work_order_key(proposal_df, payments_by_key.index)
+    linked = proposal_df.assign(wo_key=proposal_keys).join(payments_by_key, on="wo_key")
+    matched = linked["payment_lines"].notna()
+    linked["matched"] = matched
+    if "amount" in linked.columns:
+        linked["realized_ratio"] = linked["final_amount"] / linked["amount"].where(linked["amount"] > 0)
+    if "wo_date" in linked.columns and "first_payment_date" in linked.columns:
+        linked["days_to_payment"] = (linked["first_payment_date"] - linked["wo_date"]).dt.days
+    
+    unmatched_payments = apply_mask(df, ~payment_keys.isin(proposal_keys.dropna().unique()))
+    
+    # Several proposals can cite the same work order; count its payments once
+    realized = payments_by_key.loc[linked.loc[matched, "wo_key"].unique()]
+    quoted = float(linked.loc[matched, "amount"].sum()) if "amount" in linked.columns else 0.0
+    summary = {
+        "proposals": len(proposal_df),
+        "with_work_order": int(proposal_keys.notna().sum()),
+        "matched": int(matched.sum()),
+        "conversion_rate": float(matched.mean() * 100) if len(proposal_df) else 0.0,
+        "quoted_value": quoted,
+        "realized_value": float(realized["final_amount"].sum()),
+        "received_value": float(realized["payment_received"].sum()),
+        "dangling_references": int((proposal_keys.notna() & ~matched).sum()),
+        "duplicate_references": int(linked.loc[matched, "wo_key"].duplicated().sum()),
+        "unmatched_payments": len(unmatched_payments),
+    }
+    return {"proposals": linked, "unmatched_payments": unmatched_payments, "summary": summary}
+
+@st.cache_data(ttl=600, max_entries=8, show_spinner=False)
+def cached_reconciliation(versions, _df, _proposal_df):
+    """Reconciliation computed once per pair of dataset versions"""
+    perf_cache_miss()
+    return reconcile(_df, _proposal_df)
+
+def _metric_card(title, value):
+    st.markdown(f"""
+        <div class="metric-card">
+            <div class="metric-title">{title}</div>
+            <div class="metric-value">{value}</div>
+        </div>
+    """, unsafe_allow_html=True)
+
+def display_reconciliation_dashboard(df, proposal_df):
+    """Proposal-to-payment conversion, realised vs quoted value and unmatched records"""
+    if df.empty or proposal_df.empty:
+        st.info("Reconciliation needs both payment and proposal data.")
+        return
+    if "work_order_no" not in df.columns or not {"no", "refrence_no"} & set(proposal_df.columns):
+        st.info("Work order numbers are missing from the payment or proposal sheet.")
+        return
+    
+    with perf_cached_stage("reconcile", "aggregate", rows=len(df) + len(proposal_df)):
+        result = cached_reconciliation((version_of(df), version_of(proposal_df)), df, proposal_df)
+    summary = result["summary"]
+    linked = result["proposals"]
+    
+    st.markdown('<div class="section-header">🔗 Proposal ↔ Payment Reconciliation</div>', unsafe_allow_html=True)
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        _metric_card("Converted Proposals", f"{summary['matched']} / {summary['proposals']}")
+    with col2:
+        _metric_card("Conversion Rate", f"{summary['conversion_rate']:.1f}%")
+    with col3:
+        _metric_card("Quoted (Converted)", f"₹ {summary['quoted_value']:,.2f}")
+    with col4:
+        _metric_card("Realized (Final Amount)", f"₹ {summary['realized_value']:,.2f}")
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        _metric_card("Received", f"₹ {summary['received_value']:,.2f}")
+    with col2:
+        _metric_card("Unknown WO References", summary["dangling_references"])
+    with col3:
+        _metric_card("Shared WO References", summary["duplicate_references"])
+    with col4:
+        _metric_card("Payments Without Proposal", summary["unmatched_payments"])
+    
+    columns = [c for c in ["no", "client", "name", "status", "wo_date", "amount", "final_amount", "payment_received",
+                           "pending_amount", "realized_ratio", "days_to_payment", "work_status"] if c in linked.columns]
+    
+    st.markdown('<div class="section-header">✅ Converted Proposals</div>', unsafe_allow_html=True)
+    converted = linked.loc[linked["matched"], columns]
+    st.dataframe(converted, use_container_width=True, height=400)
+    st.download_button("📥 Download Converted Proposals CSV", export_csv(converted),
+                       "converted_proposals.csv")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("**Proposals citing an unknown work order**")
+        dangling = linked.loc[linked["wo_key"].notna() & ~linked["matched"],
+                              [c for c in ["no", "refrence_no", "name", "status", "amount"] if c in linked.columns]]
+        st.dataframe(dangling, use_container_width=True, height=300)
+    with col2:
+        st.markdown("**Payments without a proposal**")
+        st.dataframe(
+            result["unmatched_payments"][[c for c in ["unit_name", "work_order_no", "final_amount", "pending_amount",
+                                                      "work_status"] if c in df.columns]],
+            use_container_width=True,
+            height=300
+        )
+
+# ===================== DATA QUALITY =====================
+# Validation runs once per dataset version, on a background thread shared by
+# every session, so no tab waits for it. Each rule is one vectorized mask;
+# the result is a violation index - (rule, column, row position) per
+# violation - from which the Data Quality tab looks rows up without scanning.
+AMOUNT_TOLERANCE = 1.0  # ₹; smaller differences are rounding
+VALIDATION_VERSIONS = 8  # validated versions kept, per dataset
+VALIDATION_ROW_LIMIT = 1000  # offending rows shown per rule
+
+VALIDATION_RULES = {
+    "unparseable_amount": "Amount text that could not be parsed (counted as ₹ 0)",
+    "received_exceeds_final": "Payment received exceeds the final amount",
+    "duplicate_work_order": "Work order number on more than one row",
+    "missing_date": "Date missing or not a date",
+    "future_date": "Date in the future",
+    "amount_mismatch": "Proposal amount differs from the order amount of its work order",
+}
+
+def _violations(rule, column, mask):
+    rows = np.flatnonzero(np.asarray(mask, dtype=bool))
+    return pd.DataFrame({"rule": rule, "column": column, "row": rows})
+
+def _unparsed_violations(df, columns):
+    if "unparsed_amounts" not in df.columns:
+        return []
+    flags = df["unparsed_amounts"].to_numpy()
+    return [_violations("unparseable_amount", col, flags & (1 << bit)) for bit, col in enumerate(columns)]
+
+def _date_violations(df, column, missing=True):
+    if column not in df.columns:
+        return []
+    dates = df[column]
+    found = [_violations("future_date", column, dates > pd.Timestamp.now().normalize() + pd.Timedelta(days=1))]
+    if missing:
+        found.append(_violations("missing_date", column, dates.isna()))
+    return found
+
+def validate_payments(df):
+    """Violation frame (rule, column, row) of the processed payment sheet"""
+    found = _unparsed_violations(df, PAYMENT_AMOUNT_COLUMNS)
+    found.append(_violations(
+        "received_exceeds_final", "payment_received",
+        df["payment_received"] > df["final_amount"] + AMOUNT_TOLERANCE
+    ))
+    if "work_order_no" in df.columns:
+        keys = work_order_key(df["work_order_no"])
+        found.append(_violations("duplicate_work_order", "work_order_no", keys.notna() & keys.duplicated(keep=False)))
+    found += _date_violations(df, "payment_date")
+    return pd.concat(found, ignore_index=True)
+
+def validate_proposals(proposal_df, df=None):
+    """Violation frame of the processed proposal sheet; amounts are checked against ``df`` when given"""
+    found = _unparsed_violations(proposal_df, PROPOSAL_AMOUNT_COLUMNS)
+    found += _date_violations(proposal_df, "date")
+    found += _date_violations(proposal_df, "wo_date", missing=False)
+    if df is not None and not df.empty and "work_order_no" in df.columns and "amount" in proposal_df.columns:
+        ordered = df["order_amount"].groupby(work_order_key(df["work_order_no"]), sort=False).sum()
+        keys = proposal_work_order_key(proposal_df, ordered.index)
+        difference = (proposal_df["amount"] - keys.map(ordered)).abs()
+        found.append(_violations("amount_mismatch", "amount", difference > AMOUNT_TOLERANCE))
+    return pd.concat(found, ignore_index=True)
+
+def violation_index(violations, rows):
+    """Counts per rule and the sorted row positions of each, from a violation frame"""
+    by_rule = violations.groupby(["rule", "column"], sort=False)["row"]
+    summary = by_rule.size().rename("rows").reset_index()
+    summary = summary[summary["rows"] > 0]
+    summary.insert(1, "description", summary["rule"].map(VALIDATION_RULES))
+    return {
+        "rows": rows,
+        "flagged_rows": int(violations["row"].nunique()),
+        "violations": len(violations),
+        "summary": summary.reset_index(drop=True),
+        "index": {key: np.sort(rows_of.to_numpy()) for key, rows_of in by_rule},
+    }
+
+def run_validation(kind, frame, df=None):
+    with perf_stage(f"validate.{kind}", "aggregate", rows=len(frame)):
+        violations = validate_payments(frame) if kind == "payments" else validate_proposals(frame, df)
+        return violation_index(violations, len(frame))
+
+@st.cache_resource
+def validation_jobs():
+    """Background validations shared by every session, keyed by dataset versions"""
+    return {
+        "executor": concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix="validation"),
+        "futures": collections.OrderedDict(),
+        "lock": threading.Lock(),
+    }
+
+def submit_validation(kind, frame, df=None):
+    """Future of the violation index of ``frame``; started at most once per version"""
+    key = (kind, version_of(frame), None if df is None else version_of(df))
+    jobs = validation_jobs()
+    with jobs["lock"]:
+        future = jobs["futures"].get(key)
+        if future is None:
+            future = jobs["executor"].submit(run_validation, kind, frame, df)
+            jobs["futures"][key] = future
+            while len(jobs["futures"]) > 2 * VALIDATION_VERSIONS:
+                jobs["futures"].popitem(last=False)
+        return future
+
+def validation_badge(futures):
+    """Sidebar line with the issue count, without waiting for a running validation"""
+    if not all(future.done() for future in futures):
+        st.sidebar.caption("🧪 Validating data…")
+        return
+    try:
+        flagged = sum(future.result()["flagged_rows"] for future in futures)
+    except Exception as e:
+        st.sidebar.caption(f"🧪 Validation failed: {str(e)}")
+        return
+    st.sidebar.caption(f"🧪 {flagged} rows with data issues" if flagged else "🧪 No data issues found")
+
+def display_data_quality(df, proposal_df):
+    """Rule counts and offending rows of both sheets"""
+    datasets = {"Payments": (df, "payments", None), "Proposals": (proposal_df, "proposals", df)}
+    results = {}
+    with perf_stage("validation", "aggregate") as record:
+        for label, (frame, kind, reference) in datasets.items():
+            if frame is not None and not frame.empty:
+                future = submit_validation(kind, frame, reference)
+                record["cache"] = "hit" if future.done() else "miss"
+                with st.spinner(f"Validating {label.lower()}..."):
+                    results[label] = future.result()
+    if not results:
+        st.info("No data loaded to validate.")
+        return
+    
+    st.markdown('<div class="section-header">🧪 Data Quality</div>', unsafe_allow_html=True)
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        _metric_card("Rows Checked", f"{sum(r['rows'] for r in results.values()):,}")
+    with col2:
+        _metric_card("Rows With Issues", f"{sum(r['flagged_rows'] for r in results.values()):,}")
+    with col3:
+        _metric_card("Violations", f"{sum(r['violations'] for r in results.values()):,}")
+    with col4:
+        _metric_card("Rules Triggered", sum(len(r["summary"]) for r in results.values()))
+    
+    summary = pd.concat(
+        [r["summary"].assign(dataset=label) for label, r in results.items()], ignore_index=True
+    )
+    if summary.empty:
+        st.success("✅ No data issues found")
+        return
+    summary = summary[["dataset", "rule", "description", "column", "rows"]]
+    st.dataframe(summary, use_container_width=True, hide_index=True)
+    
+    # Offending rows of one rule, straight from the index
+    choices = list(summary.itertuples(index=False))
+    choice = st.selectbox(
+        "Show rows for", range(len(choices)), key="quality_rule",
+        format_func=lambda i: f"{choices[i].dataset} · {choices[i].description} [{choices[i].column}] ({choices[i].rows})"
+    )
+    picked = choices[choice]
+    frame = datasets[picked.dataset][0]
+    positions = results[picked.dataset]["index"][(picked.rule, picked.column)]
+    rows = frame.iloc[positions[:VALIDATION_ROW_LIMIT]]
+    if len(positions) > VALIDATION_ROW_LIMIT:
+        st.caption(f"Showing the first {VALIDATION_ROW_LIMIT:,} of {len(positions):,} rows")
+    st.dataframe(rows.drop(columns=INTERNAL_COLUMNS, errors="ignore"), use_container_width=True, height=400)
+    st.download_button(
+        "📥 Download Offending Rows CSV", export_csv(frame.iloc[positions]),
+        f"{picked.dataset.lower()}_{picked.rule}.csv"
+    )
+
+# ===================== CHANGE DATA CAPTURE =====================
+# Each new processed version of a sheet is diffed against the previous
+# version of the same stream - one spreadsheet, local path or registry unit.
+# Rows are keyed by their normalised work order or reference number. An
+# occurrence suffix keeps repeated keys distinct. Each keyed row is reduced to
+# a hash of its tracked columns, so the diff is one hash join. Only the
+# changed fields go into an append-only, gzip-compressed JSON-lines log, and
+# the last state of every stream is kept beside it as zstd Parquet.
+CDC_DIR = os.environ.get("DASHBOARD_CDC_DIR", "cdc")
+CDC_LOG = "changes.jsonl.gz"
+CDC_COLUMNS = {
+    "payments": ["unit_name", "work_order_no", "order_amount", "final_amount", "payment_received",
+                 "pending_amount", "payment_mode", "work_status", "payment_date"],
+    "proposals": ["name", "no", "refrence_no", "status", "present_status", "amount", "date", "wo_date"],
+}
+CDC_OPS = {"insert": "➕ Added", "update": "✏️ Changed", "delete": "➖ Removed"}
+
+def change_keys(kind, df):
+    """Stable row key: work order (payments) or reference / serial number (proposals)"""
+    if kind == "payments":
+        keys = work_order_key(df["work_order_no"]) if "work_order_no" in df.columns else None
+    else:
+        keys = work_order_key(df["refrence_no"]) if "refrence_no" in df.columns else None
+        if "s_no" in df.columns:
+            serial = "SNO" + df["s_no"].astype(str).str.strip()
+            keys = serial if keys is None else keys.fillna(serial)
+    if keys is None:
+        keys = pd.Series(pd.NA, index=df.index, dtype="str")
+    # Unkeyed rows are known by their content, so an edit reads as remove + add
+    missing = keys.isna()
+    if missing.any():
+        content = pd.util.hash_pandas_object(df[missing], index=False)
+        keys = keys.mask(missing, "ROW" + content.map("{:016x}".format))
+    occurrence = keys.groupby(keys, sort=False).cumcount()
+    return keys.where(occurrence == 0, keys + "#" + occurrence.astype(str))
+
+def change_state(kind, df):
+    """Tracked columns indexed by row key, with a ``signature`` column"""
+    columns = [c for c in CDC_COLUMNS[kind] if c in df.columns]
+    state = df[columns].set_axis(change_keys(kind, df).to_numpy())
+    return state.assign(signature=pd.util.hash_pandas_object(state, index=False).to_numpy())
+
+def _json_value(value):
+    if pd.isna(value):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return value.item() if hasattr(value, "item") else value
+
+def diff_states(old, new):
+    """Change records (key, op, changes) turning state ``old`` into ``new``"""
+    # One hash lookup per old key - no sort, so the diff stays linear
+    position = new.index.get_indexer(old.index)
+    kept = position >= 0
+    seen = np.zeros(len(new), dtype=bool)
+    seen[position[kept]] = True
+    inserted = new.index[~seen]
+    deleted = old.index[~kept]
+    changed = old["signature"].to_numpy()[kept] != new["signature"].to_numpy()[position[kept]]
+    updated = old.index[kept][changed]
+    
+    records = []
+    columns = [c for c in new.columns if c != "signature"]
+    for op, keys, frame in (("insert", inserted, new), ("delete", deleted, old)):
+        rows = frame.loc[keys, [c for c in frame.columns if c != "signature"]]
+        for key, row in zip(keys, rows.itertuples(index=False)):
+            records.append({"key": key, "op": op,
+                            "changes": {c: _json_value(v) for c, v in zip(rows.columns, row)}})
+    if len(updated):
+        shared = [c for c in columns if c in old.columns]
+        before, after = old.loc[updated, shared], new.loc[updated, shared]
+        differs = ((before != after) & ~(before.isna() & after.isna())).to_numpy()
+        before, after = before.to_numpy(dtype=object), after.to_numpy(dtype=object)
+        for i, key in enumerate(updated):
+            changed = np.flatnonzero(differs[i])
+            if not len(changed):  # same values, different dtype
+                continue
+            records.append({"key": key, "op": "update", "changes": {
+                shared[j]: [_json_value(before[i, j]), _json_value(after[i, j])] for j in changed
+            }})
+    return records
+
+class ChangeLog:
+    """Append-only log of row changes between consecutive versions of every stream"""
+    
+    def __init__(self, directory=CDC_DIR):
+        self.directory = directory
+        self.log_path = os.path.join(directory, CDC_LOG)
+        # One worker: versions of a stream are diffed in the order they arrive
+        self.executor = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix="cdc")
+        self.jobs = {}  # (kind, stream) -> (version, Future) of the latest capture
+        self.read_state = None  # (size, mtime) of the log the cached reads came from
+        self.reads = {}  # (since, stream) -> changes frame
+        self.lock = threading.Lock()
+    
+    def _state_path(self, kind, stream):
+        name = hashlib.blake2b(stream.encode(), digest_size=8).hexdigest()
+        return os.path.join(self.directory, "state", f"{kind}-{name}.parquet")
+    
+    def capture(self, kind, stream, version, df):
+        """Diff ``df`` against the last captured version of the stream and log the changes"""
+        path = self._state_path(kind, stream)
+        old = pd.read_parquet(path) if os.path.isfile(path) else None
+        if old is not None and old.attrs.get("version") == version:
+            return []
+        with perf_stage(f"cdc.{kind}", "aggregate", rows=len(df)) as record:
+            new = change_state(kind, df)
+            records = diff_states(old, new) if old is not None else []
+            record["rows"] = len(records)
+        at = datetime.now().isoformat(timespec="seconds")
+        if records:
+            os.makedirs(self.directory, exist_ok=True)
+            header = {"at": at, "kind": kind, "stream": stream,
+                      "from": old.attrs.get("version"), "to": version}
+            # Every append is a gzip member of its own; readers see one stream
+            with gzip.open(self.log_path, "at", encoding="utf-8") as f:
+                for change in records:
+                    f.write(json.dumps({**header, **change}, default=str) + "\n")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        new.attrs = {"version": version, "stream": stream, "captured_at": at}
+        replace_file(path, lambda p: new.to_parquet(p, compression="zstd"))
+        return records
+    
+    def submit(self, kind, stream, df):
+        """Capture on the background worker, at most once per version"""
+        version = version_of(df)
+        with self.lock:
+            submitted, job = self.jobs.get((kind, stream), (None, None))
+            if job is None or submitted != version:
+                job = self.executor.submit(self.capture, kind, stream, version, df)
+                self.jobs[(kind, stream)] = (version, job)
+            return job
+    
+    def read(self, since=None, stream=None):
+        """Logged changes as a frame, optionally from ``since`` on and for one stream
+        
+        Lines are filtered as they are decompressed, and the result is kept
+        until the log changes, so reruns do not read the log again.
+        """
+        columns = ["at", "kind", "stream", "from", "to", "key", "op", "changes"]
+        if not os.path.isfile(self.log_path):
+            return pd.DataFrame(columns=columns)
+        stat = os.stat(self.log_path)
+        state = (stat.st_size, stat.st_mtime_ns)
+        key = (None if since is None else pd.Timestamp(since), stream)
+        with self.lock:
+            if self.read_state != state:
+                self.read_state, self.reads = state, {}
+            if key in self.reads:
+                return self.reads[key]
+        
+        # "at" is ISO text to the second, so it compares as text with the next whole second
+        start = None if since is None else key[0].ceil("s").isoformat()
+        rows = []
+        with gzip.open(self.log_path, "rt", encoding="utf-8") as f:
+            for line in f:
+                change = json.loads(line)
+                if (start is None or change["at"] >= start) and (stream is None or change["stream"] == stream):
+                    rows.append(change)
+        changes = pd.DataFrame(rows, columns=columns)
+        changes["at"] = pd.to_datetime(changes["at"])
+        with self.lock:
+            if self.read_state == state:
+                self.reads[key] = changes
+        return changes
+
+@st.cache_resource
+def change_log():
+    return ChangeLog()
+
+def data_stream(kind):
+    """Name of the sheet the dashboard currently loads; versions of one stream are diffed"""
+    source = st.session_state.get("data_source")
+    if source == LOCAL_SOURCE:
+        path = os.path.abspath(st.session_state.get("local_data_path", LOCAL_DATA_PATH))
+        return f"local:{path}|{st.session_state.get('local_filter', '').strip()}"
+    if source == REGISTRY_SOURCE:
+        return f"registry:{os.path.abspath(SOURCES_FILE)}|{st.session_state.get('registry_unit', ALL_UNITS)}"
+    if source == SNAPSHOT_SOURCE:
+        return f"snapshot:{os.path.abspath(SNAPSHOT_DIR)}"
+    if source == "Demo Data":
+        return None
+    return f"google:{SPREADSHEET_ID}"
+
+def stream_of(kind, df):
+    """Stream key of a loaded frame, for per-stream stores; demo and time-travel frames get their own"""
+    if df.attrs.get("as_of"):
+        return f"history:{df.attrs['as_of']}|{data_stream(kind)}"
+    if df.attrs.get("demo"):
+        return "demo"
+    return data_stream(kind) or "demo"
+
+def capture_changes(kind, df):
+    stream = data_stream(kind)
+    if stream is not None and df is not None and not df.empty and not df.attrs.get("demo"):
+        change_log().submit(kind, stream, df)
+
+def change_summary(changes):
+    """``field: old → new`` text of each change record"""
+    def describe(op, fields):
+        if op != "update":
+            return ", ".join(f"{k}: {v}" for k, v in fields.items() if v is not None)
+        return ", ".join(f"{k}: {old} → {new}" for k, (old, new) in fields.items())
+    return [describe(op, fields) for op, fields in zip(changes["op"], changes["changes"])]
+
+def received_since(changes):
+    """Payment received added by the logged payment changes"""
+    payments = changes[changes["kind"] == "payments"]
+    total = 0.0
+    for op, fields in zip(payments["op"], payments["changes"]):
+        if op == "update" and "payment_received" in fields:
+            total += (fields["payment_received"][1] or 0) - (fields["payment_received"][0] or 0)
+        elif op == "insert":
+            total += fields.get("payment_received") or 0
+    return total
+
+def display_changes(df, proposal_df):
+    """What changed in the loaded sheets since a chosen date"""
+    st.markdown('<div class="section-header">🕒 What Changed</div>', unsafe_allow_html=True)
+    log = change_log()
+    with perf_stage("cdc.wait", "aggregate"):
+        for kind in ("payments", "proposals"):
+            _, job = log.jobs.get((kind, data_stream(kind)), (None, None))
+            if job is not None and not job.done():
+                with st.spinner(f"Comparing {kind} with the previous version..."):
+                    job.exception()
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        since = st.date_input("Changes since", value=datetime.now().date() - pd.Timedelta(days=7), key="changes_since")
+    with col2:
+        kinds = st.multiselect("Sheets", ["payments", "proposals"], default=["payments", "proposals"],
+                               key="changes_kinds")
+    
+    with perf_stage("cdc.read", "aggregate") as record:
+        changes = log.read(since)
+        loaded = pd.Series(False, index=changes.index)
+        for kind in kinds:
+            loaded |= (changes["kind"] == kind) & (changes["stream"] == data_stream(kind))
+        changes = changes[loaded]
+        record["rows"] = len(changes)
+    
+    counts = changes["op"].value_counts()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        _metric_card(CDC_OPS["insert"], int(counts.get("insert", 0)))
+    with col2:
+        _metric_card(CDC_OPS["update"], int(counts.get("update", 0)))
+    with col3:
+        _metric_card(CDC_OPS["delete"], int(counts.get("delete", 0)))
+    with col4:
+        _metric_card("Payment Received Since", f"₹ {received_since(changes):,.2f}")
+    
+    if changes.empty:
+        st.info("No changes logged for the loaded sheets since that date. "
+                "Changes are recorded from the second version of a sheet onwards.")
+        return
+    
+    view = changes.sort_values("at", ascending=False)
+    view = pd.DataFrame({
+        "at": view["at"],
+        "sheet": view["kind"],
+        "key": view["key"],
+        "change": view["op"].map(CDC_OPS),
+        "fields": change_summary(view),
+    })
+    st.dataframe(view, use_container_width=True, height=400, hide_index=True)
+    st.download_button("📥 Download Changes CSV", view.to_csv(index=False).encode("utf-8"), "changes.csv")
+
+# ===================== SNAPSHOT HISTORY =====================
+# Every processed version of a stream is kept for time travel. Each column is
+# cut into row chunks of HISTORY_CHUNK_ROWS rows, and each chunk is stored
+# once, as an Arrow IPC file named by a hash of its content. A new version
+# therefore only writes the chunks that changed: edits in place, or rows
+# appended at the end. A version is a small JSON manifest listing its chunks,
+# with its KPI totals, so period-over-period comparisons read no rows at all.
+# Each stream also appends one line per version to an index, so listing the
+# versions reads one small file, and only again once it has grown.
+# Old versions are read back from memory-mapped chunk files.
+HISTORY_DIR = os.environ.get("DASHBOARD_HISTORY_DIR", "history")
+HISTORY_CHUNK_ROWS = 65_536
+HISTORY_COMPRESSION = os.environ.get("DASHBOARD_HISTORY_COMPRESSION", "zstd")  # "none" reads chunks zero-copy
+HISTORY_INDEX = "index.jsonl"
+HISTORY_KPIS = {
+    "payments": {"order_amount": "Order Amount", "final_amount": "Final Amount",
+                 "payment_received": "Payment Received", "pending_amount": "Pending"},
+    "proposals": {"total_proposals": "Proposals", "total_value": "Total Value",
+                  "won": "Approved/OK", "conversion_rate": "Conversion Rate %"},
+}
+
+def history_kpis(kind, df):
+    """The KPI totals a manifest keeps, cheap enough to compute for every version"""
+    if kind == "payments":
+        return payment_kpis(df)
+    won = int((df["stage"] == "won").sum()) if "stage" in df.columns else 0
+    return {
+        "total_proposals": len(df),
+        "total_value": float(df["amount"].sum()) if "amount" in df.columns else 0.0,
+        "won": won,
+        "conversion_rate": won / len(df) * 100 if len(df) else 0.0,
+    }
+
+def _chunk_digest(values):
+    digest = hashlib.blake2b(str(values.dtype).encode(), digest_size=16)
+    digest.update(pd.util.hash_pandas_object(values, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+class SnapshotHistory:
+    """Versions of processed frames per stream, stored as deduplicated column chunks"""
+    
+    def __init__(self, directory=HISTORY_DIR, chunk_rows=HISTORY_CHUNK_ROWS, compression=HISTORY_COMPRESSION):
+        self.directory = directory
+        self.chunk_rows = chunk_rows
+        self.compression = None if compression in ("", "none") else compression
+        # One worker: versions are recorded in the order they arrive
+        self.executor = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix="history")
+        self.recorded = {}  # (kind, stream) -> last version submitted
+        self.listings = {}  # index path -> ((size, mtime), versions frame)
+        self.lock = threading.Lock()
+    
+    def _stream_dir(self, kind, stream):
+        name = hashlib.blake2b(stream.encode(), digest_size=8).hexdigest()
+        return os.path.join(self.directory, "manifests", f"{kind}-{name}")
+    
+    @staticmethod
+    def _index_line(manifest, name):
+        entry = {key: manifest[key] for key in ("taken_at", "version", "rows", "kpis")}
+        return json.dumps({**entry, "manifest": name}, default=float) + "\n"
+    
+    def _build_index(self, directory):
+        """Index a stream recorded before indexes were kept, from its manifests (once)"""
+        lines = []
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(".json"):
+                with open(os.path.join(directory, name)) as f:
+                    lines.append(self._index_line(json.load(f), name))
+        
+        def write(tmp):
+            with open(tmp, "w") as f:
+                f.writelines(lines)
+        
+        replace_file(os.path.join(directory, HISTORY_INDEX), write)
+    
+    def _chunk_path(self, digest):
+        return os.path.join(self.directory, "chunks", digest[:2], f"{digest}.arrow")
+    
+    def _write_chunk(self, values):
+        """Store one column chunk unless identical content is already stored; returns its digest"""
+        pa = importlib.import_module("pyarrow")
+        digest = _chunk_digest(values)
+        path = self._chunk_path(digest)
+        if os.path.isfile(path):
+            return digest
+        try:
+            table = pa.Table.from_pandas(pd.DataFrame({"values": values}), preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Mixed-type object columns are kept as their text
+            table = pa.Table.from_pandas(pd.DataFrame({"values": values.astype(str)}), preserve_index=False)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        
+        def write(tmp):
+            options = pa.ipc.IpcWriteOptions(compression=self.compression)
+            with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema, options=options) as writer:
+                writer.write_table(table)
+        
+        replace_file(path, write)
+        return digest
+    
+    def record(self, kind, stream, df):
+        """Store a version of the stream; returns its manifest (None when already stored)"""
+        version = version_of(df)
+        latest = self.versions(kind, stream)
+        if not latest.empty and latest["version"].iloc[-1] == version:
+            return None
+        with perf_stage(f"history.{kind}", "aggregate", rows=len(df)):
+            columns = []
+            for name in df.columns:
+                column = df[name]
+                entry = {"name": str(name), "dtype": str(column.dtype), "chunks": [
+                    self._write_chunk(column.iloc[start:start + self.chunk_rows])
+                    for start in range(0, max(len(column), 1), self.chunk_rows)
+                ]}
+                if isinstance(column.dtype, pd.CategoricalDtype):
+                    entry["categories"] = column.cat.categories.tolist()
+                columns.append(entry)
+            taken_at = datetime.now()
+            manifest = {
+                "kind": kind, "stream": stream, "version": version, "rows": len(df),
+                "taken_at": taken_at.isoformat(timespec="seconds"),
+                "kpis": history_kpis(kind, df), "columns": columns,
+            }
+            directory = self._stream_dir(kind, stream)
+            os.makedirs(directory, exist_ok=True)
+            # Microseconds keep versions taken within one second in order
+            path = os.path.join(directory, f"{taken_at:%Y%m%dT%H%M%S%f}-{version}.json")
+            
+            def write(tmp):
+                with open(tmp, "w") as f:
+                    json.dump(manifest, f, default=float)
+            
+            replace_file(path, write)
+            with self.lock, open(os.path.join(directory, HISTORY_INDEX), "a") as f:
+                f.write(self._index_line(manifest, os.path.basename(path)))
+        return manifest
+    
+    def submit(self, kind, stream, df):
+        """Record on the background worker, at most once per version"""
+        version = version_of(df)
+        with self.lock:
+            if self.recorded.get((kind, stream)) == version:
+                return
+            self.recorded[(kind, stream)] = version
+        self.executor.submit(self.record, kind, stream, df)
+    
+    def versions(self, kind, stream):
+        """Versions of a stream, oldest first, from its index; re-read only when the index has changed"""
+        directory = self._stream_dir(kind, stream)
+        index = os.path.join(directory, HISTORY_INDEX)
+        with self.lock:
+            if os.path.isdir(directory) and not os.path.isfile(index):
+                self._build_index(directory)
+            if not os.path.isfile(index):
+                return pd.DataFrame(columns=["taken_at", "version", "rows", "path"])
+            stat = os.stat(index)
+            key = (stat.st_size, stat.st_mtime_ns)
+            cached_key, listing = self.listings.get(index, (None, None))
+            if cached_key == key:
+                return listing
+            with open(index) as f:
+                entries = sorted((json.loads(line) for line in f), key=lambda entry: entry["manifest"])
+            rows = [{"taken_at": pd.Timestamp(entry["taken_at"]), "version": entry["version"], "rows": entry["rows"],
+                     "path": os.path.join(directory, entry["manifest"]),
+                     **{f"kpi.{k}": v for k, v in entry["kpis"].items()}} for entry in entries]
+            listing = pd.DataFrame(rows, columns=None if rows else ["taken_at", "version", "rows", "path"])
+            self.listings[index] = (key, listing)
+            return listing
+    
+    def as_of(self, kind, stream, when):
+        """The newest manifest path taken at or before ``when``, or None"""
+        versions = self.versions(kind, stream)
+        if versions.empty:
+            return None
+        earlier = versions[versions["taken_at"] <= pd.Timestamp(when)]
+        return earlier["path"].iloc[-1] if not earlier.empty else None
+    
+    def load(self, manifest_path):
+        """The frame of one stored version, read from memory-mapped chunks"""
+        pa = importlib.import_module("pyarrow")
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        columns = {}
+        for entry in manifest["columns"]:
+            arrays = []
+            for digest in entry["chunks"]:
+                with pa.memory_map(self._chunk_path(digest), "r") as source:
+                    arrays += pa.ipc.open_file(source).read_all().column(0).chunks
+            values = pa.chunked_array(arrays).to_pandas() if arrays else pd.Series(dtype="object")
+            if "categories" in entry:
+                values = values.astype("category").cat.set_categories(entry["categories"])
+            elif str(values.dtype) != entry["dtype"]:
+                values = values.astype(entry["dtype"])
+            columns[entry["name"]] = values
+        df = pd.DataFrame(columns).head(manifest["rows"])
+        df.attrs = {"version": manifest["version"], "as_of": manifest["taken_at"]}
+        return df
+    
+    def stats(self):
+        """Chunk files and bytes on disk, across all versions"""
+        files = size = 0
+        for root, _, names in os.walk(os.path.join(self.directory, "chunks")):
+            files += len(names)
+            size += sum(os.path.getsize(os.path.join(root, n)) for n in names)
+        return {"chunks": files, "bytes": size}
+
+@st.cache_resource
+def snapshot_history():
+    return SnapshotHistory()
+
+def record_history(kind, df):
+    stream = data_stream(kind)
+    if stream is not None and df is not None and not df.empty and not df.attrs.get("demo"):
+        snapshot_history().submit(kind, stream, df)
+
+@st.cache_resource
+def history_datasets():
+    """Historical frames, kept apart from shared_datasets() so they never count as current data"""
+    return SharedDatasets(max_entries=4)
+
+def history_frame(kind):
+    """The stream's version as of the sidebar's time-travel date, shared by every session"""
+    when = pd.Timestamp(st.session_state.get("as_of_date", datetime.now().date())) + pd.Timedelta(days=1)
+    path = snapshot_history().as_of(kind, data_stream(kind), when - pd.Timedelta(seconds=1))
+    if path is None:
+        return None
+    return history_datasets().get((kind, path), lambda: snapshot_history().load(path))
+
+def display_kpi_comparison(kind, df):
+    """KPI change against an earlier stored version of the same stream"""
+    stream = data_stream(kind)
+    if stream is None:
+        return
+    versions = snapshot_history().versions(kind, stream)
+    versions = versions[versions["version"] != version_of(df)]
+    if "as_of" in df.attrs:
+        versions = versions[versions["taken_at"] < pd.Timestamp(df.attrs["as_of"])]
+    if versions.empty:
+        return
+    
+    options = list(reversed(range(len(versions))))
+    choice = st.selectbox(
+        "Compare with an earlier version", [None] + options, key=f"compare_{kind}",
+        format_func=lambda i: "—" if i is None else
+        f"{versions['taken_at'].iloc[i]:%d %b %Y %H:%M} ({versions['rows'].iloc[i]:,} rows)"
+    )
+    if choice is None:
+        return
+    current = history_kpis(kind, df)
+    cols = st.columns(len(HISTORY_KPIS[kind]))
+    for col, (key, label) in zip(cols, HISTORY_KPIS[kind].items()):
+        before = versions[f"kpi.{key}"].iloc[choice]
+        delta = current[key] - before
+        value = f"₹ {current[key]:,.2f}" if "amount" in key or key in ("payment_received", "total_value") \
+            else f"{current[key]:,.1f}" if isinstance(current[key], float) else f"{current[key]:,}"
+        col.metric(label, value, f"{delta:+,.2f}" if isinstance(delta, float) else f"{delta:+,}")
+
+# ===================== FILTERING =====================
+def payment_filter_mask(df, status="All", mode="All", unit="All", amount_range=None):
+    """Build one boolean row mask for the payment filters"""
+    mask = pd.Series(True, index=df.index)
+    
+    if status != "All":
+        mask &= df["work_status"] == status
+    
+    if mode != "All" and "payment_mode" in df.columns:
+        mask &= df["payment_mode"] == mode
+    
+    if unit != "All" and "client" in df.columns:
+        mask &= df["client"] == unit
+    elif unit != "All" and "unit_name" in df.columns:
+        mask &= df["unit_name"] == unit
+    
+    if amount_range is not None:
+        mask &= df["final_amount"].between(amount_range[0], amount_range[1])
+    
+    return mask
+
+def proposal_filter_mask(proposal_df, status="All", present_status="All", client="All", amount_range=None):
+    """Build one boolean row mask for the proposal filters"""
+    mask = pd.Series(True, index=proposal_df.index)
+    
+    if status != "All" and 'status' in proposal_df.columns:
+        mask &= proposal_df['status'] == status
+    
+    if present_status != "All" and 'present_status' in proposal_df.columns:
+        mask &= proposal_df['present_status'] == present_status
+    
+    if client != "All" and 'client' in proposal_df.columns:
+        mask &= proposal_df['client'] == client
+    elif client != "All" and 'name' in proposal_df.columns:
+        mask &= proposal_df['name'] == client
+    
+    if amount_range is not None and 'amount' in proposal_df.columns:
+        mask &= proposal_df['amount'].between(amount_range[0], amount_range[1])
+    
+    return mask
+
+# ===================== CROSS-FILTERING =====================
+# Clicking a bar, or picking a slice under a pie, selects values of that
+# chart's dimension. Every other chart and the records table then show only
+# the matching rows. A chart is never filtered by its own dimension.
+# Per dataset version, a CrossFilterCube precomputes:
+# - the row positions of each value of each dimension,
+# - the totals per value,
+# - the totals per pair of values for pairs of small dimensions.
+# A selection on one dimension is answered from the pair totals. Selections on
+# several dimensions intersect the row positions and total them with one
+# bincount. Neither path runs a groupby or copies the frame.
+CROSSFILTER_DIMENSIONS = {
+    "payments": {"payment_mode": "Payment Mode", "work_status": "Work Status"},
+    "proposals": {"status": "Status", "present_status": "Present Status", "client": "Client",
+                  "industry_type": "Industry", "source": "Source"},
+}
+CROSSFILTER_MEASURES = {"payments": ["payment_received", "pending_amount"], "proposals": ["amount"]}
+CROSSFILTER_PAIR_CELLS = 200_000  # largest pair cube kept, in value pairs
+# What a selection filters, per tab; KPI cards, trends, funnel and win rates always show every record
+CROSSFILTER_APPLIES_TO = {
+    "payments": ("the pies, the status-wise summary, the year-wise chart, the drill-down, receivables aging "
+                 "and the records"),
+    "proposals": "the status, value, client, industry and source charts and the proposal records",
+}
+CROSSFILTER_NOT_APPLIED = "ℹ️ This section shows all records; the chart cross-filter does not apply here."
+# Bar charts report clicks: chart -> (dimension, axis holding its labels)
+CROSSFILTER_CLICKS = {
+    "proposals": {"value_by_status": ("status", "x"), "top_clients": ("client", "y"), "source": ("source", "x")},
+}
+
+def proposal_client_labels(proposal_df):
+    """Client per proposal: the canonical client, or the name before its first comma"""
+    if 'client' in proposal_df.columns:
+        return proposal_df['client']
+    return proposal_df['name'].fillna('Unknown').astype(str).str.split(',').str[0].str.strip()
+
+def crossfilter_columns(kind, df):
+    """``{dimension: values}`` of a frame, for the dimensions it has"""
+    columns = {}
+    for dimension in CROSSFILTER_DIMENSIONS[kind]:
+        if dimension == "client" and "name" in df.columns:
+            columns[dimension] = proposal_client_labels(df)
+        elif dimension in df.columns:
+            columns[dimension] = df[dimension]
+    return columns
+
+class CrossFilterCube:
+    """Row positions and totals per dimension value, for selections on any dimensions
+    
+    Totals are a frame per dimension, indexed by its values, with a ``rows``
+    count and one sum per measure; values without rows are left out.
+    """
+    
+    def __init__(self, dimensions, measures):
+        self.n = len(next(iter(measures.values()))) if measures else 0
+        self.codes, self.labels, self.lookup, self.index = {}, {}, {}, {}
+        for name, values in dimensions.items():
+            codes, labels = pd.factorize(values.astype(str).where(values.notna()))  # missing -> -1
+            self.codes[name] = codes
+            self.labels[name] = pd.Index(labels, name=name)
+            self.lookup[name] = {label: i for i, label in enumerate(labels)}
+            # Rows of value i are order[offsets[i]:offsets[i + 1]]; missing values sort first
+            order = np.argsort(codes, kind="stable")
+            offsets = np.cumsum(np.bincount(codes + 1, minlength=len(labels) + 1))
+            self.index[name] = (order, offsets)
+        self.measures = {name: values.to_numpy(dtype="float64", na_value=0.0) for name, values in measures.items()}
+        self.columns = ["rows"] + list(self.measures)
+        self.weights = [None] + list(self.measures.values())
+        
+        self.totals = {name: self._bincount(self.codes[name] + 1, len(self.labels[name]) + 1)[1:]
+                       for name in self.codes}
+        self.pairs = {}  # (a, b) -> array [value of a, value of b, column]
+        names = list(self.codes)
+        for i, a in enumerate(names):
+            for b in names[i + 1:]:
+                size_a, size_b = len(self.labels[a]) + 1, len(self.labels[b]) + 1
+                if size_a * size_b <= CROSSFILTER_PAIR_CELLS:
+                    cells = (self.codes[a] + 1) * size_b + self.codes[b] + 1
+                    self.pairs[(a, b)] = self._bincount(cells, size_a * size_b).reshape(size_a, size_b, -1)[1:, 1:]
+    
+    def _bincount(self, bins, size, rows=None):
+        """``[bin, column]`` counts and measure sums, over ``rows`` (positions) or all rows"""
+        if rows is not None:
+            bins = bins[rows]
+        return np.stack([
+            np.bincount(bins, weights=None if w is None else (w if rows is None else w[rows]), minlength=size)
+            for w in self.weights
+        ], axis=1).astype("float64")
+    
+    def _codes(self, name, values):
+        return np.array([self.lookup[name][v] for v in values if v in self.lookup[name]], dtype="int64")
+    
+    def rows(self, selections):
+        """Positions of the rows matching every selection, or None when nothing is selected"""
+        mask = None
+        for name, values in selections.items():
+            if not values or name not in self.index:
+                continue
+            order, offsets = self.index[name]
+            selected = np.zeros(self.n, dtype=bool)
+            for code in self._codes(name, values):
+                selected[order[offsets[code]:offsets[code + 1]]] = True
+            mask = selected if mask is None else mask & selected
+        return None if mask is None else np.flatnonzero(mask)
+    
+    def _frame(self, name, table):
+        frame = pd.DataFrame(table, index=self.labels[name], columns=self.columns)
+        return frame[frame["rows"] > 0].astype({"rows": "int64"})
+    
+    def aggregate(self, name, selections):
+        """Totals per value of ``name`` under the selections on the other dimensions"""
+        others = {d: v for d, v in selections.items() if d != name and v and d in self.codes}
+        if not others:
+            return self._frame(name, self.totals[name])
+        if len(others) == 1:
+            (other, values), = others.items()
+            if (other, name) in self.pairs:
+                return self._frame(name, self.pairs[(other, name)][self._codes(other, values)].sum(axis=0))
+            if (name, other) in self.pairs:
+                return self._frame(name, self.pairs[(name, other)][:, self._codes(other, values)].sum(axis=1))
+        return self._frame(name, self._bincount(self.codes[name] + 1, len(self.labels[name]) + 1,
+                                                self.rows(others))[1:])
+    
+    def total(self, selections):
+        """``rows`` and the measure sums of all rows matching the selections"""
+        rows = self.rows(selections)
+        if rows is None:
+            return {"rows": self.n, **{m: values.sum() for m, values in self.measures.items()}}
+        return {"rows": len(rows), **{m: values[rows].sum() for m, values in self.measures.items()}}
+
+def build_crossfilter_cube(kind, df):
+    measures = {m: df[m] for m in CROSSFILTER_MEASURES[kind] if m in df.columns}
+    return CrossFilterCube(crossfilter_columns(kind, df), measures)
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def crossfilter_cube(kind, version, _df):
+    """The cube of a dataset version, built once and shared by every session"""
+    with perf_stage(f"crossfilter.{kind}.build", "aggregate", rows=len(_df)):
+        return build_crossfilter_cube(kind, _df)
+
+def _crossfilter_key(kind, dimension):
+    return f"crossfilter_{kind}_{dimension}"
+
+def crossfilter_selections(kind, cube):
+    """Selected values per dimension, after taking in new bar clicks
+    
+    Call before any of the tab's selection pills exist: a click is copied
+    into the pills' state, which is only allowed before they are drawn.
+    """
+    seen = st.session_state.setdefault("crossfilter_clicks", {})
+    for chart, (dimension, axis) in CROSSFILTER_CLICKS.get(kind, {}).items():
+        event = st.session_state.get(f"crossfilter_{kind}_{chart}_chart")
+        if not event:
+            continue
+        clicked = sorted({str(p[axis]) for p in event.get("selection", {}).get("points", []) if axis in p})
+        if seen.get((kind, chart), []) != clicked:
+            seen[(kind, chart)] = clicked
+            st.session_state[_crossfilter_key(kind, dimension)] = clicked
+    
+    selections = {}
+    for dimension in CROSSFILTER_DIMENSIONS[kind]:
+        key = _crossfilter_key(kind, dimension)
+        values = st.session_state.get(key) or []
+        if dimension not in cube.lookup:
+            continue
+        # Values that vanished with a new dataset version are dropped
+        known = [v for v in values if v in cube.lookup[dimension]]
+        if known != values:
+            st.session_state[key] = known
+        if known:
+            selections[dimension] = known
+    return selections
+
+def crossfilter_rows(kind, df):
+    """Positions of the rows matching the tab's current selections, or None"""
+    cube = crossfilter_cube(kind, version_of(df), df)
+    return cube.rows({d: st.session_state.get(_crossfilter_key(kind, d)) for d in CROSSFILTER_DIMENSIONS[kind]})
+
+def clear_crossfilter(kind):
+    for dimension in CROSSFILTER_DIMENSIONS[kind]:
+        st.session_state.pop(_crossfilter_key(kind, dimension), None)
+
+def display_crossfilter_bar(kind, selections):
+    """The active selections, with a button clearing them all"""
+    if not selections:
+        st.caption(f"💡 Click a bar, or pick slices under a pie chart, to filter {CROSSFILTER_APPLIES_TO[kind]}.")
+        return
+    labels = CROSSFILTER_DIMENSIONS[kind]
+    col1, col2 = st.columns([5, 1])
+    col1.info("🎯 Cross-filter: " + " · ".join(f"**{labels[d]}** = {', '.join(v)}" for d, v in selections.items())
+              + f"  \nApplies to {CROSSFILTER_APPLIES_TO[kind]}; the KPI cards and sections marked ℹ️ show all records.")
+    col2.button("✕ Clear", key=f"crossfilter_{kind}_clear", on_click=clear_crossfilter, args=(kind,))
+
+def crossfilter_pills(kind, dimension, cube):
+    """Selectable values of a pie chart's dimension, shown under the chart"""
+    if dimension in cube.labels:
+        st.pills(CROSSFILTER_DIMENSIONS[kind][dimension], list(cube.labels[dimension]), selection_mode="multi",
+                 key=_crossfilter_key(kind, dimension), label_visibility="collapsed")
+
+# ===================== BATCH SNAPSHOTS =====================
+# batch.py (pipeline.run_batch) writes processed frames to SNAPSHOT_DIR; the
+# "Precomputed Snapshot" source serves them without processing anything.
+SNAPSHOT_SOURCE = "Precomputed Snapshot"
+
+@perf_loader
+@st.cache_data(ttl=120)
+def load_via_snapshot(path, kind="payments", version=None):
+    """Load a processed frame precomputed by batch.py
+    
+    ``version`` is only part of the cache key - pass ``snapshot_version(path)``.
+    """
+    perf_cache_miss()
+    try:
+        df, summary = read_snapshot(path, kind)
+        if df.empty:
+            st.sidebar.warning(f"📭 The snapshot has no {kind} rows")
+            return None
+        st.sidebar.success(f"✅ Loaded {len(df)} {kind} records from the snapshot of "
+                           f"{summary['generated_at']} ({summary.get('source')})")
+        return df
+    except Exception as e:
+        st.sidebar.error(f"❌ Snapshot {kind} load failed: {str(e)}")
+        return None
+
+# ===================== SHARED DATASETS =====================
+# st.cache_data hands every caller its own unpickled copy, and each session
+# used to process that copy on every run. Processed frames now live once per
+# (sheet, source version) in a process-wide store, and every session gets the
+# same object. pandas' copy-on-write keeps that safe: to_numpy() views are
+# read-only and a session that assigns to its frame only changes its own copy.
+# Text columns are Arrow-backed strings on pandas 2.x too (pipeline.arrow_strings).
+# Sessions hold references plus their own filter state and nothing else.
+SHARED_DATASET_VERSIONS = 8  # processed frames kept, across both sheets
+
+class SharedDatasets:
+    """Processed frames by key, built once however many sessions ask at the same time"""
+    
+    def __init__(self, max_entries=SHARED_DATASET_VERSIONS):
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()  # key -> Future of the frame
+        self._lock = threading.Lock()
+    
+    def get(self, key, build):
+        """The frame stored under ``key``; ``build()`` makes it on first use"""
+        with self._lock:
+            future = self._entries.get(key)
+            owner = future is None
+            if owner:
+                future = self._entries[key] = concurrent.futures.Future()
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            else:
+                self._entries.move_to_end(key)
+        if owner:
+            try:
+                future.set_result(build())
+            except BaseException as e:
+                # Not cached: the next caller builds it again
+                with self._lock:
+                    if self._entries.get(key) is future:
+                        del self._entries[key]
+                future.set_exception(e)
+        return future.result()
+    
+    def current(self, kind):
+        """The most recently used frame whose key starts with ``kind``, or None"""
+        with self._lock:
+            futures = [f for key, f in reversed(self._entries.items()) if key[0] == kind]
+        for future in futures:
+            if future.done() and not future.exception():
+                return future.result()
+        return None
+    
+    def stats(self):
+        with self._lock:
+            frames = [f.result() for f in self._entries.values() if f.done() and not f.exception()]
+        return {"entries": len(frames), "bytes": sum(int(f.memory_usage(deep=True).sum()) for f in frames)}
+
+@st.cache_resource
+def shared_datasets():
+    return SharedDatasets()
+
+def shared_dataset(kind, raw, prepare):
+    """``prepare(raw)``, shared by every session loading the same version of the sheet"""
+    version = raw.attrs.get("version") or dataset_version(raw)
+    with perf_cached_stage(f"shared_dataset.{kind}", "process", rows=len(raw)):
+        def build():
+            perf_cache_miss()
+            return prepare(raw)
+        
+        frame = shared_datasets().get((kind, version), build)
+    return frame
+
+def shared_snapshot(kind):
+    """A batch snapshot frame, read once per snapshot version for every session"""
+    version = snapshot_version()
+    
+    def build():
+        frame = load_via_snapshot(SNAPSHOT_DIR, kind, version)
+        if frame is None:
+            raise DataBackendError(f"No {kind} in the snapshot")
+        return frame
+    
+    try:
+        return shared_datasets().get((kind, f"snapshot:{version}"), build)
+    except DataBackendError:
+        return None
+
+# ===================== LOCAL API =====================
+# With DASHBOARD_API_PORT set, the dashboard process also serves its KPIs and
+# summaries over HTTP (api_server.py) to other internal tools. The numbers
+# come from the processed frames the sessions share - the versions most
+# recently loaded - so a request never reaches Google.
+API_HOST = os.environ.get("DASHBOARD_API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("DASHBOARD_API_PORT", "0"))  # 0 disables the API
+
+def proposal_insights_payload(proposal_df):
+    insights = get_proposal_insights(proposal_df)
+    insights["win_rates"] = {label: table.reset_index() for label, table in insights.get("win_rates", {}).items()}
+    return insights
+
+def proposal_status_summary(proposal_df):
+    """Proposals and their value per status"""
+    if "status" not in proposal_df.columns:
+        return pd.DataFrame(columns=["status", "proposals", "value"])
+    return proposal_df.groupby("status").agg(proposals=("status", "size"), value=("amount", "sum")).reset_index()
+
+# endpoint -> (datasets it reads, compute)
+API_ENDPOINTS = {
+    "kpis": (("payments",), payment_kpis),
+    "status-summary": (("payments",), payment_status_summary),
+    "year-summary": (("payments",), payment_year_summary),
+    "proposal-insights": (("proposals",), proposal_insights_payload),
+    "proposal-status": (("proposals",), proposal_status_summary),
+}
+
+@st.cache_resource
+def local_api(host, port):
+    """The API thread, started once per process"""
+    api = api_server.DashboardApi(API_ENDPOINTS, shared_datasets().current)
+    return api_server.start_server(api, host, port)
+
 # ===================== MAIN DATA LOADING LOGIC =====================
-def load_data():
+def data_source_settings():
+    """Data source widgets, rendered on every run so their state survives tabs that load nothing"""
     st.sidebar.header("🔧 Data Configuration")
     
     # Display current configuration
@@ -973,16 +2836,50 @@ def load_data():
     - Payment Sheet GID: `{SHEET_GID}`
     - Proposal Sheet GID: `{PROPOSAL_GID}`
     """)
+    if not SHEETS.is_google:
+        st.sidebar.info(f"🧪 Sheets endpoints: `{SHEETS.base_url}` / `{SHEETS.api_base_url}`")
     
     # Data source selection
+    sources = ["Service Account (Most Accurate)", "CSV Export", "Sheets API", LOCAL_SOURCE, "Demo Data"]
+    if sources_file_version() is not None:
+        sources.insert(0, REGISTRY_SOURCE)
+    if snapshot_version() is not None:
+        sources.insert(0, SNAPSHOT_SOURCE)
     data_source = st.sidebar.radio(
         "Select Data Source:",
-        ["Service Account (Most Accurate)", "CSV Export", "Demo Data"],
-        index=0
+        sources,
+        index=0,
+        key="data_source"
     )
     
+    if data_source == LOCAL_SOURCE:
+        st.sidebar.text_input(
+            "Local data path", value=LOCAL_DATA_PATH, key="local_data_path",
+            help="A SQLite database, or a directory with payments/proposals .parquet or .csv files"
+        )
+        st.sidebar.text_input(
+            "Payment filter (pushed down to the source)", value="", key="local_filter",
+            placeholder="Work Status == Completed; Unit Name in Unit A0, Unit B1"
+        )
+    elif data_source == REGISTRY_SOURCE:
+        registry_unit()
+    
+    if data_source != "Demo Data" and st.sidebar.checkbox("🕰️ Time travel", value=False, key="time_travel"):
+        st.sidebar.date_input("As of", value=datetime.now().date(), key="as_of_date",
+                              max_value=datetime.now().date())
+    return data_source
+
+def load_data():
+    data_source = st.session_state.get("data_source")
     df = None
     
+    if st.session_state.get("time_travel"):
+        df = history_frame("payments")
+        if df is not None:
+            st.sidebar.info(f"🕰️ Payments as of {df.attrs['as_of']}")
+            return df
+        st.sidebar.warning("🕰️ No stored payment version that old - showing the live data")
+    
     if data_source == "Service Account (Most Accurate)":
         df = load_via_service()
         if df is None:
@@ -994,7 +2891,33 @@ def load_data():
         if df is None:
             st.sidebar.warning("🔄 CSV failed, trying Service Account...")
             df = load_via_service()
+    
+    elif data_source == "Sheets API":
+        df = load_via_values_api()
+        if df is None:
+            st.sidebar.warning("🔄 Sheets API failed, trying CSV...")
+            df = load_via_csv()
         
+    elif data_source == LOCAL_SOURCE:
+        local_path = st.session_state.get("local_data_path", LOCAL_DATA_PATH)
+        try:
+            filters = parse_filter_spec(st.session_state.get("local_filter", ""))
+        except ValueError as e:
+            st.sidebar.error(f"❌ {str(e)}")
+            filters = ()
+        df = load_via_local(local_path, "payments", filters, local_data_version(local_path))
+    
+    elif data_source == REGISTRY_SOURCE:
+        df = load_via_registry(SOURCES_FILE, "payments", sources_file_version())
+        if df is not None:
+            df = unit_view(df, st.session_state.get("registry_unit", ALL_UNITS))
+    
+    elif data_source == SNAPSHOT_SOURCE:
+        # Already processed by batch.py
+        df = shared_snapshot("payments")
+        if df is not None:
+            return df
+    
     else:  # Demo Data
         df = load_demo_data()
         st.sidebar.info("📋 Using Demo Data for display")
@@ -1005,12 +2928,58 @@ def load_data():
         df = load_demo_data()
         st.warning("⚠️ Displaying DEMO DATA - Check your spreadsheet sharing settings")
     
-    return process_raw_data(df)
+    return shared_dataset("payments", df, sidebar_prepare(prepare_payments))
+
+def registry_unit():
+    """Business unit picked in the sidebar (or ``?unit=`` in the URL)"""
+    try:
+        units = [ALL_UNITS] + source_registry(SOURCES_FILE, sources_file_version()).names
+    except Exception as e:
+        st.sidebar.error(f"❌ Cannot read {SOURCES_FILE}: {str(e)}")
+        units = [ALL_UNITS]
+    requested = st.query_params.get("unit", ALL_UNITS)
+    return st.sidebar.selectbox(
+        "Business unit", units, index=units.index(requested) if requested in units else 0,
+        key="registry_unit"
+    )
 
 def load_proposals():
     """Load proposal data from Google Sheets"""
     st.sidebar.subheader("📋 Proposal Data Loading")
     
+    if st.session_state.get("time_travel"):
+        proposal_df = history_frame("proposals")
+        if proposal_df is not None:
+            st.sidebar.info(f"🕰️ Proposals as of {proposal_df.attrs['as_of']}")
+            return proposal_df
+        st.sidebar.warning("🕰️ No stored proposal version that old - showing the live data")
+    
+    # Snapshots hold both sheets, already processed
+    if st.session_state.get("data_source") == SNAPSHOT_SOURCE:
+        proposal_df = shared_snapshot("proposals")
+        if proposal_df is None or proposal_df.empty:
+            st.sidebar.error(f"❌ No proposal data in the snapshot at {SNAPSHOT_DIR}")
+            return pd.DataFrame()
+        return proposal_df
+    
+    # The registry serves both sheets of every unit
+    if st.session_state.get("data_source") == REGISTRY_SOURCE:
+        proposal_df = load_via_registry(SOURCES_FILE, "proposals", sources_file_version())
+        if proposal_df is None or proposal_df.empty:
+            st.sidebar.error("❌ No proposal data in the registered spreadsheets")
+            return pd.DataFrame()
+        proposal_df = unit_view(proposal_df, st.session_state.get("registry_unit", ALL_UNITS))
+        return shared_dataset("proposals", proposal_df, sidebar_prepare(prepare_proposals))
+    
+    # A local source serves both sheets; Google is not consulted
+    if st.session_state.get("data_source") == LOCAL_SOURCE:
+        local_path = st.session_state.get("local_data_path", LOCAL_DATA_PATH)
+        proposal_df = load_via_local(local_path, "proposals", (), local_data_version(local_path))
+        if proposal_df is None or proposal_df.empty:
+            st.sidebar.error(f"❌ No proposal data in {local_path}")
+            return pd.DataFrame()
+        return shared_dataset("proposals", proposal_df, sidebar_prepare(prepare_proposals))
+    
     # Try to load real proposal data via Service Account
     proposal_df = load_proposal_data()
     
@@ -1019,6 +2988,11 @@ def load_proposals():
         st.sidebar.warning("🔄 Service Account failed for proposals, trying CSV export...")
         proposal_df = load_proposal_via_csv()
     
+    # Then the values API, when it is usable without OAuth
+    if (proposal_df is None or proposal_df.empty) and SHEETS.values_api_enabled:
+        st.sidebar.warning("🔄 CSV export failed for proposals, trying Sheets API...")
+        proposal_df = load_proposal_via_values_api()
+    
     # If still no data, show error
     if proposal_df is None or proposal_df.empty:
         st.sidebar.error("❌ Failed to load proposal data from Google Sheets")
@@ -1031,434 +3005,248 @@ def load_proposals():
         """)
         return pd.DataFrame()  # Return empty dataframe
     
-    return process_proposal_data(proposal_df)
+    return shared_dataset("proposals", proposal_df, sidebar_prepare(prepare_proposals))
+
+# ===================== SQL ENGINE =====================
+# DuckDB runs ad-hoc SQL over the processed frames in process. Registering a
+# frame only records a reference: DuckDB scans the numpy/Arrow buffers in
+# place, vectorised and across all cores, without copying them.
+# The connection is locked down. It cannot touch files, the network or
+# extensions, and cannot see Python variables; it only sees the registered
+# frames. The panel is off unless the server sets DASHBOARD_SQL_PANEL=1.
+SQL_PANEL_ENABLED = os.environ.get("DASHBOARD_SQL_PANEL", "") == "1"
+SQL_RESULT_LIMIT = 10_000  # rows shown in the panel; downloads get everything
+SQL_EXAMPLES = {
+    "Pending by unit": """SELECT unit_name, count(*) AS orders, sum(pending_amount) AS pending
+FROM payments
+GROUP BY unit_name
+ORDER BY pending DESC""",
+    "Payments by proposal client": """SELECT pr.client, count(*) AS work_orders,
+       sum(p.final_amount) AS final_amount, sum(p.payment_received) AS received
+FROM payments p
+JOIN proposals pr  -- both sides keyed like work_order_key: upper case, letters and digits only
+  ON nullif(regexp_replace(upper(pr.no), '[^0-9A-Z]', '', 'g'), '')
+   = nullif(regexp_replace(upper(p.work_order_no), '[^0-9A-Z]', '', 'g'), '')
+GROUP BY pr.client
+ORDER BY final_amount DESC""",
+    "Proposal value by year and status": """SELECT year, status, count(*) AS proposals, sum(amount) AS value
+FROM proposals
+GROUP BY ALL
+ORDER BY year, value DESC""",
+}
+
+def _import_duckdb():
+    try:
+        import duckdb
+    except ImportError as e:
+        raise RuntimeError("The SQL engine needs duckdb (pip install duckdb)") from e
+    return duckdb
+
+class SqlEngine:
+    """In-process DuckDB connection with the dashboard frames registered as tables"""
+    
+    def __init__(self, threads=None):
+        duckdb = _import_duckdb()
+        config = {"enable_external_access": False, "lock_configuration": True}
+        if threads:
+            config["threads"] = int(threads)
+        self.conn = duckdb.connect(":memory:", config=config)
+        self.versions = {}
+        self._lock = threading.Lock()
+    
+    def register(self, name, df, version=None):
+        """Expose ``df`` as table ``name``; re-registers only when the version changes"""
+        version = version or version_of(df)
+        with self._lock:
+            if self.versions.get(name) != version:
+                self.conn.register(name, df)
+                self.versions[name] = version
+        return version
+    
+    def query(self, sql):
+        with self._lock:
+            return self.conn.execute(sql).df()
+    
+    def tables(self):
+        """``{table: [(column, type), ...]}`` of the registered frames"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT table_name, column_name, data_type FROM information_schema.columns "
+                "ORDER BY table_name, ordinal_position"
+            ).fetchall()
+        tables = {}
+        for table, column, data_type in rows:
+            tables.setdefault(table, []).append((column, data_type))
+        return tables
+
+def run_sql(query, **frames):
+    """One-off query, e.g. ``run_sql("SELECT ...", payments=df, proposals=proposal_df)``"""
+    engine = SqlEngine()
+    for name, df in frames.items():
+        engine.register(name, df)
+    return engine.query(query)
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def sql_engine(versions, _df, _proposal_df):
+    """One engine per pair of dataset versions, shared by every session"""
+    engine = SqlEngine()
+    engine.register("payments", _df, versions[0])
+    engine.register("proposals", _proposal_df, versions[1])
+    return engine
+
+@st.cache_data(ttl=600, max_entries=64, show_spinner=False)
+def cached_sql(query, versions, _engine):
+    """Results keyed by query text and dataset versions, which also identify the engine"""
+    perf_cache_miss()
+    return _engine.query(query)
+
+def display_sql_panel(df, proposal_df):
+    """Ad-hoc SQL over the processed payment and proposal data"""
+    st.markdown('<div class="section-header">🧮 Ad-hoc Query</div>', unsafe_allow_html=True)
+    versions = (version_of(df), version_of(proposal_df))
+    try:
+        engine = sql_engine(versions, df, proposal_df)
+    except RuntimeError as e:
+        st.info(str(e))
+        return
+    
+    with st.expander("Tables"):
+        for table, columns in engine.tables().items():
+            st.markdown(f"**{table}**: " + ", ".join(f"`{c}` {t.lower()}" for c, t in columns))
+    
+    example = st.selectbox("Start from an example", list(SQL_EXAMPLES), key="sql_example")
+    with st.form("sql_form"):
+        query = st.text_area("SQL", value=SQL_EXAMPLES[example], height=180)
+        submitted = st.form_submit_button("▶️ Run query")
+    if submitted:
+        st.session_state["sql_query"] = query.strip()
+    
+    # The last submitted query stays on screen across reruns (served from cache)
+    query = st.session_state.get("sql_query")
+    if not query:
+        return
+    
+    try:
+        with perf_cached_stage("sql_query", "query") as record:
+            result = cached_sql(query, versions, engine)
+            record["rows"] = len(result)
+    except Exception as e:
+        st.error(f"❌ Query failed: {str(e)}")
+        return
+    
+    st.caption(f"{len(result):,} rows • {record['seconds'] * 1000:.0f} ms"
+               + (" (cached)" if record["cache"] == "hit" else ""))
+    st.dataframe(result.head(SQL_RESULT_LIMIT), use_container_width=True, height=400)
+    st.download_button("📥 Download result CSV", result.to_csv(index=False).encode("utf-8"), "query_result.csv")
 
 # ===================== MAIN APP =====================
+# Only the selected tab loads, processes and draws its data. Each tab is a
+# fragment: its filters and selectors rerun that tab alone, reusing the frames
+# handed to it by the last full run.
+PAYMENT_TAB = "💰 Payment Dashboard"
+PROPOSAL_TAB = "📋 Proposals Dashboard"
+RECONCILIATION_TAB = "🔗 Reconciliation"
+QUALITY_TAB = "🧪 Data Quality"
+CHANGES_TAB = "🕒 Changes"
+
+@st.fragment
+def payment_tab(df):
+    with perf_fragment_run():
+        display_payment_dashboard(df)
+
+@st.fragment
+def proposal_tab(proposal_df):
+    with perf_fragment_run():
+        # Display Proposal Dashboard (Structured like Payment Dashboard)
+        display_proposal_dashboard(proposal_df)
+        display_proposal_records(proposal_df)
+
+@st.fragment
+def reconciliation_tab(df, proposal_df):
+    with perf_fragment_run():
+        display_reconciliation_dashboard(df, proposal_df)
+
+@st.fragment
+def quality_tab(df, proposal_df):
+    with perf_fragment_run():
+        display_data_quality(df, proposal_df)
+
+@st.fragment
+def changes_tab(df, proposal_df):
+    with perf_fragment_run():
+        display_changes(df, proposal_df)
+
+@st.fragment
+def sql_panel(df, proposal_df):
+    with perf_fragment_run():
+        display_sql_panel(df, proposal_df)
+
 def main():
+    perf_start_run()
+    show_perf = st.sidebar.checkbox("⏱️ Show performance diagnostics", value=False, key="show_perf")
+    show_sql = SQL_PANEL_ENABLED and st.sidebar.checkbox("🧮 Show ad-hoc query panel", value=False, key="show_sql")
+    data_source_settings()
+    if API_PORT:
+        try:
+            st.sidebar.caption(f"🔌 API: {local_api(API_HOST, API_PORT).url}/api/")
+        except OSError as e:
+            st.sidebar.caption(f"🔌 API not started on port {API_PORT}: {str(e)}")
+    
     st.title("💼 Payment & Proposal Dashboard")
     
-    # Create tabs for Payment and Proposal data
-    tab1, tab2 = st.tabs(["💰 Payment Dashboard", "📋 Proposals Dashboard"])
+    # Tab selector: unlike st.tabs, the hidden tabs are not computed at all
+    tab = st.segmented_control(
+        "Dashboard", [PAYMENT_TAB, PROPOSAL_TAB, RECONCILIATION_TAB, QUALITY_TAB, CHANGES_TAB],
+        default=PAYMENT_TAB, key="dashboard_tab", label_visibility="collapsed"
+    ) or PAYMENT_TAB
     
     # 🔄 REFRESH BUTTON
     if st.button("🔄 Refresh All Data", type="primary"):
         st.cache_data.clear()
         st.rerun()
     
-    # Load both datasets
-    with st.spinner("Loading payment data..."):
-        df = load_data()
+    # Load only the datasets the visible sections use
+    df = proposal_df = None
+    if tab != PROPOSAL_TAB or show_sql:
+        with st.spinner("Loading payment data..."):
+            df = load_data()
+    
+    if tab != PAYMENT_TAB or show_sql:
+        with st.spinner("Loading proposal data..."):
+            proposal_df = load_proposals()
+    
+    # Validate what was loaded in the background; the badge never waits
+    validations = []
+    if df is not None and not df.empty:
+        validations.append(submit_validation("payments", df))
+    if proposal_df is not None and not proposal_df.empty:
+        validations.append(submit_validation("proposals", proposal_df, df if tab != PROPOSAL_TAB else None))
+    if validations:
+        validation_badge(validations)
+    
+    # Log row changes of new versions and keep the versions, in the background
+    for kind, frame in (("payments", df), ("proposals", proposal_df)):
+        if frame is not None and "as_of" not in frame.attrs:
+            capture_changes(kind, frame)
+            record_history(kind, frame)
+    
+    if tab == PAYMENT_TAB:
+        payment_tab(df)
+    elif tab == PROPOSAL_TAB:
+        proposal_tab(proposal_df)
+    elif tab == QUALITY_TAB:
+        quality_tab(df, proposal_df)
+    elif tab == CHANGES_TAB:
+        changes_tab(df, proposal_df)
+    else:
+        reconciliation_tab(df, proposal_df)
     
-    with st.spinner("Loading proposal data..."):
-        proposal_df = load_proposals()
+    if show_sql:
+        sql_panel(df, proposal_df)
     
-    # ===================== PAYMENT DASHBOARD TAB =====================
-    with tab1:
-        if df.empty:
-            st.warning("No payment data loaded. Please check your connection and try again.")
-        else:
-            # ===================== KPIs =====================
-            total_order = df["order_amount"].sum()
-            total_final = df["final_amount"].sum()
-            total_received = df["payment_received"].sum()
-            total_pending = df["pending_amount"].sum()
-            
-            st.markdown('<div class="section-header">📈 Key Performance Indicators</div>', unsafe_allow_html=True)
-            
-            st.markdown('<div class="kpi-row">', unsafe_allow_html=True)
-            col1, col2, col3, col4 = st.columns(4)
-            
-            with col1:
-                st.markdown(f"""
-                    <div class="metric-card">
-                        <div class="metric-title">Total Order Amount</div>
-                        <div class="metric-value">₹ {total_order:,.2f}</div>
-                    </div>
-                """, unsafe_allow_html=True)
-            
-            with col2:
-                st.markdown(f"""
-                    <div class="metric-card">
-                        <div class="metric-title">Total Final Amount</div>
-                        <div class="metric-value">₹ {total_final:,.2f}</div>
-                    </div>
-                """, unsafe_allow_html=True)
-            
-            with col3:
-                st.markdown(f"""
-                    <div class="metric-card">
-                        <div class="metric-title">Total Received</div>
-                        <div class="metric-value">₹ {total_received:,.2f}</div>
-                    </div>
-                """, unsafe_allow_html=True)
-            
-            with col4:
-                st.markdown(f"""
-                    <div class="metric-card">
-                        <div class="metric-title">Total Pending</div>
-                        <div class="metric-value">₹ {total_pending:,.2f}</div>
-                    </div>
-                """, unsafe_allow_html=True)
-            st.markdown('</div>', unsafe_allow_html=True)
-            
-            # ===================== PIE CHARTS SECTION =====================
-            st.markdown('<div class="section-header">💰 Payment Analytics</div>', unsafe_allow_html=True)
-            
-            col1, col2 = st.columns(2)
-            
-            # Pie chart: Pending vs Received
-            with col1:
-                st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-                st.markdown("**Pending vs Received**")
-                
-                pie_df = pd.DataFrame({
-                    "Status": ["Received", "Pending"],
-                    "Amount": [total_received, total_pending]
-                })
-                
-                colors = ['#10B981', '#EF4444']
-                
-                fig = px.pie(pie_df, names="Status", values="Amount", hole=0.45,
-                            color_discrete_sequence=colors)
-                fig.update_layout(
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    font_color="white",
-                    showlegend=True,
-                    legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-                    height=400
-                )
-                fig.update_traces(textposition='inside', textinfo='percent+label')
-                st.plotly_chart(fig, use_container_width=True)
-                st.markdown('</div>', unsafe_allow_html=True)
-            
-            # Pie chart: Payment mode distribution
-            with col2:
-                st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-                st.markdown("**Payment Mode Distribution**")
-                
-                if "payment_mode" in df.columns and not df["payment_mode"].empty:
-                    mode_df = df.groupby("payment_mode")["payment_received"].sum().reset_index()
-                    mode_df = mode_df[mode_df["payment_received"] > 0]
-                    
-                    if not mode_df.empty:
-                        fig2 = px.pie(mode_df, names="payment_mode", values="payment_received", 
-                                    hole=0.45, color_discrete_sequence=px.colors.qualitative.Set3)
-                        fig2.update_layout(
-                            paper_bgcolor='rgba(0,0,0,0)',
-                            plot_bgcolor='rgba(0,0,0,0)',
-                            font_color="white",
-                            showlegend=True,
-                            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-                            height=400
-                        )
-                        fig2.update_traces(textposition='inside', textinfo='percent+label')
-                        st.plotly_chart(fig2, use_container_width=True)
-                    else:
-                        st.info("No payment mode data available")
-                else:
-                    st.info("Payment Mode column not available")
-                st.markdown('</div>', unsafe_allow_html=True)
-            
-            # ===================== STATUS WISE PENDING PIE CHART =====================
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-                st.markdown("**Status-wise Pending Distribution**")
-                
-                status_pending = df.groupby("work_status")["pending_amount"].sum().reset_index()
-                status_pending = status_pending[status_pending["pending_amount"] > 0]
-                
-                if not status_pending.empty:
-                    fig3 = px.pie(status_pending, names="work_status", values="pending_amount", 
-                                hole=0.45, color_discrete_sequence=px.colors.qualitative.Pastel)
-                    fig3.update_layout(
-                        paper_bgcolor='rgba(0,0,0,0)',
-                        plot_bgcolor='rgba(0,0,0,0)',
-                        font_color="white",
-                        showlegend=True,
-                        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-                        height=400
-                    )
-                    fig3.update_traces(textposition='inside', textinfo='percent+label')
-                    st.plotly_chart(fig3, use_container_width=True)
-                else:
-                    st.info("No pending amounts by status")
-                st.markdown('</div>', unsafe_allow_html=True)
-            
-            # ===================== STATUS WISE SUMMARY =====================
-            with col2:
-                st.markdown('<div class="status-summary">', unsafe_allow_html=True)
-                st.markdown("**Status-wise Summary**")
-                
-                summary = df.groupby("work_status").agg(
-                    count=("work_status", "count"),
-                    actual_pending=("pending_amount", "sum"),
-                    total_final=("final_amount", "sum"),
-                    total_received=("payment_received", "sum")
-                ).reset_index()
-                
-                for _, row in summary.iterrows():
-                    if row["work_status"].lower() == "completed":
-                        pending_display = 0.0
-                        status_color = "#10B981"
-                    else:
-                        pending_display = row["actual_pending"]
-                        status_color = "#F59E0B"
-                    
-                    st.markdown(f"""
-                        <div class="status-item">
-                            <span style="color: {status_color}; font-weight: 600;">{row['work_status']}</span>
-                            <span>Count: {row['count']} | ₹ {pending_display:,.2f}</span>
-                        </div>
-                    """, unsafe_allow_html=True)
-                
-                st.markdown('</div>', unsafe_allow_html=True)
-            
-            # ===================== YEARLY SUMMARY CHART =====================
-            st.markdown('<div class="section-header">📅 Year-wise Summary</div>', unsafe_allow_html=True)
-            
-            if 'year' in df.columns:
-                yearly_data = df.groupby('year')[
-                    ['order_amount', 'final_amount', 'payment_received', 'pending_amount']
-                ].sum().reset_index()
-                
-                if not yearly_data.empty:
-                    st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-                    fig4 = px.bar(
-                        yearly_data,
-                        x='year',
-                        y=['order_amount', 'final_amount', 'payment_received'],
-                        title='Year-wise Amount Comparison',
-                        labels={'value': 'Amount (₹)', 'year': 'Year', 'variable': 'Type'},
-                        barmode='group',
-                        color_discrete_sequence=['#3B82F6', '#8B5CF6', '#10B981']
-                    )
-                    fig4.update_layout(
-                        paper_bgcolor='rgba(0,0,0,0)',
-                        plot_bgcolor='rgba(0,0,0,0)',
-                        font_color="white",
-                        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-                    )
-                    st.plotly_chart(fig4, use_container_width=True)
-                    st.markdown('</div>', unsafe_allow_html=True)
-            
-            # ===================== FILTERS SECTION =====================
-            st.markdown('<div class="section-header">🔍 Filter Records</div>', unsafe_allow_html=True)
-            
-            filter_col1, filter_col2, filter_col3, filter_col4 = st.columns(4)
-            
-            with filter_col1:
-                # Status filter
-                status_options = ["All"] + sorted(list(df["work_status"].unique()))
-                selected_status = st.selectbox("Filter by Status", status_options, key="payment_status")
-            
-            with filter_col2:
-                # Payment mode filter
-                if "payment_mode" in df.columns:
-                    mode_options = ["All"] + sorted(list(df["payment_mode"].unique()))
-                    selected_mode = st.selectbox("Filter by Payment Mode", mode_options, key="payment_mode_filter")
-                else:
-                    selected_mode = "All"
-            
-            with filter_col3:
-                # Unit filter
-                if "unit_name" in df.columns:
-                    unit_options = ["All"] + sorted(list(df["unit_name"].dropna().unique()))
-                    selected_unit = st.selectbox("Filter by Unit", unit_options, key="payment_unit")
-                else:
-                    selected_unit = "All"
-            
-            with filter_col4:
-                # Amount range filter
-                min_amount = float(df["final_amount"].min())
-                max_amount = float(df["final_amount"].max())
-                amount_range = st.slider(
-                    "Filter by Final Amount (₹)",
-                    min_value=min_amount,
-                    max_value=max_amount,
-                    value=(min_amount, max_amount),
-                    key="payment_amount"
-                )
-            
-            # Apply filters
-            filtered_df = df.copy()
-            if selected_status != "All":
-                filtered_df = filtered_df[filtered_df["work_status"] == selected_status]
-            
-            if selected_mode != "All" and "payment_mode" in filtered_df.columns:
-                filtered_df = filtered_df[filtered_df["payment_mode"] == selected_mode]
-            
-            if selected_unit != "All" and "unit_name" in filtered_df.columns:
-                filtered_df = filtered_df[filtered_df["unit_name"] == selected_unit]
-            
-            filtered_df = filtered_df[
-                (filtered_df["final_amount"] >= amount_range[0]) & 
-                (filtered_df["final_amount"] <= amount_range[1])
-            ]
-            
-            # ===================== RECORDS TABLE =====================
-            st.markdown('<div class="section-header">📋 Detailed Records</div>', unsafe_allow_html=True)
-            
-            # Display filtered results summary
-            st.metric("Filtered Records", len(filtered_df))
-            
-            # Data table with better styling
-            display_columns = []
-            for col in ['unit_name', 'work_order_no', 'order_amount', 'final_amount', 
-                        'payment_received', 'pending_amount', 'payment_mode', 'work_status', 'date']:
-                if col in filtered_df.columns:
-                    display_columns.append(col)
-            
-            if display_columns:
-                # Format numeric columns for display
-                display_df = filtered_df[display_columns].copy()
-                numeric_cols = ['order_amount', 'final_amount', 'payment_received', 'pending_amount']
-                for col in numeric_cols:
-                    if col in display_df.columns:
-                        display_df[col] = display_df[col].apply(lambda x: f"₹ {x:,.2f}")
-                
-                st.dataframe(
-                    display_df,
-                    use_container_width=True,
-                    height=400
-                )
-            else:
-                st.dataframe(filtered_df, use_container_width=True, height=400)
-            
-            # ===================== DOWNLOAD SECTION =====================
-            st.markdown("---")
-            csv = filtered_df.to_csv(index=False).encode("utf-8")
-            st.download_button(
-                "📥 Download Filtered CSV", 
-                csv, 
-                "filtered_payment_data.csv",
-                type="primary"
-            )
-    
-    # ===================== PROPOSAL DASHBOARD TAB =====================
-    with tab2:
-        # Display Proposal Dashboard (Structured like Payment Dashboard)
-        display_proposal_dashboard(proposal_df)
-        
-        if not proposal_df.empty:
-            # ===================== PROPOSAL FILTERS SECTION =====================
-            st.markdown('<div class="section-header">🔍 Filter Proposals</div>', unsafe_allow_html=True)
-            
-            filter_col1, filter_col2, filter_col3, filter_col4 = st.columns(4)
-            
-            with filter_col1:
-                # Status filter for proposals
-                if 'status' in proposal_df.columns:
-                    proposal_status_options = ["All"] + sorted(list(proposal_df['status'].dropna().unique()))
-                    selected_proposal_status = st.selectbox("Filter by Status", proposal_status_options, key="proposal_status")
-                else:
-                    selected_proposal_status = "All"
-            
-            with filter_col2:
-                # Present Status filter
-                if 'present_status' in proposal_df.columns:
-                    present_status_options = ["All"] + sorted(list(proposal_df['present_status'].dropna().unique()))
-                    selected_present_status = st.selectbox("Filter by Present Status", present_status_options, key="present_status")
-                else:
-                    selected_present_status = "All"
-            
-            with filter_col3:
-                # Client filter
-                if 'name' in proposal_df.columns:
-                    client_options = ["All"] + sorted(list(proposal_df['name'].dropna().unique()))
-                    selected_client = st.selectbox("Filter by Client", client_options, key="proposal_client")
-                else:
-                    selected_client = "All"
-            
-            with filter_col4:
-                # Amount range filter for proposals
-                if 'amount' in proposal_df.columns:
-                    prop_min = float(proposal_df['amount'].min())
-                    prop_max = float(proposal_df['amount'].max())
-                    prop_range = st.slider(
-                        "Filter by Amount (₹)",
-                        min_value=prop_min,
-                        max_value=prop_max,
-                        value=(prop_min, prop_max),
-                        key="proposal_amount_range"
-                    )
-                else:
-                    prop_range = (0, 100000000)
-            
-            # Apply proposal filters
-            filtered_proposals = proposal_df.copy()
-            
-            if selected_proposal_status != "All" and 'status' in filtered_proposals.columns:
-                filtered_proposals = filtered_proposals[filtered_proposals['status'] == selected_proposal_status]
-            
-            if selected_present_status != "All" and 'present_status' in filtered_proposals.columns:
-                filtered_proposals = filtered_proposals[filtered_proposals['present_status'] == selected_present_status]
-            
-            if selected_client != "All" and 'name' in filtered_proposals.columns:
-                filtered_proposals = filtered_proposals[filtered_proposals['name'] == selected_client]
-            
-            if 'amount' in filtered_proposals.columns:
-                filtered_proposals = filtered_proposals[
-                    (filtered_proposals['amount'] >= prop_range[0]) & 
-                    (filtered_proposals['amount'] <= prop_range[1])
-                ]
-            
-            # ===================== PROPOSAL DATA TABLE =====================
-            st.markdown('<div class="section-header">📋 Proposal Details</div>', unsafe_allow_html=True)
-            
-            # Display filtered proposal count
-            st.metric("Filtered Proposals", len(filtered_proposals))
-            
-            # Display proposal table with styling
-            if not filtered_proposals.empty:
-                # Format the display dataframe
-                display_proposal_df = filtered_proposals.copy()
-                
-                # Format numeric columns
-                if 'amount' in display_proposal_df.columns:
-                    display_proposal_df['amount'] = display_proposal_df['amount'].apply(
-                        lambda x: f"₹ {x:,.2f}" if pd.notnull(x) else "N/A"
-                    )
-                
-                # Format dates
-                date_columns = ['date', 'wo_date']
-                for date_col in date_columns:
-                    if date_col in display_proposal_df.columns:
-                        display_proposal_df[date_col] = display_proposal_df[date_col].apply(
-                            lambda x: x.strftime('%d-%m-%Y') if pd.notnull(x) else ''
-                        )
-                
-                # Select columns to display
-                display_cols = []
-                for col in ['s_no', 'sno', 'year', 'date', 'name', 'industry_type', 'district', 
-                           'scope_of_work', 'type', 'source', 'status', 'refrence_no', 
-                           'contact_person', 'amount', 'present_status']:
-                    if col in display_proposal_df.columns:
-                        display_cols.append(col)
-                
-                if display_cols:
-                    # Display the dataframe
-                    st.dataframe(
-                        display_proposal_df[display_cols],
-                        use_container_width=True,
-                        height=500
-                    )
-                else:
-                    st.dataframe(display_proposal_df, use_container_width=True, height=500)
-                
-                # Download button for proposals
-                st.markdown("---")
-                proposal_csv = filtered_proposals.to_csv(index=False).encode("utf-8")
-                st.download_button(
-                    "📥 Download Filtered Proposals CSV", 
-                    proposal_csv, 
-                    "filtered_proposals_data.csv",
-                    type="primary"
-                )
-            else:
-                st.info("No proposals match the selected filters.")
+    perf_finish_run()
+    if show_perf:
+        display_perf_panel()
     
     # ===================== FOOTER =====================
     st.markdown("---")
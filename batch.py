@@ -0,0 +1,45 @@
+"""Headless batch run: load, process and snapshot the ledgers without Streamlit.
+
+Writes the processed payment and proposal frames (Parquet), the dashboard's
+aggregates (CSV) and a KPI summary (``summary.json``) to ``--out``. Run it from
+cron or a worker; the dashboard serves the result as its "Precomputed
+Snapshot" data source without processing anything on the request path.
+
+    python batch.py --source local --path data --out snapshots
+    python batch.py --source registry --path sources.json
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+
+import pipeline
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--source", default="csv", choices=pipeline.BATCH_SOURCES)
+    parser.add_argument("--path", help="data directory/file for local, sources file for registry")
+    parser.add_argument("--out", help="snapshot directory (default: DASHBOARD_SNAPSHOT_DIR or snapshots)")
+    parser.add_argument("--quiet", action="store_true", help="only log warnings and errors")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING if args.quiet else logging.INFO,
+                        format="%(asctime)s %(levelname)s %(message)s")
+
+    out_dir = args.out or pipeline.SNAPSHOT_DIR
+    try:
+        summary = pipeline.run_batch(args.source, out_dir, args.path)
+    except Exception as e:
+        logging.error("Batch run failed: %s", e)
+        return 1
+    if not args.quiet:
+        print(json.dumps({key: summary[key] for key in ("generated_at", "source", "versions", "payments")},
+                         indent=2, default=str))
+    logging.info("Snapshot written to %s", os.path.abspath(out_dir))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
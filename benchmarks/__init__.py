@@ -0,0 +1 @@
+"""Offline benchmarks for the dashboard pipeline (run with ``python -m benchmarks.<name>``)"""
@@ -0,0 +1,90 @@
+"""Load time and peak RSS of the local data backends on synthetic ledgers.
+
+The payment sheet is written once per size as CSV, Parquet and a SQLite table.
+Each backend then loads it in full and with a pushed-down filter, in a fresh
+subprocess so peak RSS is not polluted by earlier runs.
+
+    python -m benchmarks.bench_backends --sizes 100k 1m
+"""
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic import parse_size, payment_sheet
+
+BACKENDS = ["csv", "parquet", "sqlite"]
+FILTER = (("Work Status", "in", ("Completed", "Pending")), ("Payment Mode", "==", "Online"))
+
+
+def write_dataset(directory, rows):
+    raw = payment_sheet(rows)
+    os.makedirs(os.path.join(directory, "csv"), exist_ok=True)
+    os.makedirs(os.path.join(directory, "parquet"), exist_ok=True)
+    raw.to_csv(os.path.join(directory, "csv", "payments.csv"), index=False)
+    # Small row groups let the Parquet reader skip groups by their statistics
+    raw.to_parquet(os.path.join(directory, "parquet", "payments.parquet"), row_group_size=50_000)
+    with sqlite3.connect(os.path.join(directory, "ledger.db")) as conn:
+        raw.to_sql("payments", conn, index=False)
+        conn.execute('CREATE INDEX payments_status ON payments ("Work Status", "Payment Mode")')
+
+
+def _measure(backend, directory, filtered):
+    """Runs in the child process"""
+    logging.disable(logging.WARNING)
+    import pipeline
+    from benchmarks.rss import peak_rss_mb, rss_mb
+
+    path = {"csv": "csv", "parquet": "parquet", "sqlite": "ledger.db"}[backend]
+    source = pipeline.local_backend(os.path.join(directory, path))
+    start_rss = rss_mb()
+    start = time.perf_counter()
+    df = source.load("payments", FILTER if filtered else ())
+    return {
+        "backend": source.name,
+        "filtered": filtered,
+        "rows_out": len(df),
+        "seconds": time.perf_counter() - start,
+        "peak_mb": max(peak_rss_mb() - start_rss, 0.0),
+    }
+
+
+def measure(backend, directory, filtered):
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_backends", "--child", backend, directory, str(int(filtered))],
+        check=True, capture_output=True, text=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", default=["100k", "1m"])
+    parser.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        backend, directory, filtered = args.child
+        print(json.dumps(_measure(backend, directory, filtered == "1")))
+        return
+
+    for token in args.sizes:
+        rows = parse_size(token)
+        with tempfile.TemporaryDirectory() as directory:
+            write_dataset(directory, rows)
+            print(f"\n{rows:,} rows")
+            print(f"  {'backend':<12}{'filter':>8}{'rows out':>12}{'seconds':>10}{'peak MB':>10}")
+            for backend in BACKENDS:
+                for filtered in (False, True):
+                    r = measure(backend, directory, filtered)
+                    print(f"  {r['backend']:<12}{'yes' if r['filtered'] else 'no':>8}{r['rows_out']:>12,}"
+                          f"{r['seconds']:>10.3f}{r['peak_mb']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
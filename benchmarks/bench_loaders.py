@@ -0,0 +1,89 @@
+"""Loader latency, fallback and caching behaviour against the mock Sheets server.
+
+For every latency / failure-rate scenario each loader is called cold (cache
+cleared) and then warm, ``--trials`` times. The report shows cold and warm
+latency percentiles, how often a load succeeded and how many HTTP requests a
+load cost on average (failed export URLs fall through to the next format).
+
+    python -m benchmarks.bench_loaders --rows 10k --latency 0 200 --failure-rate 0 0.3
+"""
+import argparse
+import itertools
+import logging
+import statistics
+import time
+
+from benchmarks.synthetic import parse_size, payment_sheet
+from mock_sheets_server import MockSheets, start_server
+
+
+def _percentile(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+def run_scenario(app, raw, latency, failure_rate, trials, seed):
+    import pipeline
+
+    sheets = MockSheets(latency_ms=latency, failure_rate=failure_rate, seed=seed)
+    sheets.add_sheet(pipeline.SPREADSHEET_ID, pipeline.SHEET_GID, pipeline.SHEET_NAME, raw)
+    server = start_server(sheets)
+    # The backends read the endpoint from the pipeline module
+    pipeline.SHEETS = pipeline.SheetsEndpoint(base_url=server.url, api_base_url=server.url)
+
+    results = []
+    try:
+        for loader in (app.load_via_csv, app.load_via_values_api):
+            cold, warm, ok = [], [], 0
+            requests_before = sum(sheets.requests.values())
+            for _ in range(trials):
+                # Each cold load starts with a closed circuit, so failures reach the fallbacks
+                loader.clear()
+                app.sheets_breakers.clear()
+                start = time.perf_counter()
+                df = loader()
+                cold.append(time.perf_counter() - start)
+                ok += df is not None
+                start = time.perf_counter()
+                loader()
+                warm.append(time.perf_counter() - start)
+            results.append({
+                "loader": loader.__name__,
+                "latency_ms": latency,
+                "failure_rate": failure_rate,
+                "cold_p50": statistics.median(cold),
+                "cold_p95": _percentile(cold, 0.95),
+                "warm_p50": statistics.median(warm),
+                "success": ok / trials,
+                "requests_per_load": (sum(sheets.requests.values()) - requests_before) / trials,
+            })
+    finally:
+        server.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", default="10k", help="payment rows served (e.g. 1k, 100k)")
+    parser.add_argument("--latency", nargs="+", type=float, default=[0, 200], help="latency scenarios in ms")
+    parser.add_argument("--failure-rate", nargs="+", type=float, default=[0, 0.3], help="failure-rate scenarios")
+    parser.add_argument("--trials", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    import app
+
+    raw = payment_sheet(parse_size(args.rows))
+    print(f"{'loader':<22}{'latency':>9}{'fail':>6}{'cold p50':>10}{'cold p95':>10}{'warm p50':>10}{'ok':>6}{'req/load':>10}")
+    for latency, failure_rate in itertools.product(args.latency, args.failure_rate):
+        for r in run_scenario(app, raw, latency, failure_rate, args.trials, args.seed):
+            print(f"{r['loader']:<22}{r['latency_ms']:>7.0f}ms{r['failure_rate']:>6.0%}"
+                  f"{r['cold_p50']:>9.3f}s{r['cold_p95']:>9.3f}s{r['warm_p50'] * 1000:>8.2f}ms"
+                  f"{r['success']:>6.0%}{r['requests_per_load']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Peak RSS per dashboard rerun, before and after the copy-elimination pass.
+
+Each variant runs in a fresh interpreter so the numbers do not bleed into each
+other. On Linux the peak is reset between reruns through ``/proc/self/clear_refs``
+so every rerun reports its own high-water mark; elsewhere ``ru_maxrss`` is used and
+only the first rerun is meaningful.
+
+    python -m benchmarks.bench_memory --rows 200000 --reruns 3
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+
+import pipeline
+from benchmarks.rss import peak_rss_mb, reset_peak_rss, rss_mb
+
+DISPLAY_COLUMNS = ['unit_name', 'work_order_no', 'order_amount', 'final_amount',
+                   'payment_received', 'pending_amount', 'payment_mode', 'work_status', 'date']
+NUMERIC_COLUMNS = ['order_amount', 'final_amount', 'payment_received', 'pending_amount']
+
+
+def rerun_before(app, raw):
+    """The pipeline as it was: a full copy at every stage"""
+    df = pipeline.process_raw_data(raw.copy())
+    filtered_df = df.copy()
+    filtered_df = filtered_df[filtered_df["work_status"] != "Pending"]
+    filtered_df = filtered_df[filtered_df["final_amount"] >= 0]
+    display_df = filtered_df[DISPLAY_COLUMNS].copy()
+    for col in NUMERIC_COLUMNS:
+        display_df[col] = display_df[col].apply(lambda x: f"₹ {x:,.2f}")
+    return display_df
+
+
+def rerun_after(app, raw):
+    """The current pipeline: lazy copies and a single filter mask"""
+    df = pipeline.process_raw_data(raw)
+    mask = app.payment_filter_mask(df, amount_range=(0, float("inf")))
+    mask &= df["work_status"] != "Pending"
+    filtered_df = pipeline.apply_mask(df, mask)
+    display_df = filtered_df[DISPLAY_COLUMNS]
+    return display_df.assign(**{col: display_df[col].map("₹ {:,.2f}".format) for col in NUMERIC_COLUMNS})
+
+
+def run_variant(variant, rows, reruns):
+    logging.disable(logging.WARNING)
+    import app
+    from benchmarks.synthetic import payment_sheet
+
+    raw = payment_sheet(rows)
+    baseline = rss_mb()
+    rerun = rerun_before if variant == "before" else rerun_after
+    peaks = []
+    for _ in range(reruns):
+        reset_peak_rss()
+        rerun(app, raw)
+        peaks.append(peak_rss_mb() - baseline)
+    return {"variant": variant, "rows": rows, "baseline_mb": baseline, "peak_mb_per_rerun": peaks}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--reruns", type=int, default=3)
+    parser.add_argument("--variant", choices=["before", "after"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(run_variant(args.variant, args.rows, args.reruns)))
+        return
+
+    results = []
+    for variant in ("before", "after"):
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_memory", "--variant", variant,
+             "--rows", str(args.rows), "--reruns", str(args.reruns)],
+            capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        )
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    print(f"Peak RSS above baseline per rerun ({args.rows:,} rows)")
+    for r in results:
+        peaks = ", ".join(f"{p:8.1f} MB" for p in r["peak_mb_per_rerun"])
+        print(f"  {r['variant']:<7} baseline {r['baseline_mb']:8.1f} MB | {peaks}")
+
+
+if __name__ == "__main__":
+    main()
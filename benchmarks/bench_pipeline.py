@@ -0,0 +1,140 @@
+"""End-to-end timing of every dashboard pipeline stage on synthetic ledgers.
+
+Payment and proposal sheets are generated at each requested size, served as CSV
+exports from mock_sheets_server.py, and pushed through the same loaders,
+processing, insights, filters, cross-filter cube and figure builders the dashboard uses.
+Each stage reports wall time, throughput and peak RSS above the stage's start.
+
+    python -m benchmarks.bench_pipeline --sizes 1k 100k 1m
+    python -m benchmarks.bench_pipeline --sizes 1k --json bench_output.json
+    python -m benchmarks.bench_pipeline --sizes 100k 1m --workers 8   # processing on a process pool
+"""
+import argparse
+import json
+import logging
+import time
+import warnings
+
+from benchmarks.rss import peak_rss_mb, reset_peak_rss, rss_mb
+from benchmarks.synthetic import parse_size, payment_sheet, proposal_sheet
+from mock_sheets_server import MockSheets, start_server
+
+
+def _stage(results, name, rows, fn, *args):
+    reset_peak_rss()
+    start_rss = rss_mb()
+    start = time.perf_counter()
+    out = fn(*args)
+    seconds = time.perf_counter() - start
+    results.append({
+        "stage": name,
+        "rows": rows,
+        "seconds": seconds,
+        "rows_per_s": rows / seconds if seconds else float("inf"),
+        "peak_mb": max(peak_rss_mb() - start_rss, 0.0),
+    })
+    return out
+
+
+def _build_figures(builders):
+    # to_json() is what st.plotly_chart serializes, so it is part of the cost
+    return [fig.to_json() for fig in (build() for build in builders) if fig is not None]
+
+
+def run_size(app, rows, source):
+    import pipeline
+
+    results = []
+    raw_payments = payment_sheet(rows)
+    raw_proposals = proposal_sheet(rows, payment_rows=rows)
+
+    if source == "csv":
+        sheets = MockSheets()
+        sheets.add_sheet(pipeline.SPREADSHEET_ID, pipeline.SHEET_GID, pipeline.SHEET_NAME, raw_payments)
+        sheets.add_sheet(pipeline.SPREADSHEET_ID, pipeline.PROPOSAL_GID, pipeline.PROPOSAL_SHEET_NAME, raw_proposals)
+        server = start_server(sheets)
+        # The backends read the endpoint from the pipeline module
+        pipeline.SHEETS = pipeline.SheetsEndpoint(base_url=server.url, api_base_url=server.url)
+        try:
+            app.load_via_csv.clear()
+            app.load_proposal_via_csv.clear()
+            raw_payments = _stage(results, "load_via_csv", rows, app.load_via_csv)
+            raw_proposals = _stage(results, "load_proposal_via_csv", rows, app.load_proposal_via_csv)
+        finally:
+            server.shutdown()
+
+    df = _stage(results, "process_raw_data", rows, pipeline.process_raw_data, raw_payments)
+    proposal_df = _stage(results, "process_proposal_data", rows, pipeline.process_proposal_data, raw_proposals)
+    _stage(results, "get_proposal_insights", rows, pipeline.get_proposal_insights, proposal_df)
+
+    _stage(results, "payment_filters", rows, lambda: app.apply_mask(df, app.payment_filter_mask(
+        df, status="Completed", amount_range=(0, float(df["final_amount"].max())))))
+    _stage(results, "proposal_filters", rows, lambda: app.apply_mask(proposal_df, app.proposal_filter_mask(
+        proposal_df, status="Ok", amount_range=(0, float(proposal_df["amount"].max())))))
+
+    # Cross-filtering: cube per version, then one click (every chart and the table rows)
+    cube = _stage(results, "crossfilter_cube", rows, app.build_crossfilter_cube, "proposals", proposal_df)
+    selections = {"status": [cube.labels["status"][0]], "source": [cube.labels["source"][0]]}
+    _stage(results, "crossfilter_select", rows, lambda: (
+        [cube.aggregate(dimension, selections) for dimension in cube.codes], cube.rows(selections)))
+
+    _stage(results, "payment_figures", rows, _build_figures, [
+        lambda: app.pending_received_figure(df["payment_received"].sum(), df["pending_amount"].sum()),
+        lambda: app.payment_mode_figure(df),
+        lambda: app.status_pending_figure(df),
+        lambda: app.yearly_figure(df),
+    ])
+    _stage(results, "proposal_figures", rows, _build_figures, [
+        lambda: app.proposal_status_figure(proposal_df),
+        lambda: app.present_status_figure(proposal_df),
+        lambda: app.value_by_status_figure(proposal_df),
+        lambda: app.top_clients_figure(proposal_df),
+        lambda: app.industry_figure(proposal_df),
+        lambda: app.source_figure(proposal_df),
+    ])
+    return results
+
+
+def print_table(rows, results):
+    print(f"\n{rows:,} rows")
+    print(f"  {'stage':<24}{'seconds':>10}{'rows/s':>14}{'peak MB':>10}")
+    for r in results:
+        print(f"  {r['stage']:<24}{r['seconds']:>10.3f}{r['rows_per_s']:>14,.0f}{r['peak_mb']:>10.1f}")
+    print(f"  {'total':<24}{sum(r['seconds'] for r in results):>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", default=["1k", "100k", "1m"],
+                        help="row counts, e.g. 1k 100k 1m or plain integers")
+    parser.add_argument("--source", choices=["csv", "memory"], default="csv",
+                        help="load through the local CSV stand-in, or hand the raw frames straight to processing")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="process pool size for the cell conversions (0 = in-process)")
+    parser.add_argument("--json", metavar="PATH", help="also write all results as JSON")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    # The dirty date columns make pandas warn on every mixed-format value
+    warnings.simplefilter("ignore", UserWarning)
+    import app
+    import pipeline
+
+    pipeline.PROCESS_WORKERS = args.workers
+    if args.workers > 1:
+        # Spawn the workers up front so their start-up is not billed to the first size
+        pipeline.processing_pool(args.workers)
+
+    report = {}
+    for token in args.sizes:
+        rows = parse_size(token)
+        report[rows] = run_size(app, rows, args.source)
+        print_table(rows, report[rows])
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({str(k): v for k, v in report.items()}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Cold-start cost: import time, server readiness and time to the first rendered page.
+
+Every measurement runs in a fresh interpreter, once with the heavy imports
+deferred (the default) and once with ``DASHBOARD_EAGER_IMPORTS=1``:
+
+- ``import``: ``import app`` with Streamlit and pandas already loaded, as in a running server,
+- ``first run``: the whole script's first run (imports, loading, charts) through
+  Streamlit's AppTest, against the mock Sheets server,
+- ``server ready``: ``streamlit run app.py`` until its health endpoint answers.
+
+    python -m benchmarks.bench_startup --trials 5
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+from mock_sheets_server import MockSheets, start_server
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "app.py")
+MODES = {"lazy": "0", "eager": "1"}
+
+IMPORT_CHILD = """
+import json, logging, sys, time
+logging.disable(logging.WARNING)
+import streamlit, pandas
+start = time.perf_counter()
+import app
+print(json.dumps({"seconds": time.perf_counter() - start,
+                  "heavy_loaded": [m for m in ("pygsheets", "plotly.express", "requests") if m in sys.modules]}))
+"""
+
+FIRST_RUN_CHILD = """
+import json, logging, sys, time, warnings
+logging.disable(logging.WARNING)
+warnings.simplefilter("ignore")
+from streamlit.testing.v1 import AppTest
+start = time.perf_counter()
+at = AppTest.from_file(sys.argv[1], default_timeout=300)
+at.run()
+print(json.dumps({"seconds": time.perf_counter() - start, "exceptions": len(at.exception)}))
+"""
+
+
+def _child(code, env, *args):
+    out = subprocess.run([sys.executable, "-c", code, *args], cwd=ROOT, env=env,
+                         check=True, capture_output=True, text=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def server_ready(env, timeout=120):
+    """Seconds from ``streamlit run`` to a healthy server"""
+    port = _free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", APP, "--server.headless", "true",
+         "--server.port", str(port), "--browser.gatherUsageStats", "false"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.05)
+        raise TimeoutError("streamlit did not become healthy")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--trials", type=int, default=5)
+    parser.add_argument("--skip-server", action="store_true", help="skip the streamlit run readiness check")
+    parser.add_argument("--json", metavar="PATH", help="also write all results as JSON")
+    args = parser.parse_args()
+
+    server = start_server(MockSheets.from_manifest())
+    report = {}
+    try:
+        for mode, eager in MODES.items():
+            env = dict(os.environ, DASHBOARD_EAGER_IMPORTS=eager,
+                       SHEETS_BASE_URL=server.url, SHEETS_API_BASE_URL=server.url)
+            imports = [_child(IMPORT_CHILD, env) for _ in range(args.trials)]
+            first_runs = [_child(FIRST_RUN_CHILD, env, APP) for _ in range(args.trials)]
+            ready = [] if args.skip_server else [server_ready(env) for _ in range(args.trials)]
+            report[mode] = {
+                "import_s": [r["seconds"] for r in imports],
+                "heavy_loaded_on_import": imports[-1]["heavy_loaded"],
+                "first_run_s": [r["seconds"] for r in first_runs],
+                "first_run_exceptions": sum(r["exceptions"] for r in first_runs),
+                "server_ready_s": ready,
+            }
+    finally:
+        server.shutdown()
+
+    print(f"{'mode':<8}{'import p50':>12}{'first run p50':>15}{'server ready p50':>18}  heavy modules on import")
+    for mode, r in report.items():
+        ready = f"{statistics.median(r['server_ready_s']):>17.3f}s" if r["server_ready_s"] else f"{'-':>18}"
+        print(f"{mode:<8}{statistics.median(r['import_s']):>11.3f}s{statistics.median(r['first_run_s']):>14.3f}s"
+              f"{ready}  {', '.join(r['heavy_loaded_on_import']) or '-'}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
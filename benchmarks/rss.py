@@ -0,0 +1,34 @@
+"""Resident-set-size probes shared by the benchmarks (Linux ``/proc`` with a portable fallback)"""
+import resource
+
+
+def _status_mb(field):
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def rss_mb():
+    """Current RSS in MB"""
+    current = _status_mb("VmRSS:")
+    return current if current is not None else peak_rss_mb()
+
+
+def peak_rss_mb():
+    """High-water RSS in MB since the last ``reset_peak_rss()``"""
+    peak = _status_mb("VmHWM:")
+    return peak if peak is not None else resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def reset_peak_rss():
+    """Reset the high-water mark so the next reading covers one stage only (Linux only)"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
@@ -0,0 +1,172 @@
+"""Synthetic ledgers shaped like the Google Sheets the dashboard reads.
+
+Values are deliberately dirty in the ways the real sheets are: ₹ prefixes,
+Indian and western digit grouping, negatives in parentheses, blanks and
+placeholders, mixed date formats and inconsistently cased statuses.
+
+    from benchmarks.synthetic import payment_sheet, proposal_sheet, parse_size
+    raw = payment_sheet(parse_size("100k"))
+"""
+import numpy as np
+import pandas as pd
+
+SIZES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+UNITS = [f"Unit {chr(65 + i)}{j}" for i in range(26) for j in range(4)]
+# (clean values, messy spellings of the same values)
+PAYMENT_MODES = (["Online", "Cash", "Cheque", "Cash and Online"], [" online", "CHEQUE", "cash "])
+WORK_STATUSES = (["Completed", "In Progress", "Pending"], [" completed", "COMPLETED ", "in progress", "pending  "])
+PROPOSAL_STATUSES = (["OK", "Drop", "Follow-up", "Pending"], ["ok", " OK ", "DROP", "drop ", "Follow up", "follow-up"])
+PRESENT_STATUSES = (
+    ["Ongoing", "Others", "Follow-up", "Completed", "Approved", "Pending", "Rejected"],
+    ["ongoing ", "FOLLOW UP", "approved"],
+)
+INDUSTRIES = ["Steel", "Cement", "Pharma", "Textile", "Chemical", "Food Processing", "Power", "Automobile"]
+DISTRICTS = ["Pune", "Nagpur", "Nashik", "Aurangabad", "Thane", "Kolhapur", "Satara", "Solapur"]
+SOURCES = ["Referral", "Website", "Cold Call", "Existing Client", "Tender", "Exhibition"]
+SCOPES = ["Energy Audit", "Safety Audit", "Water Audit", "Fire Audit", "Electrical Audit"]
+TYPES = ["New", "Renewal", "Repeat"]
+
+CLIENT_BASES = [
+    f"{a} {b}" for a in ["Shree Ganesh", "Om Sai", "Mahalaxmi", "Bharat", "Sahyadri", "Krishna", "Jai Hind", "Deccan"]
+    for b in ["Steels", "Cements", "Pharma", "Textiles", "Chemicals", "Foods", "Power", "Auto Components"]
+]
+CLIENT_SUFFIXES = [" Pvt Ltd", " Pvt. Ltd.", " Private Limited", " PVT LTD", "", " Ltd", " Limited"]
+
+DATE_FORMATS = ["%d/%m/%Y", "%Y-%m-%d", "%d-%b-%Y", "%d.%m.%Y", "%d/%m/%y"]
+AMOUNT_PLACEHOLDERS = ["", "-", "N/A", "nil"]
+
+
+def parse_size(token):
+    """Turn ``1k``/``100k``/``1m`` (or a plain integer) into a row count"""
+    token = str(token).strip().lower()
+    return SIZES[token] if token in SIZES else int(token)
+
+
+def _indian_grouping(value):
+    """Format like ``12,34,567.00``"""
+    sign = "-" if value < 0 else ""
+    whole, frac = f"{abs(value):.2f}".split(".")
+    head, tail = whole[:-3], whole[-3:]
+    groups = []
+    while len(head) > 2:
+        groups.insert(0, head[-2:])
+        head = head[:-2]
+    if head:
+        groups.insert(0, head)
+    return sign + ",".join(groups + [tail]) + "." + frac
+
+
+def _money(values, rng, dirty):
+    """Render amounts as sheet strings, mixing formats when ``dirty``"""
+    out = pd.Series(values).map("{:,.2f}".format).to_numpy(dtype=object)
+    if not dirty:
+        return out
+    n = len(out)
+    roll = rng.random(n)
+    rupee = np.flatnonzero(roll < 0.15)
+    out[rupee] = ["₹ " + _indian_grouping(v) for v in np.asarray(values)[rupee]]
+    plain = np.flatnonzero((roll >= 0.15) & (roll < 0.25))
+    out[plain] = pd.Series(np.asarray(values)[plain]).map("{:.2f}".format).to_numpy(dtype=object)
+    blank = np.flatnonzero((roll >= 0.25) & (roll < 0.27))
+    out[blank] = rng.choice(AMOUNT_PLACEHOLDERS, len(blank))
+    return out
+
+
+def _negatives_in_parentheses(rendered, rng, share=0.01):
+    """Turn a small share of amounts into accounting-style negatives"""
+    idx = np.flatnonzero(rng.random(len(rendered)) < share)
+    rendered[idx] = ["(" + str(v).replace("₹ ", "") + ")" for v in rendered[idx]]
+    return rendered
+
+
+def _dates(rows, rng, dirty, start="2020-01-01", days=365 * 5):
+    """Return ``(rendered strings, underlying timestamps)``"""
+    offsets = rng.integers(0, days, rows)
+    calendar = pd.date_range(start, periods=days, freq="D")
+    dates = calendar[offsets]
+    # Format each calendar day once and gather, instead of strftime per row
+    if not dirty:
+        return calendar.strftime("%d/%m/%Y").to_numpy(dtype=object)[offsets], dates
+    fmt = rng.integers(0, len(DATE_FORMATS), rows)
+    rendered = np.stack([calendar.strftime(f).to_numpy(dtype=object) for f in DATE_FORMATS])
+    out = rendered[fmt, offsets]
+    roll = rng.random(rows)
+    out[roll < 0.02] = ""
+    out[(roll >= 0.02) & (roll < 0.025)] = "TBD"
+    return out, dates
+
+
+def _choice(values, rows, rng, dirty):
+    clean, messy = values
+    return rng.choice(clean + messy if dirty else clean, rows)
+
+
+def payment_sheet(rows, seed=0, dirty=True):
+    """Raw payment sheet with the same headers and string formats as the real sheet"""
+    rng = np.random.default_rng(seed)
+    order = rng.uniform(1e4, 1e8, rows).round(2)
+    final = (order * rng.uniform(1.0, 1.2, rows)).round(2)
+    received = (final * rng.uniform(0, 1, rows)).round(2)
+    pending = _money(final - received, rng, dirty)
+    if dirty:
+        pending = _negatives_in_parentheses(pending, rng)
+    return pd.DataFrame({
+        "Unit Name": rng.choice(UNITS, rows),
+        "Work Order No": [f"WO{i:07d}" for i in range(rows)],
+        "Order Amount": _money(order, rng, dirty),
+        "Final Amount": _money(final, rng, dirty),
+        "Payment Received": _money(received, rng, dirty),
+        "Pending Amount": pending,
+        "Payment Mode": _choice(PAYMENT_MODES, rows, rng, dirty),
+        "Work Status": _choice(WORK_STATUSES, rows, rng, dirty),
+        "Date": _dates(rows, rng, dirty)[0],
+    })
+
+
+def _client_names(rows, rng, dirty):
+    base = rng.choice(CLIENT_BASES, rows).astype(object)
+    if not dirty:
+        return base + " Pvt Ltd, " + rng.choice(DISTRICTS, rows)
+    suffix = rng.choice(CLIENT_SUFFIXES, rows)
+    names = pd.Series(base + suffix)
+    roll = rng.random(rows)
+    names[roll < 0.1] = names[roll < 0.1].str.upper()
+    names[(roll >= 0.1) & (roll < 0.15)] = "M/s " + names[(roll >= 0.1) & (roll < 0.15)]
+    with_district = rng.random(rows) < 0.5
+    names[with_district] = names[with_district] + ", " + rng.choice(DISTRICTS, int(with_district.sum()))
+    return names.to_numpy(dtype=object)
+
+
+def proposal_sheet(rows, seed=1, payment_rows=None, dirty=True):
+    """Raw proposal sheet; roughly a third of the rows reference payment work orders"""
+    rng = np.random.default_rng(seed)
+    payment_rows = payment_rows or rows
+    dates, stamps = _dates(rows, rng, dirty)
+    amount = rng.uniform(5e4, 5e7, rows).round(2)
+
+    work_orders = np.full(rows, "", dtype=object)
+    linked = np.flatnonzero(rng.random(rows) < 0.35)
+    work_orders[linked] = [f"WO{i:07d}" for i in rng.integers(0, payment_rows, len(linked))]
+    if dirty:
+        messy = linked[rng.random(len(linked)) < 0.3]
+        work_orders[messy] = [f" wo-{str(v)[2:]} " for v in work_orders[messy]]
+
+    return pd.DataFrame({
+        "S.No": np.arange(1, rows + 1),
+        "Year": stamps.year.astype(str).to_numpy(),
+        "Date": dates,
+        "WO Date": _dates(rows, rng, dirty, start="2020-02-01")[0],
+        "No": work_orders,
+        "Name": _client_names(rows, rng, dirty),
+        "Industry Type": rng.choice(INDUSTRIES, rows),
+        "District": rng.choice(DISTRICTS, rows),
+        "Scope of Work": rng.choice(SCOPES, rows),
+        "Type": rng.choice(TYPES, rows),
+        "Source": rng.choice(SOURCES, rows),
+        "Status": _choice(PROPOSAL_STATUSES, rows, rng, dirty),
+        "Refrence No": [f"REF/{i:06d}" for i in range(1, rows + 1)],
+        "Contact Person": rng.choice(["Mr. Patil", "Ms. Joshi", "Mr. Khan", "Mrs. Rao", ""], rows),
+        "Amount": _money(amount, rng, dirty),
+        "Present Status": _choice(PRESENT_STATUSES, rows, rng, dirty),
+    })
@@ -0,0 +1,252 @@
+"""Local stand-in for the Google Sheets endpoints the dashboard loads from.
+
+Serves the CSV export (``/spreadsheets/d/<id>/export``, ``/gviz/tq``) and the
+Sheets v4 values API (``/v4/spreadsheets/<id>`` and ``/values/<range>``) from
+fixture files, with configurable latency, failure rate and payload size, so
+fetching, fallbacks and caching can be exercised without network access.
+
+    python mock_sheets_server.py --port 8765 --latency 250 --jitter 100 --failure-rate 0.2
+    SHEETS_BASE_URL=http://127.0.0.1:8765 SHEETS_API_BASE_URL=http://127.0.0.1:8765 streamlit run app.py
+
+Fixtures are described by ``fixtures/sheets.json``; ``--synthetic 100k`` swaps
+their contents for generated ledgers of that size and ``--repeat N`` repeats
+every data row N times.
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+import pandas as pd
+
+DEFAULT_MANIFEST = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "sheets.json")
+
+
+class MockSheets:
+    """Spreadsheets, tabs and failure knobs served by the stand-in"""
+
+    def __init__(self, latency_ms=0, jitter_ms=0, failure_rate=0.0, failure_status=503, repeat=1, seed=None):
+        self.spreadsheets = {}  # id -> {"title": str, "sheets": [tab, ...]}
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.repeat = repeat
+        self.requests = Counter()  # endpoint kind -> count, for benchmarks
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_manifest(cls, path=DEFAULT_MANIFEST, **knobs):
+        sheets = cls(**knobs)
+        base = os.path.dirname(os.path.abspath(path))
+        with open(path) as f:
+            manifest = json.load(f)
+        for spreadsheet_id, spec in manifest["spreadsheets"].items():
+            for tab in spec["sheets"]:
+                frame = pd.read_csv(os.path.join(base, tab["file"]), dtype=str, keep_default_na=False)
+                sheets.add_sheet(spreadsheet_id, tab["gid"], tab["title"], frame, spreadsheet_title=spec.get("title"))
+        return sheets
+
+    def add_sheet(self, spreadsheet_id, gid, title, frame, spreadsheet_title=None):
+        """Register (or replace) a tab; ``frame`` holds the cells as strings"""
+        spreadsheet = self.spreadsheets.setdefault(
+            spreadsheet_id, {"title": spreadsheet_title or spreadsheet_id, "sheets": []}
+        )
+        spreadsheet["sheets"] = [t for t in spreadsheet["sheets"] if t["gid"] != str(gid)]
+        if self.repeat > 1:
+            frame = pd.concat([frame] * self.repeat, ignore_index=True)
+        spreadsheet["sheets"].append({"gid": str(gid), "title": title, "frame": frame.astype(str)})
+
+    def csv(self, tab):
+        """CSV export body, rendered on first request"""
+        with self._lock:
+            if "csv" not in tab:
+                tab["csv"] = tab["frame"].to_csv(index=False).encode("utf-8")
+            return tab["csv"]
+
+    def values(self, tab):
+        """Values API rows (header first), rendered on first request"""
+        with self._lock:
+            if "values" not in tab:
+                frame = tab["frame"]
+                tab["values"] = [list(frame.columns)] + [_trim_row(r) for r in frame.itertuples(index=False, name=None)]
+            return tab["values"]
+
+    def tab(self, spreadsheet_id, gid=None, title=None):
+        spreadsheet = self.spreadsheets.get(spreadsheet_id)
+        if not spreadsheet or not spreadsheet["sheets"]:
+            return None
+        for tab in spreadsheet["sheets"]:
+            if (gid is not None and tab["gid"] == str(gid)) or (title is not None and tab["title"] == title):
+                return tab
+        # Like Google, an export without a gid returns the first tab
+        return spreadsheet["sheets"][0] if gid is None and title is None else None
+
+    def delay(self):
+        if self.latency_ms or self.jitter_ms:
+            with self._lock:
+                jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms)
+            time.sleep(max(self.latency_ms + jitter, 0) / 1000)
+
+    def should_fail(self):
+        with self._lock:
+            return self._random.random() < self.failure_rate
+
+
+def _trim_row(row):
+    # The values API drops trailing empty cells from every row
+    row = list(row)
+    while row and row[-1] == "":
+        row.pop()
+    return row
+
+
+def _range_title(range_):
+    """``'Pri Payment'!A1:Z`` -> ``Pri Payment``"""
+    title = unquote(range_).split("!")[0]
+    return title[1:-1].replace("''", "'") if title.startswith("'") and title.endswith("'") else title
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        sheets = self.server.sheets
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        parts = [p for p in url.path.split("/") if p]
+
+        if parts == ["healthz"]:
+            self._send(200, b"ok", "text/plain")
+            return
+
+        sheets.delay()
+
+        if len(parts) >= 4 and parts[:2] == ["spreadsheets", "d"] and parts[3] in ("export", "gviz"):
+            self._count("csv")
+            if sheets.should_fail():
+                self._fail()
+                return
+            tab = sheets.tab(parts[2], gid=query.get("gid", [None])[0])
+            if tab is None:
+                self._send(404, b"Sheet not found", "text/plain")
+            else:
+                self._send(200, sheets.csv(tab), "text/csv; charset=utf-8")
+            return
+
+        if len(parts) >= 3 and parts[:2] == ["v4", "spreadsheets"]:
+            spreadsheet_id = parts[2]
+            spreadsheet = sheets.spreadsheets.get(spreadsheet_id)
+            kind = "values" if len(parts) >= 5 and parts[3] == "values" else "metadata"
+            self._count(kind)
+            if sheets.should_fail():
+                self._fail()
+                return
+            if spreadsheet is None:
+                self._json(404, {"error": {"code": 404, "message": "Requested entity was not found.", "status": "NOT_FOUND"}})
+            elif kind == "metadata":
+                self._json(200, {
+                    "spreadsheetId": spreadsheet_id,
+                    "properties": {"title": spreadsheet["title"]},
+                    "sheets": [{"properties": {"sheetId": int(t["gid"]), "title": t["title"]}} for t in spreadsheet["sheets"]],
+                })
+            else:
+                range_ = parts[4]
+                tab = sheets.tab(spreadsheet_id, title=_range_title(range_))
+                if tab is None:
+                    self._json(400, {"error": {"code": 400, "message": f"Unable to parse range: {unquote(range_)}", "status": "INVALID_ARGUMENT"}})
+                else:
+                    self._json(200, {"range": unquote(range_), "majorDimension": "ROWS", "values": sheets.values(tab)})
+            return
+
+        self._send(404, b"Not found", "text/plain")
+
+    def _count(self, kind):
+        with self.server.sheets._lock:
+            self.server.sheets.requests[kind] += 1
+
+    def _fail(self):
+        status = self.server.sheets.failure_status
+        self._json(status, {"error": {"code": status, "message": "Injected failure", "status": "UNAVAILABLE"}})
+
+    def _json(self, status, payload):
+        self._send(status, json.dumps(payload).encode("utf-8"), "application/json; charset=utf-8")
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        if self.server.verbose:
+            super().log_message(*args)
+
+
+def start_server(sheets, host="127.0.0.1", port=0, verbose=False):
+    """Serve ``sheets`` on a daemon thread; ``server.url`` is the base URL to configure"""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.sheets = sheets
+    server.verbose = verbose
+    server.url = f"http://{host}:{server.server_port}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def use_synthetic(sheets, rows, payment_gid, proposal_gid):
+    """Replace the payment and proposal tabs of every spreadsheet with generated ledgers"""
+    from benchmarks.synthetic import payment_sheet, proposal_sheet
+
+    payments, proposals = payment_sheet(rows), proposal_sheet(rows, payment_rows=rows)
+    for spreadsheet_id, spreadsheet in sheets.spreadsheets.items():
+        titles = {t["gid"]: t["title"] for t in spreadsheet["sheets"]}
+        sheets.add_sheet(spreadsheet_id, payment_gid, titles.get(str(payment_gid), "Pri Payment"), payments)
+        sheets.add_sheet(spreadsheet_id, proposal_gid, titles.get(str(proposal_gid), "Proposals"), proposals)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST, help="fixture manifest (default: fixtures/sheets.json)")
+    parser.add_argument("--latency", type=float, default=0, help="added latency per request in ms")
+    parser.add_argument("--jitter", type=float, default=0, help="uniform +/- jitter in ms")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of requests answered with an error")
+    parser.add_argument("--failure-status", type=int, default=503, help="HTTP status of injected failures (e.g. 429)")
+    parser.add_argument("--repeat", type=int, default=1, help="repeat every data row N times to grow payloads")
+    parser.add_argument("--synthetic", metavar="ROWS", help="serve generated ledgers of this size (e.g. 100k)")
+    parser.add_argument("--payment-gid", default="840573777")
+    parser.add_argument("--proposal-gid", default="1356001164")
+    parser.add_argument("--seed", type=int, help="seed for latency jitter and failure injection")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+
+    sheets = MockSheets.from_manifest(
+        args.manifest, latency_ms=args.latency, jitter_ms=args.jitter, failure_rate=args.failure_rate,
+        failure_status=args.failure_status, repeat=args.repeat, seed=args.seed,
+    )
+    if args.synthetic:
+        from benchmarks.synthetic import parse_size
+        use_synthetic(sheets, parse_size(args.synthetic), args.payment_gid, args.proposal_gid)
+
+    server = start_server(sheets, args.host, args.port, verbose=args.verbose)
+    print(f"Mock Sheets serving on {server.url}")
+    for spreadsheet_id, spreadsheet in sheets.spreadsheets.items():
+        for tab in spreadsheet["sheets"]:
+            print(f"  {spreadsheet_id} gid={tab['gid']} '{tab['title']}': {len(tab['frame'])} rows")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
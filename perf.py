@@ -0,0 +1,145 @@
+"""Stage timing shared by the dashboard, the batch run and the benchmarks.
+
+A *run* is one pass of work (a dashboard script run, a batch run) and holds
+the stages timed during it, per thread. Stage totals are also kept for the
+whole process, for the Prometheus export. Nothing here needs Streamlit: the
+dashboard keeps finished runs in its session state, the batch run just logs
+them.
+"""
+import contextlib
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+PERF_LOG_FILE = os.environ.get("DASHBOARD_PERF_LOG", "")
+
+perf_logger = logging.getLogger("dashboard.perf")
+if PERF_LOG_FILE and not perf_logger.handlers:
+    perf_logger.addHandler(logging.FileHandler(PERF_LOG_FILE))
+    perf_logger.setLevel(logging.INFO)
+
+_perf_local = threading.local()
+_perf_totals_lock = threading.Lock()
+_perf_totals = {}  # (stage, kind) -> {"seconds", "count", "rows", "hit", "miss"}, shared by all sessions
+
+
+def perf_start_run():
+    """Begin recording a new run on this thread"""
+    _perf_local.run = {
+        "run_id": f"{time.time():.3f}",
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "stages": [],
+    }
+    _perf_local.depth = 0
+    return _perf_local.run
+
+
+def perf_current_run():
+    return getattr(_perf_local, "run", None)
+
+
+def perf_end_run():
+    """Close the current run and log its stages; returns it, or None outside a run"""
+    run = perf_current_run()
+    if run is None:
+        return None
+    run["total_seconds"] = sum(s["seconds"] for s in run["stages"] if s["depth"] == 0)
+    for record in run["stages"]:
+        perf_logger.info(json.dumps({"run_id": run["run_id"], "started": run["started"], **record}))
+    _perf_local.run = None
+    return run
+
+
+@contextlib.contextmanager
+def perf_stage(name, kind="step", rows=None):
+    """Time a block; the yielded record can be updated with rows or cache status"""
+    depth = getattr(_perf_local, "depth", 0)
+    record = {"stage": name, "kind": kind, "depth": depth, "rows": rows, "cache": None}
+    _perf_local.depth = depth + 1
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record["seconds"] = time.perf_counter() - start
+        _perf_local.depth = depth
+        run = perf_current_run()
+        if run is not None:
+            run["stages"].append(record)
+        with _perf_totals_lock:
+            totals = _perf_totals.setdefault(
+                (name, kind), {"seconds": 0.0, "count": 0, "rows": 0, "hit": 0, "miss": 0}
+            )
+            totals["seconds"] += record["seconds"]
+            totals["count"] += 1
+            totals["rows"] = record["rows"] or 0
+            if record["cache"]:
+                totals[record["cache"]] += 1
+
+
+def perf_cache_miss():
+    """Called from inside a cached function body - it only runs on a cache miss"""
+    _perf_local.cache_miss = True
+
+
+@contextlib.contextmanager
+def perf_cached_stage(name, kind="step", rows=None):
+    """``perf_stage`` around a cached call, recording whether it hit or missed"""
+    with perf_stage(name, kind, rows) as record:
+        _perf_local.cache_miss = False
+        yield record
+        record["cache"] = "miss" if _perf_local.cache_miss else "hit"
+
+
+def perf_loader(loader):
+    """Record wall time, row count and cache hit/miss of a st.cache_data loader"""
+    @functools.wraps(loader)
+    def wrapper(*args, **kwargs):
+        with perf_cached_stage(loader.__name__, "loader") as record:
+            out = loader(*args, **kwargs)
+            record["rows"] = 0 if out is None else len(out)
+        return out
+    wrapper.clear = loader.clear
+    return wrapper
+
+
+def perf_runs_jsonl(runs):
+    """Stage records of the given runs as JSON lines"""
+    return "\n".join(
+        json.dumps({"run_id": run["run_id"], "started": run["started"], **record})
+        for run in runs for record in run["stages"]
+    ) + "\n"
+
+
+def perf_prometheus_text():
+    """Process-wide stage totals in the Prometheus text exposition format"""
+    def labels(stage, kind):
+        return f'stage="{stage}",kind="{kind}"'
+
+    with _perf_totals_lock:
+        items = sorted(_perf_totals.items())
+        lines = [
+            "# HELP dashboard_stage_seconds Wall time spent per pipeline stage.",
+            "# TYPE dashboard_stage_seconds summary",
+        ]
+        for (stage, kind), t in items:
+            lines.append(f"dashboard_stage_seconds_sum{{{labels(stage, kind)}}} {t['seconds']:.6f}")
+            lines.append(f"dashboard_stage_seconds_count{{{labels(stage, kind)}}} {t['count']}")
+        lines += [
+            "# HELP dashboard_stage_rows Rows handled by the latest run of a stage.",
+            "# TYPE dashboard_stage_rows gauge",
+        ]
+        for (stage, kind), t in items:
+            lines.append(f"dashboard_stage_rows{{{labels(stage, kind)}}} {t['rows']}")
+        lines += [
+            "# HELP dashboard_cache_requests_total Cached loader calls by result.",
+            "# TYPE dashboard_cache_requests_total counter",
+        ]
+        for (stage, kind), t in items:
+            if t["hit"] or t["miss"]:
+                for result in ("hit", "miss"):
+                    lines.append(f'dashboard_cache_requests_total{{{labels(stage, kind)},result="{result}"}} {t[result]}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,1765 @@
+"""Load, process and aggregate the ledgers, without Streamlit.
+
+Everything between a data source and the processed frames the dashboard
+draws lives here: the Google Sheets endpoints and backends (with their rate
+limits and circuit breakers), the spreadsheet registry, cell cleaning, client
+canonicalisation, the incremental aggregate stores and rollups, dataset
+versions and the batch snapshots. app.py wraps these in its cached loaders and
+sidebar messages; batch.py imports this module directly. Importing it renders
+nothing and needs no Streamlit runtime, so process-wide objects are plain
+``functools.lru_cache`` singletons instead of ``st.cache_resource``.
+"""
+import collections
+import concurrent.futures
+import contextlib
+import functools
+import hashlib
+import importlib
+import io
+import json
+import logging
+import math
+import multiprocessing
+import operator
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+import row_cleaning
+from perf import perf_stage
+
+
+# ===================== LAZY IMPORTS =====================
+# pygsheets, plotly and requests take a few hundred ms to import between them.
+# They load on first use, so a cold container serves its first page without
+# paying for libraries that page may not touch (no service account file, a
+# tab without charts). DASHBOARD_EAGER_IMPORTS=1 imports them up front.
+# app.py loads plotly through the same lazy_import.
+EAGER_IMPORTS = os.environ.get("DASHBOARD_EAGER_IMPORTS", "") == "1"
+
+
+class LazyModule:
+    """Stand-in for a module that imports it on first attribute access"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+def lazy_import(name):
+    return importlib.import_module(name) if EAGER_IMPORTS else LazyModule(name)
+
+
+pygsheets = lazy_import("pygsheets")
+requests = lazy_import("requests")
+
+# Copy-on-write lets column selections, renames and boolean-mask filters share
+# buffers with the cached frames instead of materialising full copies.
+# It is always on from pandas 3.0 and opt-in on the 2.x line.
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+# Text columns are Arrow-backed strings with NaN for missing values: the
+# default from pandas 3.0, and what arrow_strings converts to on 2.1+.
+ARROW_STRING = "str" if int(pd.__version__.split(".")[0]) >= 3 else "string[pyarrow_numpy]"
+
+
+# ===================== CONFIG =====================
+SPREADSHEET_ID = "1dWv4kVugXNFQ2NaodZkawaXRglqRJOWR"
+SHEET_GID = "840573777"
+PROPOSAL_GID = "1356001164"
+SHEET_NAME = "Pri Payment"
+PROPOSAL_SHEET_NAME = "Proposals"
+SERVICE_FILE = "service_account.json"
+# Endpoint overrides - point these at mock_sheets_server.py for offline runs
+SHEETS_BASE_URL = os.environ.get("SHEETS_BASE_URL", "https://docs.google.com")
+SHEETS_API_BASE_URL = os.environ.get("SHEETS_API_BASE_URL", "https://sheets.googleapis.com")
+SHEETS_API_KEY = os.environ.get("SHEETS_API_KEY", "")
+
+
+# ===================== DATA LOADING FUNCTIONS =====================
+def clean_colname(x):
+    x = str(x).strip().lower()
+    x = re.sub(r"[^0-9a-zA-Z_ ]", "", x)
+    x = x.replace(" ", "_")
+    return x if x else "col"
+
+
+# ===================== RATE LIMITS & CIRCUIT BREAKERS =====================
+# Every session shares one token bucket per Google endpoint, so auto-refresh
+# traffic stays inside the quota however many dashboards are open. Each loader
+# sits behind a circuit breaker: after repeated failures it stops calling the
+# source for an exponentially growing pause and serves the last good snapshot.
+SHEETS_API_REQUESTS_PER_MINUTE = int(os.environ.get("SHEETS_API_REQUESTS_PER_MINUTE", "60"))
+SHEETS_CSV_REQUESTS_PER_MINUTE = int(os.environ.get("SHEETS_CSV_REQUESTS_PER_MINUTE", "30"))
+RATE_LIMIT_BURST = 5
+RATE_LIMIT_WAIT = 10  # seconds a request may queue for a token before giving up
+BREAKER_FAILURES = 3  # consecutive failures that open a circuit
+BREAKER_BACKOFF = 30  # seconds of the first pause, doubled on every re-open
+BREAKER_MAX_BACKOFF = 900
+
+
+class RateLimitExceeded(Exception):
+    """No request slot became free within ``RATE_LIMIT_WAIT``"""
+
+
+class CircuitOpenError(Exception):
+    """The source failed repeatedly and is not being called until its pause ends"""
+
+
+class TokenBucket:
+    """Allow ``rate`` acquisitions per second on average, in bursts of up to ``capacity``"""
+
+    def __init__(self, rate, capacity=1, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = capacity
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1, timeout=None):
+        """Block until ``tokens`` are available; False if that would take longer than ``timeout``"""
+        deadline = None if timeout is None else self.clock() + timeout
+        while True:
+            with self._lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return True
+                wait = (tokens - self.tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                return False
+            self.sleep(wait)
+
+
+class CircuitBreaker:
+    """Stop calling a failing source; retry after an exponentially growing pause
+
+    Closed until ``failure_threshold`` consecutive failures, then open for
+    ``backoff`` seconds (doubling up to ``max_backoff`` every time a retry
+    fails). After the pause a single trial call is let through (half-open).
+    The last successful result is kept as ``snapshot``.
+    """
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURES, backoff=BREAKER_BACKOFF,
+                 max_backoff=BREAKER_MAX_BACKOFF, clock=time.monotonic):
+        self.name = name
+        self.clock = clock
+        self.failure_threshold = failure_threshold
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.failures = 0
+        self.opened = 0  # consecutive opens, the backoff exponent
+        self.retry_at = 0.0
+        self.trial = False
+        self.last_error = None
+        self.snapshot = None
+        self.snapshot_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.failures < self.failure_threshold:
+            return "closed"
+        return "half-open" if self.clock() >= self.retry_at else "open"
+
+    def retry_in(self):
+        return max(self.retry_at - self.clock(), 0.0)
+
+    def allow(self):
+        """Whether a call may go out now; claims the trial call when half-open"""
+        with self._lock:
+            if self.failures < self.failure_threshold:
+                return True
+            if self.clock() < self.retry_at or self.trial:
+                return False
+            self.trial = True
+            return True
+
+    def record_success(self, snapshot=None):
+        with self._lock:
+            self.failures = 0
+            self.opened = 0
+            self.trial = False
+            if snapshot is not None:
+                self.snapshot = snapshot
+                self.snapshot_at = datetime.now()
+
+    def record_failure(self, error):
+        with self._lock:
+            self.failures += 1
+            self.trial = False
+            self.last_error = str(error)
+            if self.failures >= self.failure_threshold:
+                self.retry_at = self.clock() + min(self.backoff * 2 ** self.opened, self.max_backoff)
+                self.opened += 1
+
+    def call(self, fn, *args, **kwargs):
+        if not self.allow():
+            raise CircuitOpenError(
+                f"{self.name} paused for {self.retry_in():.0f}s after {self.failures} failures ({self.last_error})"
+            )
+        try:
+            out = fn(*args, **kwargs)
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        self.record_success(out)
+        return out
+
+
+@functools.lru_cache(maxsize=None)
+def sheets_rate_limits():
+    """Token buckets per Google endpoint, shared by every session"""
+    return {
+        "values_api": TokenBucket(SHEETS_API_REQUESTS_PER_MINUTE / 60, RATE_LIMIT_BURST),
+        "csv": TokenBucket(SHEETS_CSV_REQUESTS_PER_MINUTE / 60, RATE_LIMIT_BURST),
+    }
+
+
+def acquire_or_raise(bucket, what):
+    if bucket is not None and not bucket.acquire(timeout=RATE_LIMIT_WAIT):
+        raise RateLimitExceeded(f"{what}: no request slot within {RATE_LIMIT_WAIT}s")
+
+
+# ===================== SHEETS ENDPOINTS =====================
+class SheetsEndpoint:
+    """Where the spreadsheet's CSV export and values API are fetched from"""
+
+    def __init__(self, spreadsheet_id=SPREADSHEET_ID, base_url=SHEETS_BASE_URL,
+                 api_base_url=SHEETS_API_BASE_URL, api_key=SHEETS_API_KEY, timeout=30, rate_limits=None):
+        self.spreadsheet_id = spreadsheet_id
+        self.base_url = base_url.rstrip("/")
+        self.api_base_url = api_base_url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout
+        self.rate_limits = rate_limits or {}  # "csv" / "values_api" -> TokenBucket
+
+    @property
+    def is_google(self):
+        return "google" in self.base_url and "google" in self.api_base_url
+
+    @property
+    def values_api_enabled(self):
+        """Google needs an API key for the values API; a local stand-in does not"""
+        return bool(self.api_key) or "google" not in self.api_base_url
+
+    def csv_urls(self, gid):
+        """CSV export URL formats to try, most specific first"""
+        base = f"{self.base_url}/spreadsheets/d/{self.spreadsheet_id}"
+        return [
+            f"{base}/export?format=csv&gid={gid}",
+            f"{base}/gviz/tq?tqx=out:csv&gid={gid}",
+            f"{base}/export?format=csv",
+        ]
+
+    def fetch_csv(self, url):
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+        }
+        url += f"&t={int(time.time())}"
+        acquire_or_raise(self.rate_limits.get("csv"), "CSV export")
+        response = requests.get(url, headers=headers, timeout=self.timeout)
+        response.raise_for_status()
+        return response.text
+
+    def _api_get(self, path):
+        params = {"key": self.api_key} if self.api_key else None
+        acquire_or_raise(self.rate_limits.get("values_api"), "Sheets API")
+        response = requests.get(f"{self.api_base_url}/v4/spreadsheets/{self.spreadsheet_id}{path}",
+                                params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def sheet_title(self, gid):
+        """Resolve a tab GID to its title through the spreadsheet metadata"""
+        for sheet in self._api_get("?fields=sheets.properties").get("sheets", []):
+            props = sheet.get("properties", {})
+            if str(props.get("sheetId")) == str(gid):
+                return props.get("title")
+        return None
+
+    def fetch_values(self, title):
+        """Read a whole tab through the values API into a string DataFrame"""
+        quoted = requests.utils.quote(f"'{title}'", safe="")
+        values = self._api_get(f"/values/{quoted}").get("values", [])
+        if not values:
+            return pd.DataFrame()
+        header, rows = values[0], values[1:]
+        # The API drops trailing empty cells, so pad every row to the header width
+        rows = [row + [""] * (len(header) - len(row)) for row in rows]
+        return pd.DataFrame(rows, columns=header)
+
+
+SHEETS = SheetsEndpoint(rate_limits=sheets_rate_limits())
+
+
+def parse_csv_export(text):
+    """Parse an exported CSV, trying encodings in turn; returns (df, encoding) or (None, None)"""
+    # Try different encodings
+    encodings = ['utf-8', 'latin-1', 'windows-1252', 'iso-8859-1']
+
+    for encoding in encodings:
+        try:
+            with perf_stage(f"csv_parse.{encoding}", "parse"):
+                df = pd.read_csv(
+                    io.StringIO(text), 
+                    encoding=encoding,
+                    skip_blank_lines=True,
+                    na_filter=False,
+                    dtype=str,
+                    thousands=',',
+                    skipinitialspace=True
+                )
+
+            df = df.dropna(how='all')
+            df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
+
+            if not df.empty and len(df.columns) > 1:
+                return df, encoding
+
+        except UnicodeDecodeError:
+            continue
+        except Exception as e:
+            continue
+
+    return None, None
+
+
+# ===================== DATA BACKENDS =====================
+# A backend fetches one raw sheet (string cells, the sheet's own headers) and
+# raises on failure. The dashboard's cached loaders wrap backends with the
+# sidebar messages and fallbacks; backends report progress through
+# ``notify(level, msg)`` so they also run outside Streamlit.
+SHEET_TABS = {
+    "payments": (SHEET_GID, SHEET_NAME),
+    "proposals": (PROPOSAL_GID, PROPOSAL_SHEET_NAME),
+}
+LOCAL_DATA_PATH = os.environ.get("LOCAL_DATA_PATH", "data")
+LOCAL_CSV_CHUNKSIZE = 200_000
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+FILTER_OPS = {
+    "==": operator.eq, "!=": operator.ne,
+    "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+}
+
+backend_logger = logging.getLogger("dashboard.backends")
+
+
+class DataBackendError(Exception):
+    """A backend could not produce the requested sheet"""
+
+
+def log_notify(level, message):
+    backend_logger.log(logging.WARNING if level in ("warning", "error") else logging.INFO, message)
+
+
+def parse_filter_spec(text):
+    """``Work Status == Completed; Unit Name in Unit A0, Unit B1`` -> ((column, op, value), ...)"""
+    filters = []
+    for clause in text.split(";"):
+        clause = clause.strip()
+        if not clause:
+            continue
+        match = re.match(r"^(.+?)\s+(==|!=|<=|>=|<|>|not in|in)\s+(.+)$", clause)
+        if not match:
+            raise ValueError(f"Cannot parse filter '{clause}'")
+        column, op, value = (part.strip() for part in match.groups())
+        if op in ("in", "not in"):
+            value = tuple(v.strip() for v in value.split(","))
+        filters.append((column, op, value))
+    return tuple(filters)
+
+
+def filter_frame(df, filters):
+    """Apply ``(column, op, value)`` filters to a loaded frame; values compare as stored"""
+    mask = pd.Series(True, index=df.index)
+    for column, op, value in filters:
+        if op == "in":
+            mask &= df[column].isin(value)
+        elif op == "not in":
+            mask &= ~df[column].isin(value)
+        else:
+            mask &= FILTER_OPS[op](df[column], value)
+    return apply_mask(df, mask)
+
+
+def _quote_ident(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def sql_where(filters):
+    """Translate filters into a parameterised WHERE clause"""
+    clauses, params = [], []
+    for column, op, value in filters:
+        if op in ("in", "not in"):
+            clauses.append(f"{_quote_ident(column)} {op.upper()} ({', '.join('?' * len(value))})")
+            params.extend(value)
+        else:
+            clauses.append(f"{_quote_ident(column)} {'=' if op == '==' else op} ?")
+            params.append(value)
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+class DataBackend:
+    """Source of the raw payment and proposal sheets
+
+    ``load(kind, filters)`` returns the ``"payments"`` or ``"proposals"`` sheet.
+    Filters are pushed down to backends that can evaluate them at the source
+    and applied after loading for the others.
+    """
+    name = "Backend"
+    pushes_down_filters = False
+
+    def __init__(self, notify=log_notify):
+        self.notify = notify
+
+    def load(self, kind, filters=()):
+        if kind not in SHEET_TABS:
+            raise ValueError(f"Unknown sheet kind: {kind}")
+        if self.pushes_down_filters:
+            df = self._load(kind, filters)
+        else:
+            df = self._load(kind, ())
+            if filters and not df.empty:
+                df = filter_frame(df, filters)
+        # Hashed once per fetch; the version travels with the cached frame
+        df.attrs["version"] = dataset_version(df)
+        return df
+
+    def _load(self, kind, filters):
+        raise NotImplementedError
+
+
+class ServiceAccountBackend(DataBackend):
+    """Google Sheets through pygsheets and the service account file"""
+    name = "Service Account"
+
+    def __init__(self, service_file=SERVICE_FILE, spreadsheet_id=SPREADSHEET_ID, tabs=None, notify=log_notify):
+        super().__init__(notify)
+        self.service_file = service_file
+        self.spreadsheet_id = spreadsheet_id
+        self.tabs = tabs
+
+    def _load(self, kind, filters):
+        # Checked first, so deployments without credentials never import pygsheets
+        if not os.path.exists(self.service_file):
+            raise DataBackendError(f"Service account file {self.service_file} not found")
+        # pygsheets goes through the same API quota as the values API
+        limit = sheets_rate_limits()["values_api"]
+        with perf_stage("pygsheets.authorize", "fetch"):
+            gc = pygsheets.authorize(service_file=self.service_file)
+
+        # Open by ID (most reliable method)
+        acquire_or_raise(limit, "Sheets API")
+        sh = gc.open_by_key(self.spreadsheet_id)
+        self.notify("success", f"📊 Opened: {sh.title}")
+
+        wks = self._worksheet(sh, kind)
+        acquire_or_raise(limit, "Sheets API")
+        with perf_stage("get_all_records", "fetch") as record:
+            df = pd.DataFrame(wks.get_all_records())
+            record["rows"] = len(df)
+        return df
+
+    def _worksheet(self, sh, kind):
+        gid, title = (self.tabs or SHEET_TABS)[kind]
+        if kind == "payments":
+            try:
+                wks = sh.worksheet(property='id', value=gid)
+                self.notify("info", f"📑 Using sheet: {wks.title} (GID: {gid})")
+            except Exception:
+                # Fallback to first sheet
+                wks = sh[0]
+                self.notify("warning", f"⚠️ Using first sheet: {wks.title}")
+            return wks
+
+        # Debug: List all worksheets
+        self.notify("info", f"📑 Available worksheets in '{sh.title}':")
+        worksheets = sh.worksheets()
+        for i, ws in enumerate(worksheets):
+            self.notify("info", f"  {i+1}. {ws.title} (ID: {ws.id})")
+
+        try:
+            self.notify("info", f"🔍 Looking for sheet with GID: {gid}")
+            wks = sh.worksheet(property='id', value=gid)
+            self.notify("success", f"✅ Found proposal sheet: {wks.title} (GID: {gid})")
+            return wks
+        except Exception as e:
+            self.notify("warning", f"⚠️ Could not find sheet by GID {gid}: {str(e)}")
+
+        # Fallback to sheet name
+        try:
+            self.notify("info", f"🔍 Looking for sheet by name: {title}")
+            wks = sh.worksheet_by_title(title)
+            self.notify("success", f"✅ Found proposal sheet by name: {wks.title}")
+            return wks
+        except Exception as e:
+            self.notify("error", f"❌ Could not find proposal sheet by name '{title}': {str(e)}")
+
+        # Try to find any sheet with "proposal" in the name
+        self.notify("info", "🔍 Searching for sheets with 'proposal' in name...")
+        matching_sheets = [ws for ws in worksheets if 'proposal' in ws.title.lower()]
+        if not matching_sheets:
+            raise DataBackendError("No proposal sheet found")
+        self.notify("success", f"✅ Using sheet: {matching_sheets[0].title}")
+        return matching_sheets[0]
+
+
+class CsvExportBackend(DataBackend):
+    """The spreadsheet's CSV export, trying each export URL format in turn"""
+    name = "CSV Export"
+
+    def __init__(self, endpoint=None, tabs=None, notify=log_notify):
+        super().__init__(notify)
+        self.endpoint = endpoint
+        self.tabs = tabs
+
+    def _load(self, kind, filters):
+        endpoint = self.endpoint or SHEETS
+        gid, _ = (self.tabs or SHEET_TABS)[kind]
+        for i, csv_url in enumerate(endpoint.csv_urls(gid)):
+            try:
+                self.notify("info", f"  Trying URL {i+1}...")
+
+                with perf_stage("csv_fetch", "fetch"):
+                    text = endpoint.fetch_csv(csv_url)
+
+                df, encoding = parse_csv_export(text)
+                if df is not None:
+                    self.notify("success", f"✅ CSV loaded: {len(df)} records with encoding {encoding}")
+                    return df
+
+            except Exception as e:
+                self.notify("warning", f"  URL {i+1} failed: {str(e)}")
+                continue
+
+        raise DataBackendError("No CSV export URL returned usable data")
+
+
+class ValuesApiBackend(DataBackend):
+    """The Sheets v4 values API"""
+    name = "Sheets API"
+
+    def __init__(self, endpoint=None, tabs=None, notify=log_notify):
+        super().__init__(notify)
+        self.endpoint = endpoint
+        self.tabs = tabs
+
+    def _load(self, kind, filters):
+        endpoint = self.endpoint or SHEETS
+        gid, fallback_title = (self.tabs or SHEET_TABS)[kind]
+        with perf_stage("values_api.metadata", "fetch"):
+            title = endpoint.sheet_title(gid) or fallback_title
+        with perf_stage("values_api.values", "fetch") as record:
+            df = endpoint.fetch_values(title)
+            record["rows"] = len(df)
+        if not df.empty:
+            self.notify("success", f"✅ Loaded {len(df)} records from '{title}' via Sheets API")
+        return df
+
+
+class LocalCsvBackend(DataBackend):
+    """``payments.csv`` / ``proposals.csv`` in a local directory"""
+    name = "Local CSV"
+    pushes_down_filters = True
+
+    def __init__(self, path=LOCAL_DATA_PATH, chunksize=LOCAL_CSV_CHUNKSIZE, notify=log_notify):
+        super().__init__(notify)
+        self.path = path
+        self.chunksize = chunksize
+
+    def _load(self, kind, filters):
+        path = os.path.join(self.path, f"{kind}.csv")
+        if not os.path.exists(path):
+            raise DataBackendError(f"{path} not found")
+        options = dict(dtype=str, na_filter=False, skip_blank_lines=True, skipinitialspace=True)
+        if not filters:
+            df = pd.read_csv(path, **options)
+        else:
+            # Filter every chunk as it is parsed, so peak memory is one chunk
+            # plus the matching rows rather than the whole file
+            with pd.read_csv(path, chunksize=self.chunksize, **options) as reader:
+                chunks = [filter_frame(chunk, filters) for chunk in reader]
+            df = pd.concat(chunks, ignore_index=True) if chunks else pd.read_csv(path, nrows=0, **options)
+        return df.loc[:, ~df.columns.str.contains('^Unnamed')]
+
+
+class ParquetBackend(DataBackend):
+    """``payments.parquet`` / ``proposals.parquet`` in a local directory, memory-mapped"""
+    name = "Parquet"
+    pushes_down_filters = True
+
+    def __init__(self, path=LOCAL_DATA_PATH, notify=log_notify):
+        super().__init__(notify)
+        self.path = path
+
+    def _load(self, kind, filters):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise DataBackendError("Reading Parquet needs pyarrow (pip install pyarrow)") from e
+        path = os.path.join(self.path, f"{kind}.parquet")
+        if not os.path.exists(path):
+            raise DataBackendError(f"{path} not found")
+        # pyarrow skips row groups whose statistics rule out the filters and
+        # decodes the rest straight from the mapped file
+        arrow_filters = [(c, op, list(v) if op in ("in", "not in") else v) for c, op, v in filters]
+        table = pq.read_table(path, memory_map=True, filters=arrow_filters or None)
+        return table.to_pandas()
+
+
+class SqliteBackend(DataBackend):
+    """``payments`` / ``proposals`` tables of a SQLite database; filters become a WHERE clause"""
+    name = "SQLite"
+    pushes_down_filters = True
+
+    def __init__(self, path, tables=None, notify=log_notify):
+        super().__init__(notify)
+        self.path = path
+        self.tables = tables or {kind: kind for kind in SHEET_TABS}
+
+    def _load(self, kind, filters):
+        if not os.path.exists(self.path):
+            raise DataBackendError(f"{self.path} not found")
+        where, params = sql_where(filters)
+        query = f"SELECT * FROM {_quote_ident(self.tables[kind])}{where}"
+        with contextlib.closing(sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)) as conn:
+            df = pd.read_sql_query(query, conn, params=params)
+        # Hand the pipeline strings, like a sheet export
+        return df.astype(object).where(df.notna(), "").astype(str)
+
+
+def local_backend(path, notify=log_notify):
+    """Backend for a SQLite file, or a directory of Parquet or CSV exports"""
+    if os.path.isfile(path):
+        if not path.lower().endswith(SQLITE_SUFFIXES):
+            raise DataBackendError(f"{path} is not a SQLite database ({', '.join(SQLITE_SUFFIXES)})")
+        return SqliteBackend(path, notify=notify)
+    if not os.path.isdir(path):
+        raise DataBackendError(f"{path} does not exist")
+    if any(os.path.exists(os.path.join(path, f"{kind}.parquet")) for kind in SHEET_TABS):
+        return ParquetBackend(path, notify=notify)
+    return LocalCsvBackend(path, notify=notify)
+
+
+def local_data_version(path):
+    """Latest modification time under ``path``, so edited exports miss the cache"""
+    if os.path.isdir(path):
+        return max((os.path.getmtime(os.path.join(path, f)) for f in os.listdir(path)), default=0.0)
+    return os.path.getmtime(path) if os.path.exists(path) else 0.0
+
+
+# ===================== SPREADSHEET REGISTRY =====================
+# One server can load many spreadsheets (one per business unit) described in
+# ``sources.json``. Every source is fetched on a bounded worker pool, each
+# behind its own token bucket so a unit's refreshes stay inside the Google
+# quota, and the sheets are merged into one frame with a "Data Source" column.
+SOURCES_FILE = os.environ.get("DASHBOARD_SOURCES", "sources.json")
+SOURCE_WORKERS = 4
+SOURCE_REQUESTS_PER_MINUTE = 60  # Google's default per-user read quota
+SOURCE_COLUMN = "Data Source"
+
+
+class SheetSource:
+    """One spreadsheet (or local export) of the registry
+
+    ``method`` is ``csv``, ``values_api``, ``service_account`` or ``local``;
+    ``tabs`` maps ``payments`` / ``proposals`` to ``[gid, title]``.
+    """
+
+    def __init__(self, name, spreadsheet_id=None, method="csv", tabs=None, path=None,
+                 requests_per_minute=SOURCE_REQUESTS_PER_MINUTE, burst=1):
+        self.name = name
+        self.spreadsheet_id = spreadsheet_id
+        self.method = method
+        self.tabs = {kind: tuple(tab) for kind, tab in (tabs or SHEET_TABS).items()}
+        self.path = path
+        self.bucket = TokenBucket(requests_per_minute / 60, burst)
+        self.breakers = {kind: CircuitBreaker(f"{name} {kind}") for kind in self.tabs}
+
+    def backend(self, notify=log_notify):
+        if self.method == "local":
+            return local_backend(self.path, notify=notify)
+        if self.method == "service_account":
+            return ServiceAccountBackend(spreadsheet_id=self.spreadsheet_id, tabs=self.tabs, notify=notify)
+        # The registry shares the configured (or stand-in) Sheets host
+        endpoint = SheetsEndpoint(self.spreadsheet_id, base_url=SHEETS.base_url,
+                                  api_base_url=SHEETS.api_base_url, api_key=SHEETS.api_key,
+                                  rate_limits=SHEETS.rate_limits)
+        if self.method == "values_api":
+            return ValuesApiBackend(endpoint, tabs=self.tabs, notify=notify)
+        if self.method == "csv":
+            return CsvExportBackend(endpoint, tabs=self.tabs, notify=notify)
+        raise DataBackendError(f"Unknown method '{self.method}' for source {self.name}")
+
+    def load(self, kind, notify=log_notify):
+        return self.breakers[kind].call(self._fetch, kind, notify)
+
+    def _fetch(self, kind, notify):
+        self.bucket.acquire()
+        return self.backend(notify).load(kind)
+
+
+class SourceRegistry:
+    """The spreadsheets listed in ``sources.json``, loaded concurrently and merged"""
+
+    def __init__(self, sources, max_workers=SOURCE_WORKERS):
+        if not sources:
+            raise DataBackendError("The source registry lists no spreadsheets")
+        names = [source.name for source in sources]
+        if len(set(names)) != len(names):
+            raise DataBackendError("Source names in the registry must be unique")
+        self.sources = sources
+        self.max_workers = max(1, max_workers)
+
+    @classmethod
+    def from_file(cls, path=SOURCES_FILE):
+        with open(path) as f:
+            config = json.load(f)
+        base = os.path.dirname(os.path.abspath(path))
+        sources = []
+        for spec in config.get("sources", []):
+            spec = dict(spec)
+            if spec.get("path"):
+                spec["path"] = os.path.join(base, spec["path"])
+            sources.append(SheetSource(**spec))
+        return cls(sources, config.get("max_workers", SOURCE_WORKERS))
+
+    @property
+    def names(self):
+        return [source.name for source in self.sources]
+
+    def load(self, kind, notify=log_notify):
+        """Fetch ``kind`` from every source; returns (merged frame, {name: error})"""
+        def fetch(source):
+            with perf_stage(f"registry.{source.name}", "fetch") as record:
+                df = source.load(kind, notify)
+                record["rows"] = len(df)
+            return df
+
+        frames, errors = {}, {}
+        with concurrent.futures.ThreadPoolExecutor(min(self.max_workers, len(self.sources))) as pool:
+            futures = {pool.submit(fetch, source): source.name for source in self.sources}
+            for future in concurrent.futures.as_completed(futures):
+                name = futures[future]
+                try:
+                    frames[name] = future.result()
+                except Exception as e:
+                    breaker = self.sources[self.names.index(name)].breakers[kind]
+                    if breaker.snapshot is not None:
+                        frames[name] = breaker.snapshot
+                        errors[name] = f"{e} - serving the snapshot from {breaker.snapshot_at:%H:%M:%S}"
+                    else:
+                        errors[name] = str(e)
+        frames = {name: frames[name] for name in self.names if name in frames and not frames[name].empty}
+        return merge_sources(frames), errors
+
+
+def merge_sources(frames):
+    """Stack per-source sheets under a "Data Source" column; the version combines theirs"""
+    if not frames:
+        return pd.DataFrame()
+    merged = pd.concat(
+        [df.assign(**{SOURCE_COLUMN: name}) for name, df in frames.items()],
+        ignore_index=True
+    )
+    if merged.isna().any(axis=None):
+        # Sources whose headers differ leave holes; the pipeline expects sheet strings
+        merged = merged.fillna("")
+    merged.attrs["version"] = hashlib.blake2b(
+        "|".join(f"{name}={df.attrs.get('version')}" for name, df in frames.items()).encode(),
+        digest_size=16
+    ).hexdigest()
+    return merged
+
+
+# ===================== PARALLEL PROCESSING =====================
+# safe_num and parse_date run once per cell and dominate processing time on
+# large sheets. With DASHBOARD_PROCESS_WORKERS set, columns of at least
+# PARALLEL_MIN_ROWS rows are split into row chunks and converted on a process
+# pool; every worker writes its chunk into one shared-memory array owned by
+# this process, so results come back without pickling and in row order.
+PROCESS_WORKERS = int(os.environ.get("DASHBOARD_PROCESS_WORKERS", "0"))  # 0 keeps processing in-process
+PARALLEL_MIN_ROWS = 20_000
+PARALLEL_CHUNKS_PER_WORKER = 4
+PARALLEL_MIN_CHUNK_ROWS = 5_000
+
+
+@functools.lru_cache(maxsize=None)
+def processing_pool(workers):
+    """Process pool shared by every session; spawned, so workers never inherit server threads"""
+    return concurrent.futures.ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def row_chunks(n, workers):
+    """``(start, stop)`` bounds splitting ``n`` rows into a few chunks per worker"""
+    size = max(math.ceil(n / (workers * PARALLEL_CHUNKS_PER_WORKER)), PARALLEL_MIN_CHUNK_ROWS)
+    return [(start, min(start + size, n)) for start in range(0, n, size)]
+
+
+def convert_column(series, converter, workers=None):
+    """``series.apply(safe_num)`` / ``series.apply(parse_date)``, on the process pool when it pays off"""
+    workers = PROCESS_WORKERS if workers is None else workers
+    if workers < 2 or len(series) < PARALLEL_MIN_ROWS:
+        return series.apply(row_cleaning.CONVERTERS[converter][0])
+
+    dtype = row_cleaning.CONVERTERS[converter][1]
+    values = series.to_numpy(dtype=object)
+    shm = shared_memory.SharedMemory(create=True, size=len(values) * dtype.itemsize)
+    try:
+        pool = processing_pool(workers)
+        futures = [
+            pool.submit(row_cleaning.convert_into, converter, values[start:stop], shm.name, start)
+            for start, stop in row_chunks(len(values), workers)
+        ]
+        for future in futures:
+            future.result()
+        # One copy out of the shared block, which is released right after
+        out = np.ndarray(len(values), dtype=dtype, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+    return pd.Series(out, index=series.index, name=series.name)
+
+
+# ===================== IMPROVED DATA PROCESSING =====================
+# Amount columns whose unparseable cells are recorded in ``unparsed_amounts``
+# (bit i for column i) before safe_num turns them into 0.0
+PAYMENT_AMOUNT_COLUMNS = ['order_amount', 'final_amount', 'payment_received']
+PROPOSAL_AMOUNT_COLUMNS = ['amount']
+# Columns processing derives for the dashboard's own use (parse flags, stage codes,
+# canonical clients); never part of a user download
+INTERNAL_COLUMNS = ['unparsed_amounts', 'status_code', 'stage', 'client', 'client_id']
+
+
+def unparsed_flags(df, columns):
+    """Bit i set on rows where ``columns[i]`` holds text safe_num cannot parse"""
+    flags = np.zeros(len(df), dtype=np.uint8)
+    for bit, col in enumerate(columns):
+        if col in df.columns:
+            flags |= row_cleaning.unparseable(df[col]).astype(np.uint8) << bit
+    return flags
+
+
+def process_raw_data(df, notify=log_notify, debug=None):
+    """Process and clean the raw data with enhanced CSV handling
+
+    ``debug(title, lines, expanded=False)``, when given, is shown the columns
+    and samples seen along the way (the dashboard's sidebar expanders).
+    """
+    # Clean column names (a lazy copy - the cached raw frame is never mutated)
+    df_clean = df.set_axis([clean_colname(c) for c in df.columns], axis=1)
+
+    # Debug info (dashboard only)
+    if debug is not None:
+        lines = [
+            ("Original columns:", list(df.columns)),
+            ("Cleaned columns:", list(df_clean.columns)),
+            ("Data shape:", df_clean.shape),
+        ]
+        if not df_clean.empty:
+            lines.append(("First 2 rows sample:", df_clean.head(2).to_dict('records')))
+        debug("🔍 Payment Debug Info", lines)
+
+    # Enhanced column mapping
+    column_mapping = {
+        'unit_name': ['unit_name', 'unit', 'unitname', 'name', 'client', 'customer'],
+        'work_order_no': ['work_order_no', 'work_order', 'wo_no', 'order_no', 'workorder', 'wo_number'],
+        'order_amount': ['order_amount', 'order', 'amount', 'order_amt', 'initial_amount', 'quoted_amount'],
+        'final_amount': ['final_amount', 'final', 'final_amt', 'total_amount', 'grand_total', 'invoice_amount'],
+        'payment_received': ['payment_received', 'received', 'paid', 'payment_received', 'amount_received', 'paid_amount'],
+        'pending_amount': ['pending_amount', 'pending', 'balance', 'due_amount', 'outstanding', 'remaining'],
+        'payment_mode': ['payment_mode', 'mode', 'payment_type', 'type', 'payment_method'],
+        'work_status': ['work_status', 'status', 'job_status', 'project_status', 'completion_status'],
+        'date': ['date', 'p_date', 'payment_date', 'transaction_date', 'invoice_date', 'entry_date']
+    }
+
+    # Apply column mapping with feedback
+    mapped_count = 0
+    for standard_name, possible_names in column_mapping.items():
+        for possible_name in possible_names:
+            if possible_name in df_clean.columns and standard_name not in df_clean.columns:
+                df_clean.rename(columns={possible_name: standard_name}, inplace=True)
+                mapped_count += 1
+                notify("info", f"📝 Mapped '{possible_name}' → '{standard_name}'")
+                break
+
+    # Ensure required columns exist
+    required_cols = ['order_amount', 'final_amount', 'payment_received']
+    for col in required_cols:
+        if col not in df_clean.columns:
+            df_clean[col] = 0.0
+            notify("warning", f"⚠️ Column '{col}' not found, using defaults")
+
+    # Handle pending_amount separately
+    if 'pending_amount' not in df_clean.columns:
+        notify("info", "🔄 'pending_amount' column not found, will calculate it")
+        df_clean['pending_amount'] = 0.0
+
+    # Enhanced numeric conversion with debugging
+    numeric_cols = ['order_amount', 'final_amount', 'payment_received', 'pending_amount']
+    conversion_debug = {}
+    df_clean['unparsed_amounts'] = unparsed_flags(df_clean, PAYMENT_AMOUNT_COLUMNS)
+
+    for col in numeric_cols:
+        if col in df_clean.columns:
+            # Store sample values for debugging
+            original_samples = df_clean[col].head(3).tolist()
+
+            # Apply conversion
+            with perf_stage(f"safe_num.{col}", "process", rows=len(df_clean)):
+                df_clean[col] = convert_column(df_clean[col], "safe_num")
+
+            # Store converted samples
+            converted_samples = df_clean[col].head(3).tolist()
+            conversion_debug[col] = {
+                'original': original_samples,
+                'converted': converted_samples,
+                'total': df_clean[col].sum()
+            }
+
+    # Show conversion debug
+    if debug is not None:
+        debug("💰 Number Conversion Debug", [
+            (line,)
+            for col, debug_info in conversion_debug.items()
+            for line in (f"**{col}:**",
+                         f"  Original: {debug_info['original']}",
+                         f"  Converted: {debug_info['converted']}",
+                         f"  Total: ₹ {debug_info['total']:,.2f}")
+        ])
+
+    # Calculate pending amount (CRITICAL FIX)
+    if all(col in df_clean.columns for col in ['final_amount', 'payment_received']):
+        calculated_pending = df_clean['final_amount'] - df_clean['payment_received']
+
+        # Always use calculated pending for accuracy
+        df_clean['pending_amount'] = calculated_pending.clip(lower=0)
+
+        # Show validation
+        existing_total = conversion_debug.get('pending_amount', {}).get('total', 0)
+        calculated_total = calculated_pending.sum()
+
+        notify("info", f"💰 Pending Amount Validation:")
+        notify("info", f"   CSV Provided: ₹ {existing_total:,.2f}")
+        notify("info", f"   Calculated: ₹ {calculated_total:,.2f}")
+
+        if abs(existing_total - calculated_total) > 100:
+            notify("success", "✅ Using calculated pending amounts for accuracy")
+
+    # Process work status
+    if 'work_status' not in df_clean.columns:
+        df_clean['work_status'] = 'Unknown'
+    else:
+        df_clean['work_status'] = df_clean['work_status'].fillna('Unknown').astype(str).str.strip().str.title()
+
+    # Process payment mode
+    if 'payment_mode' not in df_clean.columns:
+        df_clean['payment_mode'] = 'Unknown'
+    else:
+        df_clean['payment_mode'] = df_clean['payment_mode'].fillna('Unknown').astype(str).str.strip().str.title()
+
+    # Process dates
+    date_cols = ['date', 'p_date', 'payment_date']
+    for date_col in date_cols:
+        if date_col in df_clean.columns:
+            with perf_stage("parse_date.payment_date", "process", rows=len(df_clean)):
+                df_clean['payment_date'] = convert_column(df_clean[date_col], "parse_date")
+            break
+    else:
+        df_clean['payment_date'] = pd.NaT
+
+    df_clean['year'] = df_clean['payment_date'].dt.year.fillna(datetime.now().year).astype(int)
+
+    # Final summary
+    notify("success", f"✅ Processed {len(df_clean)} records")
+    notify("info", f"📊 Final Totals:")
+    notify("info", f"   Order: ₹ {df_clean['order_amount'].sum():,.2f}")
+    notify("info", f"   Final: ₹ {df_clean['final_amount'].sum():,.2f}")
+    notify("info", f"   Received: ₹ {df_clean['payment_received'].sum():,.2f}")
+    notify("info", f"   Pending: ₹ {df_clean['pending_amount'].sum():,.2f}")
+
+    return df_clean
+
+
+def process_proposal_data(proposal_df, notify=log_notify, debug=None):
+    """Process and clean proposal data based on your sheet structure; ``debug`` as in process_raw_data"""
+    if proposal_df.empty:
+        return proposal_df
+
+    # Clean column names (a lazy copy - the cached raw frame is never mutated)
+    df_clean = proposal_df.set_axis([clean_colname(c) for c in proposal_df.columns], axis=1)
+
+    # Show debug info expanded for better visibility
+    if debug is not None:
+        lines = [
+            ("**Raw columns found:**", list(proposal_df.columns)),
+            ("**Cleaned columns:**", list(df_clean.columns)),
+            ("**Data shape:**", df_clean.shape),
+        ]
+        if not df_clean.empty:
+            lines += [("**First 3 rows:**", df_clean.head(3)), ("**Column types:**", df_clean.dtypes)]
+        debug("🔍 Proposal Debug Info", lines, expanded=True)
+
+    # Enhanced column mapping for proposals
+    column_mapping = {
+        's_no': ['s_no', 'sno', 'sl_no', 'serial_no', 'serial_number'],
+        'year': ['year', 'yr', 'year_'],
+        'date': ['date', 'proposal_date', 'submission_date'],
+        'wo_date': ['wo_date', 'work_order_date', 'order_date'],
+        'no': ['no', 'wo_no', 'work_order_no', 'order_no'],
+        'name': ['name', 'client_name', 'company', 'customer', 'client'],
+        'industry_type': ['industry_type', 'industry', 'business_type', 'sector'],
+        'district': ['district', 'location', 'city_district', 'area'],
+        'scope_of_work': ['scope_of_work', 'scope', 'work_scope', 'description'],
+        'type': ['type', 'proposal_type', 'category'],
+        'source': ['source', 'lead_source', 'referral_source'],
+        'status': ['status', 'proposal_status', 'current_status'],
+        'refrence_no': ['refrence_no', 'reference_no', 'ref_no', 'proposal_no'],
+        'contact_person': ['contact_person', 'contact', 'person', 'representative'],
+        'amount': ['amount', 'proposal_amount', 'value', 'quoted_amount'],
+        'present_status': ['present_status', 'current_status', 'latest_status', 'status_update']
+    }
+
+    # Apply column mapping with feedback
+    mapped_count = 0
+    for standard_name, possible_names in column_mapping.items():
+        for possible_name in possible_names:
+            if possible_name in df_clean.columns and standard_name not in df_clean.columns:
+                df_clean.rename(columns={possible_name: standard_name}, inplace=True)
+                mapped_count += 1
+                notify("info", f"📝 Mapped '{possible_name}' → '{standard_name}'")
+                break
+
+    # Process amount column
+    if 'amount' in df_clean.columns:
+        notify("info", f"💰 Processing amount column...")
+        df_clean['unparsed_amounts'] = unparsed_flags(df_clean, PROPOSAL_AMOUNT_COLUMNS)
+        with perf_stage("safe_num.amount", "process", rows=len(df_clean)):
+            df_clean['amount'] = convert_column(df_clean['amount'], "safe_num")
+        notify("success", f"✅ Total proposal value: ₹ {df_clean['amount'].sum():,.2f}")
+    else:
+        notify("warning", "⚠️ Amount column not found in proposal data")
+        df_clean['amount'] = 0.0
+
+    # Process dates
+    date_columns = ['date', 'wo_date']
+    for date_col in date_columns:
+        if date_col in df_clean.columns:
+            notify("info", f"📅 Processing {date_col} column...")
+            with perf_stage(f"parse_date.{date_col}", "process", rows=len(df_clean)):
+                df_clean[date_col] = convert_column(df_clean[date_col], "parse_date")
+
+    # Process year (convert to integer if possible)
+    if 'year' in df_clean.columns:
+        try:
+            df_clean['year'] = pd.to_numeric(df_clean['year'], errors='coerce').fillna(0).astype(int)
+        except:
+            pass
+
+    # Clean status columns
+    status_columns = ['status', 'present_status']
+    for status_col in status_columns:
+        if status_col in df_clean.columns:
+            df_clean[status_col] = df_clean[status_col].fillna('Unknown').astype(str).str.strip().str.title()
+
+    # Normalise the status once so analytics compare codes instead of re-scanning the text
+    if 'status' in df_clean.columns:
+        df_clean['status_code'], df_clean['stage'] = status_stages(df_clean['status'])
+
+    # Clean other text columns
+    text_columns = ['name', 'industry_type', 'district', 'scope_of_work', 'type', 'source', 'refrence_no', 'contact_person']
+    for col in text_columns:
+        if col in df_clean.columns:
+            df_clean[col] = df_clean[col].fillna('').astype(str).str.strip()
+
+    # Final summary
+    notify("success", f"✅ Processed {len(df_clean)} proposal records")
+
+    return df_clean
+
+
+# ===================== PROPOSAL ANALYTICS FUNCTIONS =====================
+FUNNEL_STAGES = ["submitted", "follow_up", "won", "dropped"]
+STATUS_STAGES = {"OK": "won", "DROP": "dropped", "FOLLOWUP": "follow_up"}
+WIN_RATE_DIMENSIONS = {"Industry": "industry_type", "District": "district", "Source": "source", "Year": "year"}
+
+
+def status_stages(status):
+    """Status code (``Follow-Up`` -> ``FOLLOWUP``) and funnel stage, worked out once per distinct status"""
+    status = status.astype("category")
+    codes = status.cat.categories.astype(str).str.upper().str.replace(r"[^A-Z]", "", regex=True)
+    stages = pd.Categorical(codes.map(lambda code: STATUS_STAGES.get(code, "submitted")), categories=FUNNEL_STAGES)
+    positions = status.cat.codes.to_numpy()
+    # Position -1 is a missing status: no code, and still only submitted
+    return (
+        pd.Series(pd.Categorical(codes).take(positions, allow_fill=True), index=status.index),
+        pd.Series(stages.take(positions, allow_fill=True, fill_value="submitted"), index=status.index),
+    )
+
+
+def proposal_cube(proposal_df):
+    """Proposal count and value per status, present status and win-rate dimension - one pass over the rows"""
+    stage = proposal_df['stage'] if 'stage' in proposal_df.columns else status_stages(proposal_df['status'])[1]
+    dims = [col for col in ['status', 'present_status', *WIN_RATE_DIMENSIONS.values()] if col in proposal_df.columns]
+    amount = proposal_df['amount'] if 'amount' in proposal_df.columns else 0.0
+    frame = proposal_df[dims].assign(stage=stage, _amount=amount)
+    return (
+        frame.groupby(['stage', *dims], observed=True, dropna=False, sort=False)
+        .agg(count=('_amount', 'size'), value=('_amount', 'sum'))
+        .reset_index()
+    )
+
+
+def win_rate_table(cube, column):
+    """Proposals, decided (OK or DROP), won and the count / value win rates per value of ``column``"""
+    won = cube['stage'] == 'won'
+    decided = won | (cube['stage'] == 'dropped')
+    table = cube.assign(
+        won=cube['count'].where(won, 0),
+        decided=cube['count'].where(decided, 0),
+        won_value=cube['value'].where(won, 0.0),
+        decided_value=cube['value'].where(decided, 0.0),
+    ).groupby(column, sort=False)[['count', 'value', 'decided', 'won', 'decided_value', 'won_value']].sum()
+    table['win_rate'] = table['won'] / table['decided'].where(table['decided'] > 0) * 100
+    table['value_win_rate'] = table['won_value'] / table['decided_value'].where(table['decided_value'] > 0) * 100
+    return table.rename(columns={'count': 'proposals'}).sort_values('proposals', ascending=False)
+
+
+def get_proposal_insights(proposal_df):
+    """Generate insights from proposal data"""
+    insights = {}
+
+    if proposal_df.empty:
+        return insights
+
+    # Every count below is read off one grouped pass over the frame
+    cube = proposal_cube(proposal_df) if 'status' in proposal_df.columns else None
+
+    # Total proposals
+    insights['total_proposals'] = len(proposal_df)
+
+    # Total proposal value
+    if 'amount' in proposal_df.columns:
+        insights['total_value'] = proposal_df['amount'].sum()
+
+    if cube is None:
+        return insights
+
+    # Status, present status, industry, district, source and yearly distributions
+    distributions = {
+        'status_distribution': 'status',
+        'present_status_distribution': 'present_status',
+        'industry_distribution': 'industry_type',
+        'district_distribution': 'district',
+        'source_distribution': 'source',
+        'yearly_distribution': 'year',
+    }
+    for key, column in distributions.items():
+        if column in cube.columns:
+            counts = cube.groupby(column, sort=False)['count'].sum()
+            counts = counts.sort_index() if column == 'year' else counts.sort_values(ascending=False, kind='stable')
+            insights[key] = counts.to_dict()
+
+    # Funnel: submitted -> follow-up -> OK / drop
+    stages = cube.groupby('stage', observed=False)[['count', 'value']].sum().reindex(FUNNEL_STAGES, fill_value=0)
+    insights['stage_counts'] = stages['count'].astype(int).to_dict()
+    insights['stage_values'] = stages['value'].astype(float).to_dict()
+    decided = stages.loc['won', 'count'] + stages.loc['dropped', 'count']
+    insights['funnel'] = {
+        "Submitted": len(proposal_df),
+        "Followed up": int(stages.loc['follow_up', 'count'] + decided),
+        "Decided": int(decided),
+        "Won (OK)": int(stages.loc['won', 'count']),
+    }
+
+    # Calculate conversion rate (OK vs Total)
+    insights['conversion_rate'] = stages.loc['won', 'count'] / len(proposal_df) * 100
+    insights['win_rate'] = stages.loc['won', 'count'] / decided * 100 if decided else 0
+
+    # Win rates by industry, district, source and year
+    insights['win_rates'] = {
+        label: win_rate_table(cube, column)
+        for label, column in WIN_RATE_DIMENSIONS.items() if column in cube.columns
+    }
+
+    return insights
+
+
+def payment_status_summary(df):
+    """Count and amounts per work status"""
+    return df.groupby("work_status").agg(
+        count=("work_status", "count"),
+        actual_pending=("pending_amount", "sum"),
+        total_final=("final_amount", "sum"),
+        total_received=("payment_received", "sum")
+    ).reset_index()
+
+
+def payment_year_summary(df):
+    """Amount totals per year"""
+    return df.groupby('year')[
+        ['order_amount', 'final_amount', 'payment_received', 'pending_amount']
+    ].sum().reset_index()
+
+
+# ===================== CLIENT CANONICALIZATION =====================
+# The same client is written many ways ("Om Sai Cements Pvt. Ltd., Pune",
+# "M/s OM SAI CEMENTS LTD"). Names are reduced to a key without the district,
+# "M/s", punctuation and legal suffixes. Keys that still differ are matched by
+# character-trigram similarity; an inverted trigram index limits comparisons
+# to names sharing rare grams instead of comparing every pair.
+CLIENT_MATCH_THRESHOLD = 0.8  # Dice similarity of trigram sets
+LEGAL_SUFFIXES = r"\b(?:private|pvt|limited|ltd|llp|inc|co|company|corporation|corp)\b"
+
+
+def normalize_client(series):
+    """Vectorised client-name key: ``'M/s Om Sai Cements Pvt. Ltd., Pune'`` -> ``'om sai cements'``"""
+    key = series.fillna("").astype(str).str.split(",").str[0].str.lower()
+    key = key.str.replace(r"^\s*m\s*/\s*s\.?\s+", "", regex=True)
+    key = key.str.replace(r"[^a-z0-9&]+", " ", regex=True)
+    key = key.str.replace(LEGAL_SUFFIXES, " ", regex=True)
+    return key.str.split().str.join(" ")
+
+
+def _trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ClientIndex:
+    """Incremental name -> canonical client id map"""
+
+    def __init__(self, threshold=CLIENT_MATCH_THRESHOLD):
+        self.threshold = threshold
+        self.ids = {}  # raw name -> client id
+        self.key_ids = {}  # normalised key -> client id
+        self.names = []  # client id -> canonical display name
+        self._grams = []  # client id -> trigram set
+        self._digits = []  # client id -> digit runs, which must match exactly
+        self._postings = collections.defaultdict(list)  # trigram -> client ids
+        self._lock = threading.Lock()
+
+    def add(self, names):
+        """Assign ids to the names not seen before; returns how many were new"""
+        with self._lock:
+            new = [name for name in pd.unique(names) if name not in self.ids]
+            if not new:
+                return 0
+            for name, key in zip(new, normalize_client(pd.Series(new, dtype=object))):
+                client_id = self.key_ids.get(key)
+                if client_id is None:
+                    client_id = self._match(key)
+                    if client_id is None:
+                        client_id = self._new_client(key)
+                    self.key_ids[key] = client_id
+                self.ids[name] = client_id
+            return len(new)
+
+    def lookup(self, names):
+        """(client ids, canonical names) of names already added, read under the lock"""
+        codes, uniques = pd.factorize(names)
+        with self._lock:
+            unique_ids = np.array([self.ids[name] for name in uniques], dtype="int64")
+            canonical = np.asarray(self.names, dtype=object)
+        ids = unique_ids[codes]
+        return ids, canonical[ids]
+
+    def _match(self, key):
+        grams = _trigrams(key)
+        digits = re.findall(r"\d+", key)
+        # Prefix filter: a client reaching the threshold shares at least
+        # min_shared grams with the key, so it is in the posting list of one of
+        # the len(grams) - min_shared + 1 rarest grams; only those are scanned
+        min_shared = math.ceil(self.threshold * len(grams) / (2 - self.threshold) - 1e-9)
+        rarest = sorted(grams, key=lambda gram: len(self._postings.get(gram, ())))
+        candidates = set()
+        for gram in rarest[:len(grams) - min_shared + 1]:
+            candidates.update(self._postings.get(gram, ()))
+
+        best, best_score = None, self.threshold
+        # Sizes alone bound the score, which rules most candidates out cheaply
+        low, high = len(grams) * self.threshold / (2 - self.threshold), len(grams) * (2 - self.threshold) / self.threshold
+        for client_id in candidates:
+            other = self._grams[client_id]
+            if not low <= len(other) <= high:
+                continue
+            score = 2 * len(grams & other) / (len(grams) + len(other))
+            if score >= best_score and self._digits[client_id] == digits:
+                best, best_score = client_id, score
+        return best
+
+    def _new_client(self, key):
+        client_id = len(self.names)
+        grams = _trigrams(key)
+        self.names.append(key.title() if key else "Unknown")
+        self._grams.append(grams)
+        self._digits.append(re.findall(r"\d+", key))
+        for gram in grams:
+            self._postings[gram].append(client_id)
+        return client_id
+
+
+@functools.lru_cache(maxsize=None)
+def client_index():
+    """One index for the process, shared by payments and proposals and grown as names appear"""
+    return ClientIndex()
+
+
+def client_assignments(names, index=None):
+    """(client ids, canonical names) for a name column, adding the names not seen before"""
+    index = client_index() if index is None else index
+    index.add(names)
+    return index.lookup(names)
+
+
+def with_clients(df, column):
+    """Add ``client_id`` and canonical ``client`` columns derived from ``column``
+
+    Called once per dataset version (the dashboard shares processed frames
+    across sessions), so the assignment itself is not cached.
+    """
+    if df.empty or column not in df.columns:
+        return df
+    with perf_stage("client_canonicalization", "process", rows=len(df)):
+        ids, clients = client_assignments(df[column].fillna("").astype(str))
+    return df.assign(client_id=ids, client=clients)
+
+
+# ===================== AGGREGATE STORE =====================
+# Grouped sums kept up to date from row-level deltas. Every row gets a
+# signature (hash of its key and value columns, plus its occurrence number so
+# duplicate rows stay distinct); on update only the rows whose signatures
+# appeared or disappeared are aggregated and added to / subtracted from the
+# running totals.
+_OCCURRENCE_SALT = np.uint64(0x9E3779B97F4A7C15)
+
+
+def row_signatures(rows):
+    """One uint64 per row, stable across reruns for identical content"""
+    sig = pd.util.hash_pandas_object(rows, index=False).to_numpy()
+    occurrence = pd.Series(sig).groupby(sig).cumcount().to_numpy(dtype="uint64")
+    with np.errstate(over="ignore"):
+        return sig + occurrence * _OCCURRENCE_SALT
+
+
+class AggregateStore:
+    """Sums of ``values`` (and a ``rows`` count) per combination of ``keys``
+
+    ``totals`` holds one row per group: the key columns, the sums and ``rows``,
+    indexed by a hash of the keys so deltas merge without index alignment.
+    """
+
+    def __init__(self, keys, values):
+        self.keys = list(keys)
+        self.values = list(values)
+        self.totals = pd.DataFrame(columns=self.keys + self.values + ["rows"])
+        self.source_version = None
+        self.last_delta = (0, 0)  # rows added, rows removed by the last update
+        self._rows = None
+        self.lock = threading.Lock()
+
+    def _aggregate(self, rows, counts):
+        group = pd.util.hash_pandas_object(rows[self.keys], index=False).to_numpy()
+        grouped = rows.assign(rows=counts).groupby(group, sort=False)
+        totals = grouped[self.keys].first()
+        totals[self.values + ["rows"]] = grouped[self.values + ["rows"]].sum()
+        return totals
+
+    def update(self, rows, version=None):
+        """Bring the totals in line with ``rows``; a no-op when ``version`` is unchanged"""
+        if version is not None and version == self.source_version:
+            return self.last_delta
+        rows = rows[self.keys + self.values]
+        rows = rows.set_axis(row_signatures(rows))
+        if self._rows is None:
+            self.totals = self._aggregate(rows, 1)
+            self.last_delta = (len(rows), 0)
+        else:
+            added = rows[~rows.index.isin(self._rows.index)]
+            removed = self._rows[~self._rows.index.isin(rows.index)]
+            if len(added) or len(removed):
+                self._merge(pd.concat([added, removed.assign(**{v: -removed[v] for v in self.values})]),
+                            np.r_[np.ones(len(added), dtype="int64"), -np.ones(len(removed), dtype="int64")])
+            self.last_delta = (len(added), len(removed))
+        self._rows = rows
+        self.source_version = version
+        return self.last_delta
+
+    def _merge(self, signed_rows, counts):
+        delta = self._aggregate(signed_rows, counts)
+        columns = self.values + ["rows"]
+        position = self.totals.index.get_indexer(delta.index)
+        known = position >= 0
+        sums = self.totals[columns].to_numpy(dtype="float64", copy=True)
+        sums[position[known]] += delta[columns].to_numpy(dtype="float64")[known]
+        totals = pd.concat([self.totals.assign(**dict(zip(columns, sums.T))), delta[~known]])
+        self.totals = totals[totals["rows"] > 0].astype({"rows": "int64"})
+
+
+# ===================== RECEIVABLES AGING =====================
+# Pending amounts are pre-aggregated per unit, status, mode and calendar day
+# in an AggregateStore; ageing them against any reference date then only bins
+# the distinct days, not the rows. The dashboard keeps one store per data
+# stream, so sessions on different sources never diff against each other.
+AGING_BUCKETS = ["0–30", "31–60", "61–90", "90+", "No date"]
+AGING_BINS = [-np.inf, 30, 60, 90, np.inf]
+
+
+def receivables_frame(df):
+    """Rows with money outstanding, reduced to the aging dimensions and their day"""
+    pending = apply_mask(df, df["pending_amount"] > 0)
+    unit = pending["client"] if "client" in pending.columns else pending.get("unit_name", "Unknown")
+    return pd.DataFrame({
+        "unit": unit,
+        "work_status": pending.get("work_status", "Unknown"),
+        "payment_mode": pending.get("payment_mode", "Unknown"),
+        "day": pending["payment_date"].dt.floor("D") if "payment_date" in pending.columns else pd.NaT,
+        "pending_amount": pending["pending_amount"],
+    }, index=pending.index)
+
+
+def new_aging_store():
+    return AggregateStore(keys=["unit", "work_status", "payment_mode", "day"], values=["pending_amount"])
+
+
+def update_aging_store(df, store):
+    """Apply the row changes since the store's last refresh; returns a snapshot of the day-level totals"""
+    with store.lock:
+        version = version_of(df)
+        if store.source_version != version:
+            with perf_stage("aging_store.update", "aggregate", rows=len(df)) as record:
+                added, removed = store.update(receivables_frame(df), version)
+                record["rows"] = added + removed
+        return store.totals.reset_index(drop=True)
+
+
+def aging_buckets(day_totals, reference_date):
+    """Bucket label per day-level row, by days between its date and ``reference_date``"""
+    age = (pd.Timestamp(reference_date) - day_totals["day"]).dt.days
+    buckets = pd.cut(age, bins=AGING_BINS, labels=AGING_BUCKETS[:-1])
+    return buckets.cat.add_categories(["No date"]).fillna("No date").cat.set_categories(AGING_BUCKETS)
+
+
+def aging_table(day_totals, reference_date, by="unit"):
+    """Pending amount per ``by`` value and aging bucket, largest total first"""
+    table = day_totals.groupby(
+        [day_totals[by], aging_buckets(day_totals, reference_date).rename("bucket")], observed=False
+    )["pending_amount"].sum().unstack("bucket", fill_value=0.0)
+    table = table.loc[:, (table != 0).any()] if not table.empty else table
+    table["Total"] = table.sum(axis=1)
+    return table.sort_values("Total", ascending=False)
+
+
+# ===================== TIME-SERIES ROLLUPS =====================
+# Daily sums and counts live in an AggregateStore, so a refresh only folds in
+# the rows that changed. Monthly and quarterly levels are regrouped from the
+# daily totals (one row per day, not per record), and the daily level keeps
+# prefix sums so the total of any date window is two binary searches and a
+# subtraction. Each update publishes a new RollupSnapshot; readers keep the one
+# they were handed, so another session's update never changes it under them.
+# Like the aging store, the dashboard keeps one rollup per data stream.
+ROLLUP_LEVELS = {"Daily": "D", "Monthly": "M", "Quarterly": "Q"}
+
+
+class RollupSnapshot:
+    """Period totals of a rollup at one dataset version; never modified once made"""
+
+    def __init__(self, values, levels=None, prefix=None):
+        self.values = list(values)
+        self.levels = levels or {}  # level -> totals indexed by period start
+        self.prefix = prefix  # cumulative daily totals, same index as the Daily level
+
+    def series(self, level="Monthly", start=None, end=None):
+        """Period totals of ``level`` over the days in [start, end]
+
+        A period cut by the window counts only its days inside it, the same
+        days ``window_total`` counts.
+        """
+        totals = self.levels.get(level)
+        if totals is None:
+            return pd.DataFrame(columns=self.values + ["rows"])
+        if start is None and end is None:
+            return totals
+        days = self.prefix.index
+        lo, hi = self._bounds(days, start, end)
+        if level == "Daily" or hi <= lo:
+            return totals.iloc[lo:hi]
+        # Split the window's days into runs of one period each and total every run from the prefix sums
+        periods = days[lo:hi].to_period(ROLLUP_LEVELS[level]).start_time
+        first = lo + np.flatnonzero(np.r_[True, periods[1:] != periods[:-1]])
+        last = np.r_[first[1:], hi] - 1
+        cumulative = self.prefix.to_numpy()
+        before = np.where((first > 0)[:, None], cumulative[np.maximum(first - 1, 0)], 0)
+        return pd.DataFrame(cumulative[last] - before, index=periods[first - lo],
+                            columns=self.prefix.columns).astype(totals.dtypes.to_dict())
+
+    def window_total(self, start=None, end=None):
+        """Sums and row count over a date window, from the daily prefix sums"""
+        prefix = self.prefix
+        if prefix is None or prefix.empty:
+            return pd.Series(0.0, index=self.values + ["rows"])
+        lo, hi = self._bounds(prefix.index, start, end)
+        if hi <= lo:
+            return pd.Series(0.0, index=prefix.columns)
+        before = prefix.iloc[lo - 1] if lo > 0 else 0.0
+        return prefix.iloc[hi - 1] - before
+
+    @staticmethod
+    def _bounds(index, start, end):
+        lo = index.searchsorted(pd.Timestamp(start), "left") if start is not None else 0
+        hi = index.searchsorted(pd.Timestamp(end), "right") if end is not None else len(index)
+        return lo, hi
+
+
+class TimeRollup:
+    """Daily / monthly / quarterly sums of ``values`` over ``date_column``"""
+
+    def __init__(self, date_column, values):
+        self.date_column = date_column
+        self.values = list(values)
+        self.store = AggregateStore(["day"], self.values)
+        self.snapshot = RollupSnapshot(self.values)
+
+    def update(self, df, version=None):
+        """Fold in the rows changed since the last version; returns the snapshot for ``df``"""
+        with self.store.lock:
+            if version is None or version != self.store.source_version:
+                rows = pd.DataFrame({"day": df[self.date_column].dt.floor("D"), **{v: df[v] for v in self.values}})
+                self.store.update(rows.dropna(subset=["day"]), version)
+                self.snapshot = self._roll_up()
+            return self.snapshot
+
+    def _roll_up(self):
+        daily = self.store.totals.set_index("day")[self.values + ["rows"]].sort_index()
+        daily.index = pd.DatetimeIndex(daily.index)
+        levels = {
+            level: daily if freq == "D" else daily.groupby(daily.index.to_period(freq).start_time).sum()
+            for level, freq in ROLLUP_LEVELS.items()
+        }
+        return RollupSnapshot(self.values, levels, daily.cumsum())
+
+
+def new_payment_rollup():
+    return TimeRollup("payment_date", ["order_amount", "final_amount", "payment_received", "pending_amount"])
+
+
+def new_proposal_rollup():
+    return TimeRollup("date", ["amount"])
+
+
+def update_rollup(rollup, df):
+    """Bring a rollup up to ``df``; returns the RollupSnapshot of that version"""
+    with perf_stage(f"rollup.{rollup.date_column}", "aggregate", rows=len(df)):
+        return rollup.update(df, version_of(df))
+
+
+# ===================== DATASET VERSIONS =====================
+def dataset_version(df):
+    """Content hash of a frame - identical data gets the same version in every rerun and session"""
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(json.dumps([str(c) for c in df.columns]).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def stamp_version(df, source_version=None):
+    """Record the version of a freshly processed frame in ``df.attrs``
+
+    Processing is deterministic, so the version of the raw sheet it came from
+    (stamped by the backend) is reused rather than hashing the frame again.
+    """
+    with perf_stage("dataset_version", "process", rows=len(df)):
+        df.attrs["version"] = source_version or dataset_version(df)
+    return df
+
+
+def version_of(df):
+    # attrs travel with derived frames too, so only trust them on the loaded frames
+    return df.attrs.get("version") or dataset_version(df)
+
+
+# ===================== FILTERING =====================
+def apply_mask(df, mask):
+    """Select the masked rows, reusing the frame itself when nothing is filtered out"""
+    return df if mask.all() else df[mask]
+
+
+# ===================== BATCH SNAPSHOTS =====================
+# batch.py runs the backends and processing above (from cron or a worker) and
+# writes the processed frames, aggregates and KPIs to SNAPSHOT_DIR. The
+# dashboard's "Precomputed Snapshot" source serves those frames as they are,
+# so no processing happens on the request path.
+SNAPSHOT_DIR = os.environ.get("DASHBOARD_SNAPSHOT_DIR", "snapshots")
+SNAPSHOT_MANIFEST = "summary.json"
+BATCH_SOURCES = ["csv", "values_api", "service_account", "local", "registry"]
+
+
+def arrow_strings(df):
+    """Object columns holding only text, converted to ``ARROW_STRING``
+
+    A no-op on pandas 3, which infers that dtype already; on 2.x it keeps the
+    frames the dashboard shares across sessions as compact as on 3.
+    """
+    text = [c for c in df.columns
+            if df[c].dtype == object and pd.api.types.infer_dtype(df[c], skipna=True) == "string"]
+    return df.astype({c: ARROW_STRING for c in text}) if text else df
+
+
+def prepare_payments(raw, notify=log_notify, debug=None):
+    """Raw payment sheet -> processed frame with its version, canonical clients and Arrow strings"""
+    source_version = raw.attrs.get("version")
+    with perf_stage("process_raw_data", "process", rows=len(raw)):
+        df = process_raw_data(raw, notify, debug)
+    return arrow_strings(with_clients(stamp_version(df, source_version), "unit_name"))
+
+
+def prepare_proposals(raw, notify=log_notify, debug=None):
+    """Raw proposal sheet -> processed frame with its version, canonical clients and Arrow strings"""
+    source_version = raw.attrs.get("version")
+    with perf_stage("process_proposal_data", "process", rows=len(raw)):
+        proposal_df = process_proposal_data(raw, notify, debug)
+    return arrow_strings(with_clients(stamp_version(proposal_df, source_version), "name"))
+
+
+def headless_load(source, kind, path=None, notify=log_notify):
+    """Raw sheet from one of ``BATCH_SOURCES``, without Streamlit"""
+    if source == "registry":
+        df, errors = SourceRegistry.from_file(path or SOURCES_FILE).load(kind, notify)
+        for name, error in errors.items():
+            notify("warning", f"{name}: {error}")
+        return df
+    if source == "local":
+        backend = local_backend(path or LOCAL_DATA_PATH, notify=notify)
+    elif source == "service_account":
+        backend = ServiceAccountBackend(notify=notify)
+    elif source == "values_api":
+        backend = ValuesApiBackend(notify=notify)
+    elif source == "csv":
+        backend = CsvExportBackend(notify=notify)
+    else:
+        raise ValueError(f"Unknown source: {source}")
+    return backend.load(kind)
+
+
+def payment_kpis(df):
+    return {
+        "records": len(df),
+        "order_amount": float(df["order_amount"].sum()),
+        "final_amount": float(df["final_amount"].sum()),
+        "payment_received": float(df["payment_received"].sum()),
+        "pending_amount": float(df["pending_amount"].sum()),
+    }
+
+
+def snapshot_aggregates(df, proposal_df):
+    """``{file name: frame}`` of the aggregates the batch writes next to the frames"""
+    aggregates = {
+        "payment_status_summary.csv": payment_status_summary(df),
+        "payment_year_summary.csv": payment_year_summary(df),
+        "payment_monthly.csv": update_rollup(new_payment_rollup(), df).series("Monthly").rename_axis("month").reset_index(),
+    }
+    if "payment_date" in df.columns:
+        aggregates["receivables_aging.csv"] = aging_table(
+            update_aging_store(df, new_aging_store()), datetime.now().date(), "unit"
+        ).rename_axis("unit").reset_index()
+    if not proposal_df.empty:
+        insights = get_proposal_insights(proposal_df)
+        for label, table in insights.get("win_rates", {}).items():
+            aggregates[f"win_rates_{label.lower()}.csv"] = table.reset_index()
+        if "date" in proposal_df.columns:
+            aggregates["proposal_monthly.csv"] = (
+                update_rollup(new_proposal_rollup(), proposal_df).series("Monthly").rename_axis("month").reset_index()
+            )
+    return aggregates
+
+
+def replace_file(path, write):
+    # Write beside the target and rename, so readers never see a partial file
+    tmp = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.tmp")
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def write_snapshot(out_dir, df, proposal_df, source=None):
+    """Processed frames as Parquet, aggregates as CSV and the KPI summary as JSON; returns the summary"""
+    os.makedirs(out_dir, exist_ok=True)
+    frames = {"payments": df, "proposals": proposal_df}
+    for kind, frame in frames.items():
+        replace_file(os.path.join(out_dir, f"{kind}.parquet"), lambda p, f=frame: f.to_parquet(p, index=False))
+    aggregates = snapshot_aggregates(df, proposal_df)
+    for name, table in aggregates.items():
+        replace_file(os.path.join(out_dir, name), lambda p, t=table: t.to_csv(p, index=False))
+
+    insights = get_proposal_insights(proposal_df) if not proposal_df.empty else {}
+    summary = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "source": source,
+        "versions": {kind: version_of(frame) for kind, frame in frames.items()},
+        "payments": payment_kpis(df),
+        "proposals": {
+            key: insights[key] for key in
+            ("total_proposals", "total_value", "conversion_rate", "win_rate", "funnel", "stage_counts")
+            if key in insights
+        },
+        "files": [f"{kind}.parquet" for kind in frames] + list(aggregates),
+    }
+
+    def write_summary(tmp):
+        # Closed before the rename, so the manifest is complete when it appears
+        with open(tmp, "w") as f:
+            json.dump(summary, f, indent=2, default=float)
+
+    # The manifest goes last: its mtime is the snapshot version the dashboard keys on
+    replace_file(os.path.join(out_dir, SNAPSHOT_MANIFEST), write_summary)
+    return summary
+
+
+def run_batch(source, out_dir=SNAPSHOT_DIR, path=None, notify=log_notify):
+    """Load, process and snapshot both sheets; the importable form of batch.py"""
+    raw = headless_load(source, "payments", path, notify)
+    if raw.empty:
+        raise DataBackendError(f"No payment rows from {source}")
+    df = prepare_payments(raw, notify)
+    try:
+        raw_proposals = headless_load(source, "proposals", path, notify)
+    except Exception as e:
+        notify("warning", f"Proposals not loaded: {str(e)}")
+        raw_proposals = pd.DataFrame()
+    proposal_df = prepare_proposals(raw_proposals, notify) if not raw_proposals.empty else pd.DataFrame()
+    return write_snapshot(out_dir, df, proposal_df, source)
+
+
+def snapshot_version(path=SNAPSHOT_DIR):
+    manifest = os.path.join(path, SNAPSHOT_MANIFEST)
+    return os.path.getmtime(manifest) if os.path.isfile(manifest) else None
+
+
+def read_snapshot(path, kind):
+    """A processed frame written by ``write_snapshot``, with its version restored"""
+    with open(os.path.join(path, SNAPSHOT_MANIFEST)) as f:
+        summary = json.load(f)
+    df = pd.read_parquet(os.path.join(path, f"{kind}.parquet"))
+    df.attrs["version"] = summary["versions"][kind]
+    return df, summary
+
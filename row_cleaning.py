@@ -0,0 +1,96 @@
+"""Per-value cleaning of sheet cells, and its process-pool side.
+
+``safe_num`` and ``parse_date`` are applied to every cell of the amount and
+date columns. They live here rather than in app.py so that worker processes
+can import them by name: under ``streamlit run`` the dashboard script is
+``__main__`` and its functions cannot be pickled to a worker.
+
+A worker converts one row chunk with ``convert_into`` and writes the result
+straight into a shared-memory array owned by the parent, so only the input
+strings are pickled.
+"""
+import re
+import sys
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+
+def safe_num(v):
+    """Enhanced number conversion for Indian currency format"""
+    try:
+        if pd.isna(v) or v == "" or str(v).strip() == "":
+            return 0.0
+
+        # Convert to string and clean
+        v_str = str(v).strip()
+
+        # Remove currency symbols, commas, and spaces
+        v_clean = re.sub(r'[₹$,\\s]', '', v_str)
+
+        # Handle negative numbers in parentheses
+        if v_clean.startswith('(') and v_clean.endswith(')'):
+            v_clean = '-' + v_clean[1:-1]
+
+        # Convert to float
+        return float(v_clean) if v_clean else 0.0
+
+    except Exception as e:
+        return 0.0
+
+
+def parse_date(v):
+    try:
+        return pd.to_datetime(v, dayfirst=True, errors="coerce")
+    except:
+        return pd.NaT
+
+
+def unparseable(values):
+    """Vectorized: True where ``safe_num`` turns a non-blank cell into 0.0"""
+    if pd.api.types.is_numeric_dtype(values):
+        return np.zeros(len(values), dtype=bool)
+    text = pd.Series(values, dtype="string").str.strip()
+    # The same clean-up as safe_num, one column at a time
+    cleaned = text.str.replace(r'[₹$,\\s]', '', regex=True)
+    cleaned = cleaned.str.replace(r'^\((.*)\)$', r'-\1', regex=True)
+    parsed = pd.to_numeric(cleaned, errors="coerce")
+    return (cleaned.fillna("").ne("") & parsed.isna()).to_numpy(dtype=bool)
+
+
+# converter -> (function, dtype of the converted column)
+CONVERTERS = {
+    "safe_num": (safe_num, np.dtype("float64")),
+    "parse_date": (parse_date, np.dtype("datetime64[us]")),
+}
+
+
+def convert(values, converter):
+    """Apply a converter to a sequence of cells; returns an array of its dtype"""
+    func, dtype = CONVERTERS[converter]
+    converted = pd.Series(values, dtype=object).apply(func)
+    if dtype.kind == "M":
+        return pd.to_datetime(converted).to_numpy(dtype=dtype)
+    return converted.to_numpy(dtype=dtype)
+
+
+def _attach(name):
+    # Workers share the parent's resource tracker, which drops the block when
+    # the parent unlinks it; a worker must not unregister it on its own
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+
+def convert_into(converter, values, shm_name, start):
+    """Worker entry: convert ``values`` into rows ``start:start+len(values)`` of a shared array"""
+    dtype = CONVERTERS[converter][1]
+    shm = _attach(shm_name)
+    try:
+        out = np.ndarray(len(values), dtype=dtype, buffer=shm.buf, offset=start * dtype.itemsize)
+        out[:] = convert(values, converter)
+        del out
+    finally:
+        shm.close()
+    return len(values)
@@ -0,0 +1,20 @@
+"""Shared fixtures: the repository root on the path and the dashboard module.
+
+``app`` is imported in Streamlit's bare mode, where the page calls at module
+level are no-ops, so its pure functions can be tested without a server.
+"""
+import logging
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def app():
+    # Bare mode warns once per Streamlit call made at import time
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    import app as dashboard
+    return dashboard
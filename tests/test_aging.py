@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+import pipeline
+
+KEYS = ["unit", "work_status", "payment_mode", "day"]
+
+
+def payments(rows=200, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 200, rows), unit="D")
+    return pd.DataFrame({
+        "unit_name": rng.choice(["North", "South", "East"], rows),
+        "work_status": rng.choice(["Completed", "Pending"], rows),
+        "payment_mode": rng.choice(["Cash", "Cheque", "NEFT"], rows),
+        "payment_date": pd.Series(dates).mask(rng.random(rows) < 0.1),
+        "pending_amount": rng.integers(0, 5, rows) * 100.0,
+    })
+
+
+def full_totals(df):
+    """Day-level totals recomputed from scratch"""
+    rows = pipeline.receivables_frame(df)
+    totals = rows.groupby(KEYS, dropna=False)["pending_amount"].agg(["sum", "size"])
+    return totals.rename(columns={"sum": "pending_amount", "size": "rows"}).reset_index()
+
+
+def normalised(totals):
+    totals = totals[KEYS + ["pending_amount", "rows"]].sort_values(KEYS, na_position="first")
+    return totals.reset_index(drop=True).astype({"pending_amount": "float64", "rows": "int64"})
+
+
+def test_incremental_updates_match_a_full_recompute():
+    store = pipeline.new_aging_store()
+    df = payments()
+    versions = [
+        df,
+        df.drop(index=df.index[:20]),  # rows removed
+        pd.concat([df, payments(30, seed=1)], ignore_index=True),  # rows added
+        df.assign(pending_amount=df["pending_amount"].where(df.index % 7 != 0, 0.0)),  # rows settled
+        pd.concat([df, df.iloc[:5]], ignore_index=True),  # exact duplicates
+    ]
+    for version in versions:
+        day_totals = pipeline.update_aging_store(version, store)
+        pd.testing.assert_frame_equal(normalised(day_totals), normalised(full_totals(version)))
+
+
+def test_unchanged_version_is_not_reapplied():
+    store = pipeline.new_aging_store()
+    df = payments()
+    pending = int((df["pending_amount"] > 0).sum())
+    pipeline.update_aging_store(df, store)
+    assert store.last_delta == (pending, 0)
+    pipeline.update_aging_store(df.copy(), store)
+    assert store.last_delta == (pending, 0)
+    edited = df.assign(pending_amount=df["pending_amount"].where(df["pending_amount"] == 0, df["pending_amount"] + 1))
+    pipeline.update_aging_store(edited, store)
+    assert store.last_delta == (pending, pending)
+
+
+def test_aging_table_buckets_by_age_and_keeps_undated_rows():
+    df = pd.DataFrame({
+        "unit_name": ["A", "A", "A", "B"],
+        "work_status": "Pending",
+        "payment_mode": "Cash",
+        "payment_date": pd.to_datetime(["2024-03-31", "2024-02-15", None, "2023-12-01"]),
+        "pending_amount": [10.0, 20.0, 5.0, 40.0],
+    })
+    day_totals = pipeline.update_aging_store(df, pipeline.new_aging_store())
+    table = pipeline.aging_table(day_totals, "2024-04-01")
+    assert table.loc["A", "0–30"] == 10.0
+    assert table.loc["A", "31–60"] == 20.0
+    assert table.loc["A", "No date"] == 5.0
+    assert table.loc["B", "90+"] == 40.0
+    assert table.index.tolist() == ["B", "A"]
+    assert table["Total"].tolist() == [40.0, 35.0]
+
+
+def test_streams_keep_separate_stores(app):
+    north, south = payments(seed=2), payments(seed=3)
+    pipeline.update_aging_store(north, app.aging_store("sheet:north"))
+    day_totals = pipeline.update_aging_store(south, app.aging_store("sheet:south"))
+    assert app.aging_store("sheet:north") is not app.aging_store("sheet:south")
+    assert app.aging_store("sheet:south").last_delta[1] == 0
+    pd.testing.assert_frame_equal(normalised(day_totals), normalised(full_totals(south)))
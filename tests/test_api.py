@@ -0,0 +1,93 @@
+import json
+import urllib.error
+import urllib.request
+
+import pandas as pd
+import pytest
+
+import api_server
+
+
+def payments(version, pending=200.0):
+    df = pd.DataFrame({"unit_name": ["North", "South"], "pending_amount": [0.0, pending]})
+    df.attrs["version"] = version
+    return df
+
+
+@pytest.fixture
+def served():
+    datasets = {"payments": payments("v1")}
+    calls = []
+
+    def pending(df):
+        calls.append(df.attrs["version"])
+        return {"pending": df["pending_amount"].sum()}
+
+    endpoints = {
+        "kpis": (("payments",), pending),
+        "units": (("payments",), lambda df: df),
+        "proposal-insights": (("proposals",), len),
+    }
+    server = api_server.start_server(api_server.DashboardApi(endpoints, datasets.get))
+    yield server, datasets, calls
+    server.shutdown()
+    server.server_close()
+
+
+def get(server, path, **headers):
+    request = urllib.request.Request(server.url + path, headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+
+def test_unchanged_version_is_not_modified(served):
+    server, _, calls = served
+    status, headers, body = get(server, "/api/kpis")
+    assert status == 200
+    assert json.loads(body) == {"endpoint": "kpis", "versions": {"payments": "v1"}, "data": {"pending": 200.0}}
+    etag = headers["ETag"]
+
+    status, headers, body = get(server, "/api/kpis", **{"If-None-Match": etag})
+    assert status == 304
+    assert body == b""
+    assert headers["ETag"] == etag
+    # Computed once for the version, then served from the response cache
+    assert calls == ["v1"]
+
+
+def test_changed_version_gets_a_new_etag(served):
+    server, datasets, calls = served
+    old = get(server, "/api/kpis")[1]["ETag"]
+    datasets["payments"] = payments("v2", pending=50.0)
+
+    status, headers, body = get(server, "/api/kpis", **{"If-None-Match": old})
+    assert status == 200
+    assert headers["ETag"] != old
+    assert json.loads(body)["data"] == {"pending": 50.0}
+    assert calls == ["v1", "v2"]
+    assert get(server, "/api/kpis", **{"If-None-Match": f'"other", {headers["ETag"]}'})[0] == 304
+
+
+def test_formats_have_their_own_etags(served):
+    pytest.importorskip("pyarrow")
+    server, _, _ = served
+    json_etag = get(server, "/api/units")[1]["ETag"]
+    status, headers, _ = get(server, "/api/units?format=arrow")
+    assert status == 200
+    assert headers["Content-Type"] == api_server.ARROW_STREAM
+    assert headers["ETag"] != json_etag
+    assert get(server, "/api/units", **{"If-None-Match": json_etag,
+                                         "Accept": api_server.ARROW_STREAM})[0] == 200
+
+
+def test_errors_carry_no_etag(served):
+    server, _, _ = served
+    status, headers, _ = get(server, "/api/proposal-insights")
+    assert status == 503 and headers["Retry-After"] == "30" and "ETag" not in headers
+    assert get(server, "/api/kpis?format=arrow")[0] == 406
+    assert get(server, "/api/kpis?format=xml")[0] == 400
+    status, headers, _ = get(server, "/api/nope")
+    assert status == 404 and "ETag" not in headers
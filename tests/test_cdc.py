@@ -0,0 +1,113 @@
+import pandas as pd
+
+
+def payments(**changes):
+    df = pd.DataFrame({
+        "unit_name": ["North", "South", "East", "West"],
+        "work_order_no": ["WO-1", "wo 2", "WO-3", "WO-3"],
+        "final_amount": [100.0, 200.0, 300.0, 50.0],
+        "payment_received": [100.0, 0.0, 150.0, 50.0],
+        "pending_amount": [0.0, 200.0, 150.0, 0.0],
+        "work_status": ["Completed", "Pending", "Pending", "Completed"],
+        "payment_date": pd.to_datetime(["2024-01-05", None, "2024-02-01", "2024-02-02"]),
+    })
+    return df.assign(**changes)
+
+
+def by_key(records):
+    return {(r["key"], r["op"]): r["changes"] for r in records}
+
+
+def test_change_keys_are_normalised_and_repeats_kept_apart(app):
+    keys = app.change_keys("payments", payments())
+    assert keys.tolist() == ["WO1", "WO2", "WO3", "WO3#1"]
+
+
+def test_unkeyed_rows_are_known_by_content(app):
+    df = payments(work_order_no=["WO-1", None, None, "WO-4"])
+    keys = app.change_keys("payments", df)
+    assert keys.iloc[1].startswith("ROW") and keys.iloc[2].startswith("ROW")
+    assert keys.iloc[1] != keys.iloc[2]
+    assert app.change_keys("payments", df).tolist() == keys.tolist()
+
+
+def test_proposal_keys_fall_back_to_the_serial_number(app):
+    df = pd.DataFrame({"refrence_no": ["WO-9", None], "s_no": [1, 2], "name": ["A", "B"]})
+    assert app.change_keys("proposals", df).tolist() == ["WO9", "SNO2"]
+
+
+def test_identical_versions_have_no_changes(app):
+    assert app.diff_states(app.change_state("payments", payments()),
+                           app.change_state("payments", payments())) == []
+
+
+def test_diff_reports_inserts_updates_and_deletes(app):
+    old = payments()
+    new = pd.concat([
+        old.drop(index=[0]).assign(
+            payment_received=[200.0, 150.0, 50.0], pending_amount=[0.0, 150.0, 0.0],
+            work_status=["Completed", "Pending", "Completed"],
+        ),
+        pd.DataFrame({"unit_name": ["North"], "work_order_no": ["WO-5"], "final_amount": [75.0],
+                      "payment_received": [0.0], "pending_amount": [75.0], "work_status": ["Pending"],
+                      "payment_date": pd.to_datetime(["2024-03-01"])}),
+    ], ignore_index=True)
+    records = app.diff_states(app.change_state("payments", old), app.change_state("payments", new))
+
+    assert sorted((r["key"], r["op"]) for r in records) == [
+        ("WO1", "delete"), ("WO2", "update"), ("WO5", "insert"),
+    ]
+    changes = by_key(records)
+    assert changes[("WO2", "update")] == {
+        "payment_received": [0.0, 200.0], "pending_amount": [200.0, 0.0], "work_status": ["Pending", "Completed"],
+    }
+    assert changes[("WO5", "insert")]["payment_date"] == "2024-03-01T00:00:00"
+    assert changes[("WO1", "delete")]["final_amount"] == 100.0
+
+
+def test_missing_values_on_both_sides_are_not_a_change(app):
+    old = app.change_state("payments", payments())
+    new = app.change_state("payments", payments(unit_name=["North", "South", "East", "Central"]))
+    records = app.diff_states(old, new)
+    # WO2 has no payment date in either version
+    assert records == [{"key": "WO3#1", "op": "update", "changes": {"unit_name": ["West", "Central"]}}]
+
+
+def test_change_log_captures_consecutive_versions(app, tmp_path):
+    log = app.ChangeLog(str(tmp_path))
+    first, second = payments(), payments(pending_amount=[0.0, 0.0, 150.0, 0.0])
+    assert log.capture("payments", "sheet:a", "v1", first) == []
+    assert log.capture("payments", "sheet:a", "v1", first) == []
+    records = log.capture("payments", "sheet:a", "v2", second)
+    assert records == [{"key": "WO2", "op": "update", "changes": {"pending_amount": [200.0, 0.0]}}]
+    # Another stream is diffed against its own history only
+    assert log.capture("payments", "sheet:b", "v2", second) == []
+
+    changes = log.read()
+    assert changes[["stream", "from", "to", "key", "op"]].values.tolist() == [
+        ["sheet:a", "v1", "v2", "WO2", "update"],
+    ]
+    assert log.read(stream="sheet:b").empty
+
+
+def test_change_log_reads_are_filtered_and_cached_until_the_log_grows(app, tmp_path, monkeypatch):
+    log = app.ChangeLog(str(tmp_path))
+    log.capture("payments", "sheet:a", "v1", payments())
+    log.capture("payments", "sheet:a", "v2", payments(pending_amount=[0.0, 0.0, 150.0, 0.0]))
+    log.capture("payments", "sheet:b", "v1", payments())
+    log.capture("payments", "sheet:b", "v2", payments(work_status=["Completed"] * 4))
+
+    everything = log.read()
+    assert len(everything) == 3
+    assert log.read(stream="sheet:b")["key"].tolist() == ["WO2", "WO3"]
+    assert len(log.read(since=everything["at"].min())) == 3
+    assert log.read(since=everything["at"].max() + pd.Timedelta(milliseconds=1)).empty
+    assert log.read(since=everything["at"].min().date(), stream="sheet:a")["key"].tolist() == ["WO2"]
+
+    # Unchanged log: served from memory without decompressing it again
+    monkeypatch.setattr(app.gzip, "open", None)
+    assert log.read() is everything
+    monkeypatch.undo()
+
+    log.capture("payments", "sheet:a", "v3", payments())
+    assert len(log.read()) == 4
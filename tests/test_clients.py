@@ -0,0 +1,66 @@
+import threading
+
+import pandas as pd
+
+import pipeline
+
+NAMES = [
+    "M/s Om Sai Cements Pvt. Ltd., Pune",
+    "OM SAI CEMENTS LTD",
+    "Om Sai Cement Limited",
+    "Shree Ganesh Traders, Nashik",
+    "Shree Ganesh Trader",
+    "Plant 2 Industries",
+    "Plant 3 Industries",
+    "",
+]
+
+
+def test_normalize_client_strips_prefix_district_and_suffixes():
+    keys = pipeline.normalize_client(pd.Series(NAMES[:3] + [None]))
+    assert keys.tolist() == ["om sai cements", "om sai cements", "om sai cement", ""]
+
+
+def test_variants_share_an_id_and_digits_must_match():
+    ids, clients = pipeline.client_assignments(pd.Series(NAMES), pipeline.ClientIndex())
+    assert ids[0] == ids[1] == ids[2]
+    assert ids[3] == ids[4]
+    assert len({ids[0], ids[3], ids[5], ids[6], ids[7]}) == 5
+    assert clients[0] == "Om Sai Cements"
+    assert clients[7] == "Unknown"
+
+
+def test_adding_in_batches_matches_adding_at_once():
+    whole = pipeline.ClientIndex()
+    whole.add(pd.Series(NAMES))
+    grown = pipeline.ClientIndex()
+    assert grown.add(pd.Series(NAMES[:4])) == 4
+    assert grown.add(pd.Series(NAMES)) == len(NAMES) - 4
+    assert grown.add(pd.Series(NAMES)) == 0
+    ids, clients = whole.lookup(pd.Series(NAMES))
+    grown_ids, grown_clients = grown.lookup(pd.Series(NAMES))
+    assert grown_ids.tolist() == ids.tolist()
+    assert grown_clients.tolist() == clients.tolist()
+
+
+def test_lookup_while_another_thread_adds():
+    index = pipeline.ClientIndex()
+    index.add(pd.Series(NAMES))
+    others = pd.Series([f"Client {i} Pvt Ltd" for i in range(2000)])
+    adder = threading.Thread(target=index.add, args=(others,))
+    adder.start()
+    while adder.is_alive():
+        ids, clients = index.lookup(pd.Series(NAMES))
+        assert clients[0] == "Om Sai Cements"
+    adder.join()
+    assert len(index.ids) == len(NAMES) + len(others)
+
+
+def test_with_clients_adds_id_and_canonical_columns(monkeypatch):
+    index = pipeline.ClientIndex()
+    monkeypatch.setattr(pipeline, "client_index", lambda: index)
+    df = pd.DataFrame({"name": ["OM SAI CEMENTS LTD", None, "Om Sai Cements Pvt Ltd"]})
+    out = pipeline.with_clients(df, "name")
+    assert out["client"].tolist() == ["Om Sai Cements", "Unknown", "Om Sai Cements"]
+    assert out["client_id"].iloc[0] == out["client_id"].iloc[2]
+    assert "client" not in df.columns
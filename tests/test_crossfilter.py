@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+DIMENSIONS = ["status", "present_status", "source"]
+
+
+def proposals(rows=500, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "status": rng.choice(["OK", "Pending", "Rejected"], rows),
+        "present_status": pd.Series(rng.choice(["Open", "Closed", "Hold"], rows)).mask(rng.random(rows) < 0.1),
+        "source": rng.choice(["Web", "Referral", "Tender", "Walk-in"], rows),
+        "amount": pd.Series(rng.integers(1, 100, rows) * 1000.0).mask(rng.random(rows) < 0.05),
+    })
+
+
+def matching(df, selections):
+    mask = pd.Series(True, index=df.index)
+    for name, values in selections.items():
+        mask &= df[name].isin(values)
+    return mask
+
+
+def expected_aggregate(df, name, selections):
+    others = {d: v for d, v in selections.items() if d != name}
+    rows = df[matching(df, others) & df[name].notna()]
+    grouped = rows.groupby(name, sort=False)
+    return pd.DataFrame({"rows": grouped.size(), "amount": grouped["amount"].sum()})
+
+
+@pytest.fixture
+def cube(app):
+    df = proposals()
+    return app.CrossFilterCube({d: df[d] for d in DIMENSIONS}, {"amount": df["amount"]})
+
+
+SELECTIONS = [
+    {},
+    {"status": ["OK"]},
+    {"status": ["OK", "Pending"], "source": ["Web"]},
+    {"status": ["Rejected"], "present_status": ["Open", "Hold"], "source": ["Tender", "Referral"]},
+    {"source": ["Nowhere"]},
+]
+
+
+@pytest.mark.parametrize("selections", SELECTIONS)
+def test_rows_match_a_pandas_mask(cube, selections):
+    df = proposals()
+    rows = cube.rows(selections)
+    if not selections:
+        assert rows is None
+    else:
+        np.testing.assert_array_equal(rows, np.flatnonzero(matching(df, selections)))
+
+
+@pytest.mark.parametrize("pairs", [True, False])
+@pytest.mark.parametrize("selections", SELECTIONS)
+def test_aggregates_match_a_pandas_groupby(app, monkeypatch, selections, pairs):
+    if not pairs:
+        monkeypatch.setattr(app, "CROSSFILTER_PAIR_CELLS", 0)
+    df = proposals()
+    cube = app.CrossFilterCube({d: df[d] for d in DIMENSIONS}, {"amount": df["amount"]})
+    assert bool(cube.pairs) == pairs
+    for name in DIMENSIONS:
+        actual = cube.aggregate(name, selections).sort_index()
+        expected = expected_aggregate(df, name, selections).sort_index()
+        assert actual.index.tolist() == expected.index.tolist()
+        assert actual["rows"].tolist() == expected["rows"].tolist()
+        np.testing.assert_allclose(actual["amount"].to_numpy(), expected["amount"].to_numpy())
+
+
+@pytest.mark.parametrize("selections", SELECTIONS)
+def test_total_matches_the_selected_rows(cube, selections):
+    selected = proposals()[matching(proposals(), selections)]
+    total = cube.total(selections)
+    assert total["rows"] == len(selected)
+    assert total["amount"] == pytest.approx(selected["amount"].sum())
+
+
+def test_unknown_values_and_dimensions_are_ignored(cube):
+    assert cube.rows({"missing": ["x"]}) is None
+    assert len(cube.rows({"status": ["OK", "Nowhere"]})) == (proposals()["status"] == "OK").sum()
+
+
+def test_drilldown_is_limited_to_the_selected_rows(app):
+    df = pd.DataFrame({
+        "work_order_no": [f"WO-{i}" for i in range(6)],
+        "unit_name": ["A", "B", "A", "B", "A", "B"],
+        "final_amount": [10.0, 20.0, 30.0, np.nan, 50.0, 60.0],
+        "payment_received": [1.0, 2.0, 3.0, 4.0, 5.0, 6.0],
+        "work_status": ["Completed", "Pending"] * 3,
+    })
+    points = app.DrilldownPoints(df, "final_amount", "payment_received")
+    x_range, y_range = points.bounds()
+    mode, view, count = app.drilldown_view(df, points, x_range, y_range, rows=np.array([1, 3, 4]))
+    assert mode == "points"
+    assert count == 2
+    assert view["work_order_no"].tolist() == ["WO-1", "WO-4"]
+    _, _, count = app.drilldown_view(df, points, x_range, y_range)
+    assert count == 5
@@ -0,0 +1,47 @@
+import io
+import os
+
+import pandas as pd
+import pytest
+
+import pipeline
+
+# The fixtures mix date formats on purpose
+pytestmark = pytest.mark.filterwarnings("ignore:Parsing dates")
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures")
+
+
+@pytest.fixture(scope="module")
+def datasets():
+    def read(name):
+        return pd.read_csv(os.path.join(FIXTURES, name), dtype=str)
+
+    return {
+        "payments": pipeline.prepare_payments(read("payments.csv")),
+        "proposals": pipeline.prepare_proposals(read("proposals.csv")),
+    }
+
+
+@pytest.mark.parametrize("kind", ["payments", "proposals"])
+def test_downloads_leave_out_internal_columns(app, datasets, kind):
+    df = datasets[kind]
+    assert set(pipeline.INTERNAL_COLUMNS) & set(df.columns)
+    exported = pd.read_csv(io.BytesIO(app.export_csv(df)))
+    assert not set(pipeline.INTERNAL_COLUMNS) & set(exported.columns)
+    assert len(exported) == len(df)
+
+
+def test_proposal_download_leaves_out_the_stage_encoding(app, datasets):
+    exported = pd.read_csv(io.BytesIO(app.export_csv(datasets["proposals"])))
+    assert {"status_code", "stage"} <= set(datasets["proposals"].columns)
+    assert not {"status_code", "stage"} & set(exported.columns)
+    assert "status" in exported.columns
+
+
+@pytest.mark.parametrize("kind, raw", [("payments", "unit_name"), ("proposals", "name")])
+def test_downloads_keep_raw_names_without_canonical_clients(app, datasets, kind, raw):
+    exported = pd.read_csv(io.BytesIO(app.export_csv(datasets[kind])))
+    assert {"client", "client_id"} <= set(datasets[kind].columns)
+    assert not {"client", "client_id"} & set(exported.columns)
+    assert raw in exported.columns
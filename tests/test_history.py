@@ -0,0 +1,111 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROWS = 10
+
+
+def payments(rows=ROWS):
+    return pd.DataFrame({
+        "unit_name": pd.Categorical(np.resize(["North", "South", "East"], rows)),
+        "work_order_no": [f"WO-{i}" for i in range(rows)],
+        "order_amount": np.arange(rows, dtype="float64") * 10,
+        "final_amount": np.arange(rows, dtype="float64") * 9,
+        "payment_received": np.arange(rows, dtype="float64") * 5,
+        "pending_amount": np.arange(rows, dtype="float64") * 4,
+        "payment_date": pd.date_range("2024-01-01", periods=rows, freq="D"),
+        "s_no": np.arange(rows, dtype="int64"),
+    })
+
+
+@pytest.fixture
+def history(app, tmp_path):
+    return app.SnapshotHistory(str(tmp_path), chunk_rows=4, compression="none")
+
+
+def test_round_trip_keeps_values_dtypes_and_categories(history):
+    df = payments()
+    manifest = history.record("payments", "sheet:a", df)
+    assert manifest["rows"] == ROWS
+    assert manifest["kpis"]["pending_amount"] == df["pending_amount"].sum()
+
+    versions = history.versions("payments", "sheet:a")
+    loaded = history.load(versions["path"].iloc[-1])
+    pd.testing.assert_frame_equal(loaded, df)
+    assert loaded.attrs["version"] == manifest["version"]
+
+
+def test_unchanged_version_is_not_stored_again(history):
+    df = payments()
+    assert history.record("payments", "sheet:a", df) is not None
+    assert history.record("payments", "sheet:a", df.copy()) is None
+    assert len(history.versions("payments", "sheet:a")) == 1
+
+
+def test_identical_chunks_are_stored_once(history):
+    df = payments()
+    history.record("payments", "sheet:a", df)
+    stored = history.stats()["chunks"]
+    # 8 columns in chunks of 4, 4 and 2 rows
+    assert stored == 8 * 3
+
+    # The same frame under another stream reuses every chunk
+    history.record("payments", "sheet:b", df)
+    assert history.stats()["chunks"] == stored
+
+    # One edited value only adds the chunk holding it
+    edited = df.copy()
+    edited.loc[ROWS - 1, "pending_amount"] = -1.0
+    history.record("payments", "sheet:a", edited)
+    assert history.stats()["chunks"] == stored + 1
+    loaded = history.load(history.versions("payments", "sheet:a")["path"].iloc[-1])
+    pd.testing.assert_frame_equal(loaded, edited)
+
+
+def test_versions_recorded_in_quick_succession_stay_in_order(history):
+    recorded = [history.record("payments", "sheet:a", payments().assign(s_no=i))["version"] for i in range(5)]
+    assert history.versions("payments", "sheet:a")["version"].tolist() == recorded
+    # The latest is compared against, so going back to an earlier version is stored again
+    assert history.record("payments", "sheet:a", payments().assign(s_no=0)) is not None
+
+
+def test_versions_are_listed_from_the_index_and_cached(app, history, monkeypatch):
+    history.record("payments", "sheet:a", payments())
+    listing = history.versions("payments", "sheet:a")
+    # An unchanged index is not read again, and no manifest is opened
+    monkeypatch.setattr(app.json, "load", None)
+    assert history.versions("payments", "sheet:a") is listing
+
+    monkeypatch.undo()
+    history.record("payments", "sheet:a", payments().assign(s_no=-1))
+    assert len(history.versions("payments", "sheet:a")) == 2
+
+
+def test_streams_recorded_before_the_index_are_indexed_from_their_manifests(app, history):
+    for i in range(3):
+        history.record("payments", "sheet:a", payments().assign(s_no=i))
+    expected = history.versions("payments", "sheet:a")
+    directory = os.path.dirname(expected["path"].iloc[0])
+    os.remove(os.path.join(directory, app.HISTORY_INDEX))
+
+    rebuilt = app.SnapshotHistory(history.directory).versions("payments", "sheet:a")
+    pd.testing.assert_frame_equal(rebuilt, expected)
+    assert os.path.isfile(os.path.join(directory, app.HISTORY_INDEX))
+
+
+def test_as_of_picks_the_newest_version_at_or_before(history):
+    history.record("payments", "sheet:a", payments())
+    taken_at = history.versions("payments", "sheet:a")["taken_at"].iloc[0]
+    assert history.as_of("payments", "sheet:a", taken_at - pd.Timedelta(seconds=1)) is None
+    assert history.as_of("payments", "sheet:a", taken_at).endswith(".json")
+    assert history.as_of("payments", "sheet:b", taken_at) is None
+
+
+def test_empty_frame_round_trips(history):
+    df = payments(0)
+    history.record("payments", "sheet:a", df)
+    loaded = history.load(history.versions("payments", "sheet:a")["path"].iloc[-1])
+    assert loaded.empty
+    assert list(loaded.columns) == list(df.columns)
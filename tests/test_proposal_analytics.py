@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import pipeline
+
+
+def proposals():
+    return pd.DataFrame({
+        "status": ["OK", "ok", "Drop", "Follow-Up", "FOLLOW UP", "Pending", "OK", "Drop"],
+        "source": ["Web", "Web", "Web", "Web", "Tender", "Tender", "Referral", "Referral"],
+        "amount": [100.0, 300.0, 200.0, 50.0, 70.0, 80.0, 40.0, 60.0],
+    })
+
+
+def test_statuses_map_to_codes_and_funnel_stages():
+    codes, stages = pipeline.status_stages(pd.Series(["OK", " ok ", "Drop", "Follow-Up", "follow up", "Pending", ""]))
+    assert codes.tolist() == ["OK", "OK", "DROP", "FOLLOWUP", "FOLLOWUP", "PENDING", ""]
+    assert stages.tolist() == ["won", "won", "dropped", "follow_up", "follow_up", "submitted", "submitted"]
+    assert stages.cat.categories.tolist() == pipeline.FUNNEL_STAGES
+
+
+def test_missing_status_is_submitted_without_a_code():
+    status = pd.Series(["Drop", None, "OK"], index=[7, 8, 9])
+    codes, stages = pipeline.status_stages(status)
+    assert codes.index.tolist() == [7, 8, 9]
+    assert codes.isna().tolist() == [False, True, False]
+    assert stages.tolist() == ["dropped", "submitted", "won"]
+
+
+def test_cube_counts_and_values_every_row_once():
+    cube = pipeline.proposal_cube(proposals())
+    assert cube["count"].sum() == len(proposals())
+    assert cube["value"].sum() == proposals()["amount"].sum()
+    web_won = cube[(cube["source"] == "Web") & (cube["stage"] == "won")]
+    assert web_won["count"].sum() == 2
+    assert web_won["value"].sum() == 400.0
+
+
+def test_win_rates_count_only_decided_proposals():
+    table = pipeline.win_rate_table(pipeline.proposal_cube(proposals()), "source")
+    web = table.loc["Web"]
+    assert (web["proposals"], web["decided"], web["won"]) == (4, 3, 2)
+    assert web["win_rate"] == pytest.approx(200 / 3)
+    assert web["value_win_rate"] == pytest.approx(400 / 600 * 100)
+    assert table.loc["Referral", "win_rate"] == 50.0
+    assert table.index[0] == "Web"
+
+
+def test_group_without_decided_proposals_has_no_win_rate():
+    table = pipeline.win_rate_table(pipeline.proposal_cube(proposals()), "source")
+    tender = table.loc["Tender"]
+    assert (tender["proposals"], tender["decided"], tender["won"]) == (2, 0, 0)
+    assert np.isnan(tender["win_rate"]) and np.isnan(tender["value_win_rate"])
+
+
+def test_no_proposals_give_an_empty_table_and_no_insights():
+    empty = proposals().iloc[:0]
+    table = pipeline.win_rate_table(pipeline.proposal_cube(empty), "source")
+    assert table.empty
+    assert {"proposals", "win_rate", "value_win_rate"} <= set(table.columns)
+    assert pipeline.get_proposal_insights(empty) == {}
+
+
+def test_insight_win_rate_is_zero_when_nothing_was_decided():
+    insights = pipeline.get_proposal_insights(proposals().iloc[[3, 4, 5]])
+    assert insights["funnel"] == {"Submitted": 3, "Followed up": 2, "Decided": 0, "Won (OK)": 0}
+    assert insights["win_rate"] == 0
+    assert insights["conversion_rate"] == 0
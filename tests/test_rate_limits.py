@@ -0,0 +1,188 @@
+import types
+import urllib.parse
+
+import pytest
+
+import pipeline
+
+
+class FakeClock:
+    """A monotonic clock that only moves when told to, or when slept on"""
+
+    def __init__(self, now=100.0):
+        self.now = now
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def bucket(clock, rate=2.0, capacity=3):
+    return pipeline.TokenBucket(rate, capacity, clock=clock, sleep=clock.sleep)
+
+
+def breaker(clock, **kwargs):
+    return pipeline.CircuitBreaker("sheet", failure_threshold=3, backoff=30, max_backoff=100, clock=clock, **kwargs)
+
+
+def fail(breaker, times=1):
+    for _ in range(times):
+        breaker.record_failure(ValueError("boom"))
+
+
+def test_bucket_allows_a_burst_up_to_capacity(clock):
+    limits = bucket(clock)
+    assert [limits.acquire(timeout=0) for _ in range(4)] == [True, True, True, False]
+    assert clock.slept == []
+
+
+def test_bucket_refills_at_the_rate_and_never_beyond_capacity(clock):
+    limits = bucket(clock)
+    for _ in range(3):
+        limits.acquire()
+    clock.now += 1.0  # two tokens at 2/s
+    assert [limits.acquire(timeout=0) for _ in range(3)] == [True, True, False]
+
+    clock.now += 60.0
+    assert [limits.acquire(timeout=0) for _ in range(4)] == [True, True, True, False]
+
+
+def test_blocking_acquire_sleeps_until_the_next_token(clock):
+    limits = bucket(clock, rate=0.5, capacity=1)
+    assert limits.acquire()
+    assert limits.acquire()
+    assert clock.slept == [2.0]
+    assert limits.acquire(tokens=1, timeout=5)
+    assert clock.slept == [2.0, 2.0]
+
+
+def test_acquire_gives_up_without_sleeping_past_the_timeout(clock):
+    limits = bucket(clock, rate=0.5, capacity=1)
+    limits.acquire()
+    assert not limits.acquire(timeout=1.5)
+    assert clock.slept == []
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    circuit = breaker(clock)
+    fail(circuit, 2)
+    assert circuit.state == "closed" and circuit.allow()
+    fail(circuit)
+    assert circuit.state == "open"
+    assert circuit.retry_in() == 30
+    assert not circuit.allow()
+
+
+def test_open_breaker_does_not_call_the_source(clock):
+    circuit = breaker(clock)
+    fail(circuit, 3)
+    calls = []
+    with pytest.raises(pipeline.CircuitOpenError, match="sheet paused for 30s after 3 failures"):
+        circuit.call(calls.append, 1)
+    assert calls == []
+
+
+def test_half_open_lets_a_single_trial_through(clock):
+    circuit = breaker(clock)
+    fail(circuit, 3)
+    clock.now += 30
+    assert circuit.state == "half-open"
+    assert circuit.allow()
+    assert not circuit.allow()
+
+
+def test_failed_trial_reopens_with_a_doubled_pause_up_to_the_maximum(clock):
+    circuit = breaker(clock)
+    fail(circuit, 3)
+    pauses = []
+    for _ in range(3):
+        clock.now += circuit.retry_in()
+        assert circuit.allow()
+        fail(circuit)
+        pauses.append(circuit.retry_in())
+    assert pauses == [60, 100, 100]
+    assert circuit.state == "open"
+
+
+def test_successful_trial_closes_and_keeps_the_snapshot(clock):
+    circuit = breaker(clock)
+    fail(circuit, 3)
+    clock.now += 30
+    assert circuit.call(lambda: "rows") == "rows"
+    assert circuit.state == "closed"
+    assert circuit.snapshot == "rows"
+    # The backoff starts over after a recovery
+    fail(circuit, 3)
+    assert circuit.retry_in() == 30
+
+
+def test_failures_below_the_threshold_reset_on_success(clock):
+    circuit = breaker(clock)
+    fail(circuit, 2)
+    circuit.record_success()
+    fail(circuit, 2)
+    assert circuit.state == "closed"
+    assert circuit.snapshot is None
+
+
+def test_failing_call_is_recorded_and_raised(clock):
+    circuit = breaker(clock)
+
+    def source():
+        raise ValueError("no sheet")
+
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            circuit.call(source)
+    assert circuit.state == "open"
+    assert circuit.last_error == "no sheet"
+
+
+class FakeRequests:
+    def __init__(self, payload):
+        self.payload = payload
+        self.urls = []
+        self.utils = types.SimpleNamespace(quote=urllib.parse.quote)
+
+    def get(self, url, **kwargs):
+        self.urls.append(url)
+        return types.SimpleNamespace(raise_for_status=lambda: None, json=lambda: self.payload, text="a,b\n1,2\n")
+
+
+def test_endpoint_raises_when_no_request_slot_frees_up(clock, monkeypatch):
+    fake = FakeRequests({})
+    monkeypatch.setattr(pipeline, "requests", fake)
+    limits = bucket(clock, rate=1 / 60, capacity=1)
+    endpoint = pipeline.SheetsEndpoint("sheet-id", "http://local", "http://local", api_key="",
+                                       rate_limits={"csv": limits, "values_api": limits})
+    assert endpoint.fetch_csv(endpoint.csv_urls(7)[0]) == "a,b\n1,2\n"
+    with pytest.raises(pipeline.RateLimitExceeded, match="Sheets API"):
+        endpoint.sheet_title(7)
+    assert len(fake.urls) == 1
+    assert clock.slept == []
+
+
+def test_endpoint_urls_and_padded_values(monkeypatch):
+    fake = FakeRequests({"values": [["a", "b", "c"], ["1"], ["2", "3", "4"]]})
+    monkeypatch.setattr(pipeline, "requests", fake)
+    endpoint = pipeline.SheetsEndpoint("sheet-id", "http://local/", "http://api/", api_key="")
+    assert endpoint.csv_urls(7) == [
+        "http://local/spreadsheets/d/sheet-id/export?format=csv&gid=7",
+        "http://local/spreadsheets/d/sheet-id/gviz/tq?tqx=out:csv&gid=7",
+        "http://local/spreadsheets/d/sheet-id/export?format=csv",
+    ]
+    assert endpoint.values_api_enabled and not endpoint.is_google
+
+    df = endpoint.fetch_values("Payments")
+    assert fake.urls == ["http://api/v4/spreadsheets/sheet-id/values/%27Payments%27"]
+    assert df.columns.tolist() == ["a", "b", "c"]
+    assert df.values.tolist() == [["1", "", ""], ["2", "3", "4"]]
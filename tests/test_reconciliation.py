@@ -0,0 +1,53 @@
+import pandas as pd
+
+
+def payments():
+    return pd.DataFrame({
+        "work_order_no": [" wo-0000123 ", "WO0000123", "WO-77", "WO-99", ""],
+        "final_amount": [100.0, 50.0, 30.0, 20.0, 5.0],
+        "payment_received": [60.0, 50.0, 0.0, 20.0, 5.0],
+        "pending_amount": [40.0, 0.0, 30.0, 0.0, 0.0],
+        "work_status": ["Completed", "Completed", "Pending", "Completed", "Completed"],
+        "payment_date": pd.to_datetime(["2024-02-01", "2024-01-20", "2024-03-01", "2024-04-01", "2024-05-01"]),
+    })
+
+
+def proposals():
+    return pd.DataFrame({
+        "no": ["WO0000123", "wo 0000123", None, None, "WO-404"],
+        "refrence_no": [None, None, "wo77", "WO-555", None],
+        "amount": [200.0, 150.0, 40.0, 10.0, 5.0],
+        "wo_date": pd.to_datetime(["2024-01-01", "2024-01-05", "2024-02-01", "2024-01-01", "2024-01-01"]),
+    })
+
+
+def test_work_order_key_normalises_and_blanks_to_na(app):
+    keys = app.work_order_key(pd.Series([" wo-0000123 ", "WO0000123", "  ", "-"]))
+    assert keys.iloc[:2].tolist() == ["WO0000123", "WO0000123"]
+    assert keys.iloc[2:].isna().all()
+
+
+def test_reference_number_only_fills_known_work_orders(app):
+    keys = app.proposal_work_order_key(proposals(), pd.Index(["WO0000123", "WO77"]))
+    assert keys.tolist()[:3] == ["WO0000123", "WO0000123", "WO77"]
+    assert pd.isna(keys.iloc[3])  # WO-555 names no payment
+    assert keys.iloc[4] == "WO404"  # "No" is kept even when it dangles
+
+
+def test_reconcile_matches_and_counts_each_work_order_once(app):
+    result = app.reconcile(payments(), proposals())
+    linked, summary = result["proposals"], result["summary"]
+
+    assert linked["matched"].tolist() == [True, True, True, False, False]
+    assert linked["payment_lines"].iloc[0] == 2
+    assert linked["final_amount"].iloc[0] == 150.0
+    assert linked["days_to_payment"].iloc[0] == 19
+    assert summary["matched"] == 3
+    assert summary["duplicate_references"] == 1
+    assert summary["dangling_references"] == 1
+    assert summary["quoted_value"] == 390.0
+    # WO0000123 is cited twice but its payments are counted once
+    assert summary["realized_value"] == 180.0
+    assert summary["received_value"] == 110.0
+    assert result["unmatched_payments"]["work_order_no"].tolist() == ["WO-99", ""]
+    assert summary["unmatched_payments"] == 2
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import pipeline
+
+
+def proposals(rows=300, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp("2023-11-01") + pd.to_timedelta(rng.integers(0, 240, rows), unit="D")
+    return pd.DataFrame({
+        "date": pd.Series(dates).mask(rng.random(rows) < 0.05),
+        "amount": rng.integers(1, 50, rows) * 1000.0,
+    })
+
+
+def full_series(df, freq, start=None, end=None):
+    """Period totals recomputed from the rows in [start, end]"""
+    day = df["date"].dt.floor("D")
+    inside = day.notna()
+    if start is not None:
+        inside &= day >= pd.Timestamp(start)
+    if end is not None:
+        inside &= day <= pd.Timestamp(end)
+    period = day[inside].dt.to_period(freq).dt.start_time
+    totals = df.loc[inside, "amount"].groupby(period).agg(["sum", "size"])
+    return totals.rename(columns={"sum": "amount", "size": "rows"})
+
+
+def assert_series_equal(snapshot_series, expected):
+    actual = snapshot_series[["amount", "rows"]]
+    np.testing.assert_array_equal(actual.index.to_numpy(), expected.index.to_numpy())
+    np.testing.assert_allclose(actual.to_numpy(dtype="float64"), expected.to_numpy(dtype="float64"))
+
+
+def test_incremental_updates_match_a_full_recompute():
+    rollup = pipeline.new_proposal_rollup()
+    df = proposals()
+    versions = [
+        df,
+        df.iloc[40:],
+        pd.concat([df, proposals(50, seed=1)], ignore_index=True),
+        df.assign(amount=df["amount"] * np.where(df.index % 5 == 0, 2, 1)),
+    ]
+    for version in versions:
+        snapshot = pipeline.update_rollup(rollup, version)
+        for level, freq in pipeline.ROLLUP_LEVELS.items():
+            assert_series_equal(snapshot.series(level), full_series(version, freq))
+
+
+@pytest.mark.parametrize("level", ["Daily", "Monthly", "Quarterly"])
+@pytest.mark.parametrize("start, end", [
+    ("2024-01-15", "2024-03-10"),  # cuts a month and a quarter at both ends
+    ("2023-12-01", "2023-12-31"),  # exactly one month
+    (None, "2024-02-14"),
+    ("2024-05-20", None),
+    ("2024-02-10", "2024-02-10"),
+])
+def test_window_series_counts_only_days_inside_the_window(level, start, end):
+    df = proposals()
+    snapshot = pipeline.update_rollup(pipeline.new_proposal_rollup(), df)
+    series = snapshot.series(level, start, end)
+    assert_series_equal(series, full_series(df, pipeline.ROLLUP_LEVELS[level], start, end))
+    total = snapshot.window_total(start, end)
+    assert series["amount"].sum() == pytest.approx(total["amount"])
+    assert series["rows"].sum() == total["rows"]
+
+
+def test_empty_window_and_empty_rollup():
+    snapshot = pipeline.update_rollup(pipeline.new_proposal_rollup(), proposals())
+    assert snapshot.series("Monthly", "2030-01-01", "2030-12-31").empty
+    assert snapshot.window_total("2030-01-01", "2030-12-31").sum() == 0
+    empty = pipeline.new_proposal_rollup().snapshot
+    assert empty.series("Monthly").empty
+    assert empty.window_total().sum() == 0
+
+
+def test_published_snapshot_is_not_changed_by_a_later_update():
+    rollup = pipeline.new_proposal_rollup()
+    df = proposals()
+    before = pipeline.update_rollup(rollup, df)
+    monthly = before.series("Monthly").copy()
+    after = pipeline.update_rollup(rollup, df.iloc[100:])
+    assert after is not before
+    pd.testing.assert_frame_equal(before.series("Monthly"), monthly)
@@ -0,0 +1,75 @@
+import os
+import threading
+
+import pandas as pd
+import pytest
+
+import pipeline
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures")
+# The fixtures mix date formats on purpose
+pytestmark = pytest.mark.filterwarnings("ignore:Parsing dates")
+
+
+def is_arrow_string(series):
+    return isinstance(series.dtype, pd.StringDtype) and series.dtype.storage.startswith("pyarrow")
+
+
+def test_arrow_strings_converts_text_columns_only():
+    df = pd.DataFrame({
+        "name": pd.Series(["a", None, "c"], dtype=object),
+        "mixed": pd.Series(["a", 1, None], dtype=object),
+        "amount": [1.0, 2.0, 3.0],
+    })
+    df.attrs["version"] = "v1"
+    out = pipeline.arrow_strings(df)
+    assert is_arrow_string(out["name"])
+    assert pd.isna(out["name"].iloc[1]) and out["name"].iloc[1] is not pd.NA
+    assert out["mixed"].dtype == object
+    assert out["amount"].dtype == "float64"
+    assert out.attrs["version"] == "v1"
+
+
+@pytest.mark.parametrize("kind, columns", [
+    ("payments", ["unit_name", "work_order_no", "work_status", "payment_mode", "client"]),
+    ("proposals", ["name", "status", "present_status", "source", "client"]),
+])
+def test_prepared_frames_hold_text_as_arrow_strings(kind, columns):
+    raw = pd.read_csv(os.path.join(FIXTURES, f"{kind}.csv"), dtype=object)
+    df = getattr(pipeline, f"prepare_{kind}")(raw)
+    assert all(is_arrow_string(df[c]) for c in columns)
+
+
+def test_shared_datasets_build_once_for_concurrent_callers(app):
+    datasets = app.SharedDatasets(max_entries=2)
+    release, calls, results = threading.Event(), [], []
+
+    def build():
+        calls.append(1)
+        release.wait()
+        return pd.DataFrame({"a": [1]})
+
+    threads = [threading.Thread(target=lambda: results.append(datasets.get(("payments", "v1"), build)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+
+
+def test_failed_builds_are_not_kept_and_old_versions_are_evicted(app):
+    datasets = app.SharedDatasets(max_entries=2)
+
+    def fail():
+        raise RuntimeError("sheet unavailable")
+
+    with pytest.raises(RuntimeError):
+        datasets.get(("payments", "v1"), fail)
+    assert datasets.get(("payments", "v1"), lambda: pd.DataFrame({"a": [1]}))["a"].tolist() == [1]
+    datasets.get(("payments", "v2"), lambda: pd.DataFrame({"a": [2]}))
+    datasets.get(("proposals", "v1"), lambda: pd.DataFrame({"a": [3]}))
+    assert datasets.stats()["entries"] == 2
+    assert datasets.current("payments")["a"].tolist() == [2]
@@ -0,0 +1,31 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+import pipeline
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures")
+# The fixtures mix date formats on purpose
+pytestmark = pytest.mark.filterwarnings("ignore:Parsing dates")
+
+
+def test_batch_run_writes_a_complete_snapshot(tmp_path):
+    summary = pipeline.run_batch("local", str(tmp_path), path=FIXTURES)
+
+    with open(tmp_path / pipeline.SNAPSHOT_MANIFEST) as f:
+        assert json.load(f) == json.loads(json.dumps(summary, default=float))
+    assert sorted(os.listdir(tmp_path)) == sorted(summary["files"] + [pipeline.SNAPSHOT_MANIFEST])
+    assert pipeline.snapshot_version(str(tmp_path)) is not None
+
+    df, _ = pipeline.read_snapshot(str(tmp_path), "payments")
+    assert df.attrs["version"] == summary["versions"]["payments"]
+    assert summary["payments"]["records"] == len(df)
+    assert summary["payments"]["pending_amount"] == pytest.approx(df["pending_amount"].sum())
+
+
+def test_snapshot_dir_without_a_manifest_has_no_version(tmp_path):
+    assert pipeline.snapshot_version(str(tmp_path)) is None
+    pd.DataFrame({"a": [1]}).to_parquet(tmp_path / "payments.parquet")
+    assert pipeline.snapshot_version(str(tmp_path)) is None
@@ -0,0 +1,26 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip("duckdb")
+
+
+def test_client_example_joins_on_the_reconciliation_key(app):
+    df = pd.DataFrame({
+        "work_order_no": ["WO-0001", "wo 0002", "WO0003", "", None],
+        "final_amount": [100.0, 200.0, 300.0, 5.0, 7.0],
+        "payment_received": [10.0, 20.0, 30.0, 0.0, 0.0],
+    })
+    proposal_df = pd.DataFrame({
+        "no": ["WO0001", "WO-0002", " wo-0003 ", "", None],
+        "client": ["Alpha", "Beta", "Alpha", "Blank", "Missing"],
+    })
+    result = app.run_sql(app.SQL_EXAMPLES["Payments by proposal client"], payments=df, proposals=proposal_df)
+
+    # Same pairs as joining on work_order_key; blank numbers match nothing
+    keyed = df.assign(key=app.work_order_key(df["work_order_no"])).dropna(subset=["key"]).merge(
+        proposal_df.assign(key=app.work_order_key(proposal_df["no"])).dropna(subset=["key"]), on="key"
+    )
+    expected = keyed.groupby("client")["final_amount"].agg(["size", "sum"])
+    assert result.set_index("client")["work_orders"].to_dict() == expected["size"].to_dict()
+    assert result.set_index("client")["final_amount"].to_dict() == expected["sum"].to_dict()
+    assert result["client"].tolist() == ["Alpha", "Beta"]
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+FUTURE = pd.Timestamp.now().normalize() + pd.Timedelta(days=30)
+
+
+def payments():
+    # Labels that are not positions, as after filtering or sorting
+    return pd.DataFrame({
+        "work_order_no": ["WO-1", "wo 2", "WO-3", "WO-2", None, "WO-6"],
+        "order_amount": [100.0, 200.0, 300.0, 400.0, 500.0, 600.0],
+        "final_amount": [100.0, 200.0, 300.0, 400.0, 500.0, 600.0],
+        "payment_received": [100.0, 250.0, 300.5, 0.0, 900.0, 0.0],
+        "payment_date": pd.to_datetime(["2024-01-05", None, FUTURE, "2024-02-01", None, "2024-02-02"]),
+        # bit 0 order_amount, bit 2 payment_received
+        "unparsed_amounts": np.array([0, 1, 0, 0, 4, 5], dtype=np.uint8),
+    }, index=[50, 40, 30, 20, 10, 0])
+
+
+def proposals():
+    return pd.DataFrame({
+        "no": ["WO-1", None, "WO 3", "WO-9"],
+        "refrence_no": [None, "WO2", None, None],
+        "amount": [100.0, 650.0, 300.4, 10.0],
+        "date": pd.to_datetime(["2024-01-01", None, "2024-01-03", "2024-01-04"]),
+        "wo_date": pd.to_datetime([None, FUTURE, None, "2024-01-05"]),
+    })
+
+
+def counts(result):
+    return {(r.rule, r.column): r.rows for r in result["summary"].itertuples()}
+
+
+def positions(result):
+    return {key: rows.tolist() for key, rows in result["index"].items() if len(rows)}
+
+
+def test_payment_rules_report_counts_and_positions(app):
+    df = payments()
+    result = app.run_validation("payments", df)
+    assert positions(result) == {
+        ("unparseable_amount", "order_amount"): [1, 5],
+        ("unparseable_amount", "payment_received"): [4, 5],
+        ("received_exceeds_final", "payment_received"): [1, 4],
+        ("duplicate_work_order", "work_order_no"): [1, 3],
+        ("future_date", "payment_date"): [2],
+        ("missing_date", "payment_date"): [1, 4],
+    }
+    assert counts(result) == {key: len(rows) for key, rows in positions(result).items()}
+    assert result["rows"] == 6
+    assert result["violations"] == 11
+    assert result["flagged_rows"] == 5
+
+    # Positions look the offending rows up whatever the frame's labels
+    rows = df.iloc[result["index"][("received_exceeds_final", "payment_received")]]
+    assert rows["payment_received"].tolist() == [250.0, 900.0]
+
+
+def test_proposal_amounts_are_checked_against_their_work_order(app):
+    result = app.run_validation("proposals", proposals(), payments())
+    assert positions(result) == {
+        ("missing_date", "date"): [1],
+        ("future_date", "wo_date"): [1],
+        # WO2 has two payment rows ordering 600 in all; WO9 is not a work order
+        ("amount_mismatch", "amount"): [1],
+    }
+    summary = result["summary"].set_index("rule")
+    assert summary.loc["amount_mismatch", "description"] == app.VALIDATION_RULES["amount_mismatch"]
+    assert result["flagged_rows"] == 1
+
+
+def test_clean_frames_have_an_empty_summary(app):
+    df = payments().assign(
+        work_order_no=["WO-1", "WO-2", "WO-3", "WO-4", "WO-5", "WO-6"],
+        payment_received=0.0, payment_date=pd.Timestamp("2024-01-01"), unparsed_amounts=np.uint8(0),
+    )
+    result = app.run_validation("payments", df)
+    assert result["summary"].empty
+    assert result["violations"] == result["flagged_rows"] == 0
+    assert app.run_validation("proposals", proposals().iloc[[0]])["summary"].empty